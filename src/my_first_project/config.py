@@ -49,6 +49,8 @@ path = {
 
     "db" : probdex_db_path,
     "user_db" : user_db_path,
+    "corpus_snapshot" : os.path.join(project_root_path, "probdex_corpus.npz"),
+    "shards" : os.path.join(project_root_path, "shards"),
     
     "test_pdf" : test_pdf_path
 }
@@ -60,4 +62,137 @@ pdf_constant = {
     "subjects": ["cal", "geo", "sta"],
     "common_pages": (1, 8),
     "split_pages": (9, 12)
-}
\ No newline at end of file
+}
+# SQLite 성능 프로파일 - database.py의 connect_db()에서 사용
+# cache_size가 음수이면 KiB 단위 (-262144 = 256MB)
+sqlite_profiles = {
+    # 일반 읽기/쓰기 (기존 동작 + 외래키 활성화)
+    "default": {
+        "read_only": False,
+        "pragmas": [
+            ("foreign_keys", "ON"),
+        ]
+    },
+    # DB 초기화/재구축 전용 (WAL, fsync 생략, 큰 캐시 / 작업 중 중단되면 DB가 손상될 수 있음)
+    # 일반 동기화/upsert는 "default"를 사용하고, 이 프로파일은 initialize_database()에서만 사용
+    "bulk_load": {
+        "read_only": False,
+        "pragmas": [
+            ("journal_mode", "WAL"),
+            ("synchronous", "OFF"),
+            ("cache_size", -262144),
+            ("temp_store", "MEMORY"),
+            ("foreign_keys", "ON"),
+        ]
+    },
+    # 검색 전용 (읽기 전용, mmap 사용, 쓰기 쿼리 차단)
+    "search": {
+        "read_only": True,
+        "pragmas": [
+            ("mmap_size", 268435456),
+            ("cache_size", -65536),
+            ("temp_store", "MEMORY"),
+            ("query_only", "ON"),
+        ]
+    },
+    # 검색 전용 + immutable (파일이 바뀌지 않는다고 가정하여 잠금/변경 확인 생략, 큰 mmap)
+    # 동기화 등으로 DB가 쓰이는 동안에는 사용하지 말 것
+    # db_manager의 풀링된 연결처럼 오래 유지되는 연결에는 쓰지 말고, 쿼리 직후 닫는 짧은 연결에만 사용
+    "search_immutable": {
+        "read_only": True,
+        "immutable": True,
+        "pragmas": [
+            ("mmap_size", 1073741824),
+            ("cache_size", -65536),
+            ("temp_store", "MEMORY"),
+            ("query_only", "ON"),
+        ]
+    }
+}
+# SQL 프로파일러 설정 - db_profiler.py에서 사용
+# 환경 변수 PROBDEX_SQL_PROFILE=1 이면 켜짐 (기본 꺼짐)
+sql_profiler_settings = {
+    "enabled": os.getenv("PROBDEX_SQL_PROFILE", "0") == "1",
+    "slow_query_ms": float(os.getenv("PROBDEX_SLOW_QUERY_MS", "20")),
+    "log_path": os.path.join(project_root_path, "logs", "slow_queries.log"),
+    "summary_top_n": 15
+}
+# 유사 문항 검색 1차 SQL 선별 설정 - database.shortlist_candidate_ids(), user_pipeline_v3.py에서 사용
+# limit개를 넘으면 잘라냄 (0이면 제한 없음), 잘라낸 결과가 top_k개보다 적으면 단원 전체 후보로 대체
+search_shortlist = {
+    "limit": int(os.getenv("PROBDEX_SHORTLIST_LIMIT", "30")),
+    "difficulty_window": 1,
+    "min_shared_concepts": 1,
+    "top_k": 4
+}
+# problems 긴 텍스트 컬럼 압축 설정 - database.compress_text_columns()에서 사용
+# enabled=True 이면 probdex.db 동기화 후 자동으로 압축 (기본 꺼짐, 읽기는 항상 자동 해제)
+text_compression = {
+    "enabled": os.getenv("PROBDEX_TEXT_COMPRESSION", "0") == "1",
+    "columns": ["logic_structure", "pitfalls"],
+    "level": 9,
+    "dict_size": 32768,
+    "min_length": 64 # 이보다 짧은 텍스트는 압축 이득이 없어 그대로 둠
+}
+# 과목별 샤드 DB 설정 - db_shards.py에서 사용
+# enabled=True 이면 검색 서비스가 과목별 샤드 DB(shards/probdex_<과목코드>.db)를 조회 (기본 꺼짐)
+corpus_sharding = {
+    "enabled": os.getenv("PROBDEX_SHARDED", "0") == "1",
+    "max_workers": None # 병렬 동기화 프로세스 수 (None이면 샤드 수와 CPU 수 중 작은 값)
+}
+# Gemini API 클라이언트 측 요청 제한 (RPM/TPM 토큰 버킷) - rate_limiter.py에서 사용
+# 기본값은 유료 Tier 1 한도 기준, 환경 변수로 덮어쓸 수 있음
+gemini_rate_limits = {
+    "enabled": os.getenv("PROBDEX_RATE_LIMIT", "1") == "1",
+    "share_across_processes": True, # 상태 파일 + 파일 잠금으로 여러 파이프라인 프로세스가 한도를 공유
+    "state_dir": os.path.join(project_root_path, "logs", "rate_limit"),
+    "models": {
+        "gemini-2.5-pro": {
+            "rpm": int(os.getenv("PROBDEX_PRO_RPM", "150")),
+            "tpm": int(os.getenv("PROBDEX_PRO_TPM", "2000000"))
+        },
+        "gemini-2.5-flash": {
+            "rpm": int(os.getenv("PROBDEX_FLASH_RPM", "1000")),
+            "tpm": int(os.getenv("PROBDEX_FLASH_TPM", "1000000"))
+        },
+        "default": {"rpm": 60, "tpm": 1000000}
+    }
+}
+# Gemini 응답 캐시 (같은 페이지/프롬프트/설정의 재호출 방지) - response_cache.py에서 사용
+gemini_response_cache = {
+    "enabled": os.getenv("PROBDEX_RESPONSE_CACHE", "1") == "1",
+    "db_path": os.path.join(project_root_path, "cache", "gemini_responses.db"),
+    "max_bytes": int(os.getenv("PROBDEX_RESPONSE_CACHE_MB", "256")) * 1024 * 1024
+}
+# flash -> pro 모델 단계 실행 설정 - engine.extract_pdf_meta_data()에서 사용
+# enabled=True 이면 flash로 먼저 분석하고, 검증 실패/ai_analysis 무효/고난도일 때만 pro로 재분석 (기본 꺼짐)
+gemini_model_cascade = {
+    "enabled": os.getenv("PROBDEX_MODEL_CASCADE", "0") == "1",
+    "escalate_difficulty": int(os.getenv("PROBDEX_CASCADE_DIFFICULTY", "4")), # flash 난이도 추정이 이 값 이상이면 pro로 재분석
+    "log_path": os.path.join(project_root_path, "logs", "model_cascade.log")
+}
+# 페이지별 적응형 thinking budget 설정 - engine.extract_pdf_meta_data()에서 사용
+# adaptive=True 이면 배점/본문 길이/문항 번호/이전 소요 시간으로 페이지마다 budget을 정함 (기본 꺼짐, 꺼지면 항상 THINKING_BUDGET)
+gemini_thinking_budget = {
+    "adaptive": os.getenv("PROBDEX_ADAPTIVE_THINKING", "0") == "1"
+}
+# Gemini 호출 녹화/재생 설정 - gemini_replay.py, engine.get_genai_client()에서 사용
+# mode: live(실제 API), record(실제 API + 요청/응답 녹화), replay(녹화 재생, API 키/네트워크 불필요)
+gemini_replay = {
+    "mode": os.getenv("PROBDEX_GEMINI_MODE", "live"),
+    "recording_path": os.path.join(project_root_path, "cache", "gemini_recordings.jsonl"),
+    "latency": os.getenv("PROBDEX_REPLAY_LATENCY", "recorded"), # recorded / fixed / uniform / lognormal
+    "latency_scale": float(os.getenv("PROBDEX_REPLAY_LATENCY_SCALE", "1.0")),
+    "latency_params": {"seconds": 1.0, "low": 0.5, "high": 2.0, "median": 1.0, "sigma": 0.5},
+    "rate_429": float(os.getenv("PROBDEX_REPLAY_429_RATE", "0")), # 429 주입 확률
+    "rate_5xx": float(os.getenv("PROBDEX_REPLAY_5XX_RATE", "0")), # 503 주입 확률
+    "rpm": int(os.getenv("PROBDEX_REPLAY_RPM", "0")) or None, # 재생 서버의 분당 요청 한도 (None이면 제한 없음)
+    "max_concurrency": int(os.getenv("PROBDEX_REPLAY_CONCURRENCY", "0")) or None, # 동시 처리 한도
+    "miss": os.getenv("PROBDEX_REPLAY_MISS", "error"), # 녹화 없는 요청: error(404) / empty(빈 응답)
+    "seed": None
+}
+# Gemini 스트리밍 응답 설정 - user_pipeline_v3.py에서 사용 (extract_pdf_meta_data(stream=True)로 전달)
+# enabled=True 이면 generate_content_stream으로 분석하고 문제가 완성되는 즉시 유사도 검색을 시작 (기본 꺼짐)
+gemini_streaming = {
+    "enabled": os.getenv("PROBDEX_STREAMING", "0") == "1"
+}
@@ -0,0 +1,286 @@
+# --- corpus_snapshot.py ---
+import os
+import time
+import tempfile
+import threading
+import numpy as np
+# 프로젝트 모듈 임포트
+from .config import path
+from .database import db_manager, get_db_version, get_latest_change_seq, decode_column_text, VOCABULARIES
+
+# 스냅샷 파일 형식 버전 (배열 구성이 바뀌면 증가)
+SNAPSHOT_FORMAT_VERSION = 3
+
+# 검색 서비스가 재사용하는 로드된 스냅샷 (파일이 바뀌면 다시 로드)
+_current_snapshot = None
+_current_snapshot_key = None
+_current_snapshot_lock = threading.Lock()
+
+def _build_csr(cursor, kind, problem_ids):
+    """
+    문제별 용어 id 목록을 CSR 배열(indptr, indices)로 변환
+    problem_ids[i]의 용어 id = indices[indptr[i]:indptr[i + 1]]
+    """
+    vocab_table, id_col, name_col, map_table = VOCABULARIES[kind]
+
+    cursor.execute(f"SELECT problem_id, {id_col} FROM {map_table} ORDER BY problem_id, map_id")
+    terms_by_problem = {}
+    for problem_id, vocab_id in cursor.fetchall():
+        terms_by_problem.setdefault(problem_id, []).append(vocab_id)
+
+    indptr = np.zeros(len(problem_ids) + 1, dtype=np.int64)
+    indices = []
+    for idx, problem_id in enumerate(problem_ids):
+        terms = terms_by_problem.get(problem_id, [])
+        indices.extend(terms)
+        indptr[idx + 1] = indptr[idx] + len(terms)
+
+    cursor.execute(f"SELECT {id_col}, {name_col} FROM {vocab_table} ORDER BY {id_col}")
+    vocab_rows = cursor.fetchall()
+
+    return {
+        f"{kind}_indptr": indptr,
+        f"{kind}_indices": np.array(indices, dtype=np.int64),
+        f"{kind}_vocab_ids": np.array([row[0] for row in vocab_rows], dtype=np.int64),
+        f"{kind}_vocab_names": np.array([row[1] for row in vocab_rows], dtype=str),
+    }
+
+def _read_corpus(cursor):
+    """
+    (export_corpus_snapshot에서 호출) 읽기 트랜잭션 안에서 스냅샷 배열 구성
+    반환: (배열 딕셔너리, problem_id 리스트, db_version)
+    """
+    db_version = get_db_version(cursor)
+    change_seq = get_latest_change_seq(cursor)
+
+    cursor.execute("""
+        SELECT
+            p.problem_id, p.unit_id, s.subject_name, u.unit_name,
+            p.difficulty_level, p.logic_structure, p.source_text, p.problem_image_path,
+            p.problem_type, p.pitfalls
+        FROM problems p
+        LEFT JOIN units u ON u.unit_id = p.unit_id
+        LEFT JOIN subjects s ON s.subject_id = u.subject_id
+        ORDER BY p.problem_id
+    """)
+    # 압축된 텍스트 컬럼은 평문으로 해제하여 스냅샷에 저장
+    rows = [[decode_column_text(cursor, value) for value in row] for row in cursor.fetchall()]
+    problem_ids = [row[0] for row in rows]
+
+    arrays = {
+        "format_version": np.array(SNAPSHOT_FORMAT_VERSION, dtype=np.int64),
+        "db_version": np.array(db_version, dtype=np.int64),
+        "change_seq": np.array(change_seq, dtype=np.int64),
+        "created_at": np.array(time.time(), dtype=np.float64),
+        "problem_ids": np.array(problem_ids, dtype=np.int64),
+        "unit_ids": np.array([row[1] if row[1] is not None else -1 for row in rows], dtype=np.int64),
+        "subject_names": np.array([row[2] or "" for row in rows], dtype=str),
+        "unit_names": np.array([row[3] or "" for row in rows], dtype=str),
+        "difficulty": np.array([row[4] or 0 for row in rows], dtype=np.int64),
+        "logic_flow": np.array([row[5] or "" for row in rows], dtype=str),
+        "source_text": np.array([row[6] or "" for row in rows], dtype=str),
+        "problem_image_path": np.array([row[7] or "" for row in rows], dtype=str),
+        # 용어 매핑이 없는(마이그레이션 전) 문제의 유형/함정은 DB 검색과 같게 TEXT 컬럼으로 대체
+        "pattern_text": np.array([row[8] or "" for row in rows], dtype=str),
+        "pitfall_text": np.array([row[9] or "" for row in rows], dtype=str),
+    }
+    for kind in VOCABULARIES:
+        arrays.update(_build_csr(cursor, kind, problem_ids))
+
+    return arrays, problem_ids, db_version
+
+def export_corpus_snapshot(db_path=None, snapshot_path=None):
+    """
+    probdex.db 전체를 열 단위(columnar) .npz 스냅샷으로 저장
+    - 문제별 배열: problem_ids, unit_ids, subject_names, unit_names, difficulty, 텍스트 컬럼
+    - 개념/유형/함정: CSR 배열 (indptr, indices) + 용어 사전
+    - db_version(PRAGMA user_version)을 함께 기록하여 검색 서비스가 최신 여부를 확인
+    - change_seq(problem_changes의 마지막 seq)를 기록하여 이후 변경분만 조회할 수 있도록 함
+    임시 파일에 쓴 뒤 교체하므로 읽는 쪽이 쓰다 만 파일을 보지 않음
+    DB는 읽기 전용 연결의 BEGIN DEFERRED 읽기 트랜잭션 하나로 읽음 (버전과 데이터가 일치, 쓰기 잠금 없음)
+    반환: 스냅샷 경로 (실패 시 None)
+    """
+    if db_path is None:
+        db_path = path["db"]
+    if snapshot_path is None:
+        snapshot_path = path["corpus_snapshot"]
+
+    start_time = time.perf_counter()
+    try:
+        # 한 읽기 트랜잭션 안에서 읽어 버전과 데이터가 일치하도록 함
+        with db_manager.cursor(db_path, profile="search") as cursor:
+            cursor.execute("BEGIN DEFERRED")
+            try:
+                arrays, problem_ids, db_version = _read_corpus(cursor)
+            finally:
+                cursor.connection.rollback() # 읽기만 했으므로 트랜잭션 종료
+
+    except Exception as e:
+        print(f"코퍼스 스냅샷 생성 실패: {e}")
+        return None
+
+    # 같은 폴더의 임시 파일에 저장 후 원자적으로 교체
+    snapshot_dir = os.path.dirname(os.path.abspath(snapshot_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".corpus_", suffix=".npz", dir=snapshot_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        # mkstemp는 소유자 전용 권한으로 만들므로 일반 파일 권한으로 변경
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, snapshot_path)
+    except Exception as e:
+        print(f"코퍼스 스냅샷 저장 실패: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+    duration = time.perf_counter() - start_time
+    print(f"✅ 코퍼스 스냅샷 저장 완료: {snapshot_path} "
+          f"(문제 {len(problem_ids)}개, DB 버전 {db_version}, {duration:.3f}초)")
+    return snapshot_path
+
+def _snapshot_matches_db(snapshot, db_path):
+    """
+    스냅샷의 db_version / change_seq가 DB의 현재 값과 같은지 확인 (조회 실패 시 False)
+    """
+    try:
+        with db_manager.cursor(db_path, profile="search") as cursor:
+            db_version = get_db_version(cursor)
+            change_seq = get_latest_change_seq(cursor)
+    except Exception as e:
+        print(f"DB 버전 조회 실패: {e}")
+        return False
+
+    if db_version != snapshot["db_version"] or change_seq != snapshot["change_seq"]:
+        print(f"  [경고] 스냅샷이 오래되었습니다 (스냅샷 버전 {snapshot['db_version']}/{snapshot['change_seq']}, "
+              f"DB 버전 {db_version}/{change_seq})")
+        return False
+    return True
+
+def load_corpus_snapshot(snapshot_path=None, db_path=None, check_version: bool = True):
+    """
+    코퍼스 스냅샷을 한 번의 순차 읽기로 메모리에 로드
+    check_version=True이면 DB의 현재 db_version/change_seq와 비교하여 다르면 None 반환 (DB에서 다시 읽어야 함)
+    반환: {배열 이름: np.ndarray} 딕셔너리 (스칼라 값은 Python 값으로 변환)
+    """
+    if snapshot_path is None:
+        snapshot_path = path["corpus_snapshot"]
+    if db_path is None:
+        db_path = path["db"]
+
+    if not os.path.exists(snapshot_path):
+        return None
+
+    try:
+        # 문자열은 유니코드 배열로 저장했으므로 pickle 불필요
+        with np.load(snapshot_path, allow_pickle=False) as data:
+            snapshot = {name: data[name] for name in data.files}
+    except Exception as e:
+        print(f"코퍼스 스냅샷 로드 실패: {e}")
+        return None
+
+    for name in ("format_version", "db_version", "change_seq", "created_at"):
+        snapshot[name] = snapshot[name].item()
+
+    if snapshot["format_version"] != SNAPSHOT_FORMAT_VERSION:
+        print(f"  [경고] 스냅샷 형식 버전 불일치 ({snapshot['format_version']} != {SNAPSHOT_FORMAT_VERSION})")
+        return None
+
+    if check_version and not _snapshot_matches_db(snapshot, db_path):
+        return None
+
+    return snapshot
+
+def get_current_snapshot(snapshot_path=None, db_path=None):
+    """
+    [검색] DB와 일치하는 스냅샷 반환 (일치하지 않거나 없으면 None -> 호출한 쪽은 DB에서 조회)
+    - 파일은 경로/수정 시각이 바뀔 때만 다시 로드하고 프로세스 안에서 재사용
+    - 호출할 때마다 db_version/change_seq를 확인하므로 동기화 후 오래된 스냅샷을 쓰지 않음
+    """
+    global _current_snapshot, _current_snapshot_key
+    if snapshot_path is None:
+        snapshot_path = path["corpus_snapshot"]
+    if db_path is None:
+        db_path = path["db"]
+
+    try:
+        key = (os.path.abspath(snapshot_path), os.path.getmtime(snapshot_path))
+    except OSError:
+        return None
+
+    with _current_snapshot_lock:
+        if _current_snapshot_key != key:
+            snapshot = load_corpus_snapshot(snapshot_path, db_path, check_version=False)
+            if snapshot is not None:
+                _index_snapshot(snapshot)
+            _current_snapshot, _current_snapshot_key = snapshot, key
+        snapshot = _current_snapshot
+
+    if snapshot is None or not _snapshot_matches_db(snapshot, db_path):
+        return None
+    return snapshot
+
+def _index_snapshot(snapshot):
+    """
+    검색용 보조 색인 (problem_id -> 행 번호, (과목, 단원) -> 행 번호들, 용어 id -> 이름)
+    """
+    snapshot["_row_by_id"] = {int(problem_id): idx for idx, problem_id in enumerate(snapshot["problem_ids"])}
+    rows_by_unit = {}
+    for idx, (subject_name, unit_name) in enumerate(zip(snapshot["subject_names"], snapshot["unit_names"])):
+        rows_by_unit.setdefault((str(subject_name), str(unit_name)), []).append(idx)
+    snapshot["_rows_by_unit"] = rows_by_unit
+    snapshot["_vocab_names"] = {
+        kind: dict(zip(snapshot[f"{kind}_vocab_ids"].tolist(), snapshot[f"{kind}_vocab_names"].tolist()))
+        for kind in VOCABULARIES
+    }
+
+def _snapshot_candidate(snapshot, index):
+    """
+    스냅샷 index번째 문제를 database._build_candidates()와 같은 후보 딕셔너리로 변환
+    """
+    terms = {}
+    for kind in VOCABULARIES:
+        ids = get_snapshot_terms(snapshot, kind, index).tolist()
+        names = snapshot["_vocab_names"][kind]
+        terms[kind] = (ids, [names.get(vocab_id, "") for vocab_id in ids])
+
+    pattern_text = str(snapshot["pattern_text"][index])
+    pitfall_text = str(snapshot["pitfall_text"][index])
+    return {
+        "problem_id": int(snapshot["problem_ids"][index]),
+        "pattern_type": terms["pattern"][1] if terms["pattern"][0] else (pattern_text.split(', ') if pattern_text else []),
+        "logic_flow": str(snapshot["logic_flow"][index]),
+        "pitfalls": terms["pitfall"][1] if terms["pitfall"][0] else (pitfall_text.split(', ') if pitfall_text else []),
+        "difficulty_level": int(snapshot["difficulty"][index]),
+        "problem_image_path": str(snapshot["problem_image_path"][index]),
+        "source_text": str(snapshot["source_text"][index]),
+        "core_concepts": terms["concept"][1],
+        "concept_ids": terms["concept"][0],
+        "pattern_ids": terms["pattern"][0],
+        "pitfall_ids": terms["pitfall"][0]
+    }
+
+def snapshot_candidates_by_unit(snapshot, subject_name: str, unit_name: str):
+    """
+    [검색] 스냅샷에서 같은 과목/단원 문제의 후보 리스트 (database.get_problem_candidates_by_unit 대체)
+    """
+    rows = snapshot["_rows_by_unit"].get((subject_name, unit_name), [])
+    return [_snapshot_candidate(snapshot, idx) for idx in rows]
+
+def snapshot_candidates_by_ids(snapshot, problem_ids: list):
+    """
+    [검색] 스냅샷에서 problem_id 목록의 후보 리스트 (입력 순서 유지, 없는 id는 건너뜀)
+    """
+    row_by_id = snapshot["_row_by_id"]
+    return [_snapshot_candidate(snapshot, row_by_id[pid]) for pid in problem_ids if pid in row_by_id]
+
+def get_snapshot_terms(snapshot, kind, index):
+    """
+    스냅샷의 index번째 문제가 가진 용어 id 배열 (kind: concept / pattern / pitfall)
+    """
+    indptr = snapshot[f"{kind}_indptr"]
+    return snapshot[f"{kind}_indices"][indptr[index]:indptr[index + 1]]
+
+if __name__ == "__main__":
+    # poetry run python -m src.my_first_project.corpus_snapshot
+    export_corpus_snapshot()
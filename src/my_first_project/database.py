@@ -2,16 +2,195 @@
 import sqlite3
 import os
 import json
+import atexit
+import hashlib
+import time
+import pathlib
+import tempfile
+import threading
+from contextlib import contextmanager
 # 프로젝트 모듈 임포트
 from .model import subject_normalization_map, master_data
-from .config import path
+from .config import path, sqlite_profiles, text_compression, search_shortlist
+from .db_profiler import connection_factory, instrument_connection
+from .text_codec import (
+    train_dictionary, compress_text, decode_text,
+    register_dictionary, has_dictionary, is_compressed, compressed_dictionary_key
+)
 from .prob_data_processer import (
     initialize_xlsx, excel_to_json,
     update_problems_xlsx, update_problems_json,
-    process_pdf_year_and_month, append_images_excel
+    process_pdf_year_and_month, append_images_excel,
+    iter_excel_problem_items
 )
 
 
+def _read_only_uri(db_path, immutable: bool = False):
+    """
+    읽기 전용 URI 생성 (한글/공백 경로는 as_uri()가 인코딩)
+    immutable=True여도 체크포인트되지 않은 WAL 파일이 남아 있으면
+    immutable이 WAL을 무시해 최신 데이터를 놓치므로 일반 읽기 전용으로 연결
+    """
+    db_uri = pathlib.Path(db_path).resolve().as_uri() + "?mode=ro"
+    if immutable:
+        wal_path = f"{db_path}-wal"
+        if os.path.exists(wal_path) and os.path.getsize(wal_path) > 0:
+            print(f"  [경고] WAL 파일이 남아 있어 immutable 대신 일반 읽기 전용으로 연결합니다: {wal_path}")
+        else:
+            db_uri += "&immutable=1"
+    return db_uri
+
+def connect_db(db_path, profile: str = "default", cached_statements: int = 128, check_same_thread: bool = True):
+    """
+    SQLite DB 연결 객체를 반환하는 함수
+    profile: config.sqlite_profiles의 이름
+        - "default"   : 일반 읽기/쓰기 (외래키 활성화)
+        - "bulk_load" : DB 초기화/재구축 전용 (WAL, synchronous=OFF, 큰 캐시 / 중단 시 DB가 손상될 수 있음)
+        - "search"    : 검색 전용 (읽기 전용, mmap, query_only)
+        - "search_immutable" : 검색 전용 + immutable (잠금 없음, 큰 mmap / 쓰기 중인 DB, 오래 유지되는 풀링 연결에는 사용 금지)
+    cached_statements: 연결마다 유지할 prepared statement 캐시 크기
+    """
+    settings = sqlite_profiles.get(profile)
+    if settings is None:
+        raise ValueError(f"알 수 없는 DB 프로파일: '{profile}' (사용 가능: {list(sqlite_profiles.keys())})")
+
+    if settings["read_only"]:
+        # 읽기 전용은 URI 모드로 연결
+        db_uri = _read_only_uri(db_path, immutable=settings.get("immutable", False))
+        connection = sqlite3.connect(
+            db_uri, uri=True, factory=connection_factory(),
+            cached_statements=cached_statements, check_same_thread=check_same_thread
+        )
+    else:
+        connection = sqlite3.connect(
+            db_path, factory=connection_factory(),
+            cached_statements=cached_statements, check_same_thread=check_same_thread
+        )
+    # SQL 프로파일러가 켜져 있으면 실행 문장 trace 등록
+    instrument_connection(connection)
+
+    for pragma_name, pragma_value in settings["pragmas"]:
+        connection.execute(f"PRAGMA {pragma_name} = {pragma_value}")
+
+    return connection
+
+class ConnectionManager:
+    """
+    프로세스 전체가 공유하는 SQLite 연결 관리자
+    - (스레드, DB 경로, 프로파일)마다 연결 1개를 만들어 재사용 (연결 풀)
+    - 연결이 유지되므로 sqlite3 내장 statement cache도 함께 재사용됨
+    - transaction() / cursor() 컨텍스트 매니저로 커밋/롤백을 일관되게 처리
+    """
+    STATEMENT_CACHE_SIZE = 256 # 연결당 prepared statement 캐시 크기
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = {} # (thread_id, db_path, profile) -> connection
+        self._depth = {}       # (thread_id, db_path, profile) -> 중첩 transaction 깊이
+
+    @staticmethod
+    def _key(db_path, profile):
+        return (threading.get_ident(), os.path.abspath(db_path), profile)
+
+    def get_connection(self, db_path, profile: str = "default"):
+        """
+        현재 스레드의 연결을 반환 (없으면 생성)
+        """
+        key = self._key(db_path, profile)
+        with self._lock:
+            connection = self._connections.get(key)
+        if connection is not None:
+            return connection
+
+        # check_same_thread=False: close_all()이 다른 스레드에서 호출되어도 닫을 수 있도록 함
+        # (실제 사용은 항상 연결을 만든 스레드 안에서만 이루어짐)
+        connection = connect_db(
+            db_path, profile=profile,
+            cached_statements=self.STATEMENT_CACHE_SIZE, check_same_thread=False
+        )
+        with self._lock:
+            self._connections[key] = connection
+        return connection
+
+    @contextmanager
+    def transaction(self, db_path, profile: str = "default"):
+        """
+        쓰기 작업용 컨텍스트 매니저
+        정상 종료 시 커밋, 예외 발생 시 롤백 후 예외를 다시 발생시킴.
+        중첩 호출 시 가장 바깥쪽 transaction에서만 커밋/롤백함.
+        """
+        key = self._key(db_path, profile)
+        connection = self.get_connection(db_path, profile)
+        self._depth[key] = self._depth.get(key, 0) + 1
+        cursor = connection.cursor()
+        try:
+            yield cursor
+            if self._depth[key] == 1:
+                connection.commit()
+        except Exception:
+            if self._depth[key] == 1:
+                connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            self._depth[key] -= 1
+
+    @contextmanager
+    def cursor(self, db_path, profile: str = "search"):
+        """
+        읽기 작업용 컨텍스트 매니저 (커밋하지 않음)
+        """
+        connection = self.get_connection(db_path, profile)
+        cursor = connection.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    def close_db(self, db_path):
+        """
+        특정 DB 파일에 대한 모든 스레드의 연결을 닫음 (DB 파일 삭제/교체 전 호출)
+        """
+        target = os.path.abspath(db_path)
+        with self._lock:
+            keys = [key for key in self._connections if key[1] == target]
+            connections = [self._connections.pop(key) for key in keys]
+            for key in keys:
+                self._depth.pop(key, None)
+        for connection in connections:
+            connection.close()
+
+    def close_thread(self):
+        """
+        현재 스레드가 만든 연결만 닫음 (작업 스레드 종료 시 호출)
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            keys = [key for key in self._connections if key[0] == thread_id]
+            connections = [self._connections.pop(key) for key in keys]
+            for key in keys:
+                self._depth.pop(key, None)
+        for connection in connections:
+            connection.close()
+
+    def close_all(self):
+        """
+        관리 중인 모든 연결을 닫음
+        """
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self._depth.clear()
+        for connection in connections:
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
+
+# 모든 모듈이 공유하는 연결 관리자
+db_manager = ConnectionManager()
+atexit.register(db_manager.close_all)
+
 def _ensure_columns(cursor, table_name, required_columns):
     """
     특정 테이블에 필요한 컬럼이 모두 존재하는지 점검하고,
@@ -32,24 +211,225 @@ def _ensure_columns(cursor, table_name, required_columns):
             except Exception as e:
                 print(f"추가 실패 → {col}: {e}")
 
-def _drop_all_tables(db_path, tables):
+def _drop_all_tables(db_path, tables, profile: str = "bulk_load"):
     """
-    모든 테이블 삭제 함수
+    모든 테이블 삭제 함수 (DB 초기화 전용)
     """
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-
+    with db_manager.transaction(db_path, profile=profile) as cursor:
         cursor.execute("PRAGMA foreign_keys = OFF;")
 
         for table in tables:
             cursor.execute(f"DROP TABLE IF EXISTS {table}")
-        conn.commit()
 
-        print(f"  - 기존 테이블 삭제 완료 ({len(tables)}개)")
+    print(f"  - 기존 테이블 삭제 완료 ({len(tables)}개)")
 
+    with db_manager.cursor(db_path, profile=profile) as cursor:
         cursor.execute("PRAGMA foreign_keys = ON;")
 
-def create_database(is_user_db : bool = False):
+def _finish_bulk_load(db_path):
+    """
+    bulk_load 프로파일 작업이 끝난 뒤 호출
+    WAL 체크포인트 후 journal_mode를 기본(DELETE)으로 되돌려, 이후 일반 작업이 WAL로 남지 않도록 함
+    """
+    db_manager.close_db(db_path)
+    connection = connect_db(db_path, profile="default")
+    try:
+        connection.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        connection.close()
+
+def _create_schema(cursor):
+    """
+    전달받은 커서의 DB에 모든 테이블을 생성(없을 때만)하고 누락된 컬럼을 추가
+    """
+    # ----- subjects -----
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS subjects (
+        subject_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        subject_name TEXT UNIQUE NOT NULL
+    )
+    ''')
+
+    # ----- units -----
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS units (
+        unit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        unit_name TEXT NOT NULL,
+        subject_id INTEGER,
+        FOREIGN KEY(subject_id) REFERENCES subjects(subject_id)
+    )
+    ''')
+
+    # ----- concepts -----
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS concepts (
+        concept_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        concept_name TEXT UNIQUE NOT NULL
+    )
+    ''')
+
+    # ----- problems -----
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS problems (
+        problem_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source_text TEXT NOT NULL,
+        year INTEGER,
+        month INTEGER,
+        number INTEGER,
+        unit_id INTEGER,
+        problem_type TEXT,
+        logic_structure TEXT,
+        pitfalls TEXT,
+        problem_image_path TEXT,
+        difficulty_level INTEGER,
+        content_hash TEXT,
+        FOREIGN KEY(unit_id) REFERENCES units(unit_id)
+    )
+    ''')
+
+    # 테이블이 이미 존재하더라도, 아래 컬럼들이 없으면 자동으로 추가
+    if '_ensure_columns' in globals(): # 함수 존재 여부 확인 
+        _ensure_columns(cursor, "problems", [
+            ("problem_type", "TEXT"),
+            ("logic_structure", "TEXT"),
+            ("pitfalls", "TEXT"),
+            ("problem_image_path", "TEXT"),
+            ("difficulty_level", "INTEGER"),
+            ("content_hash", "TEXT")
+        ])
+
+    # ----- problem_concept_map -----
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS problem_concept_map (
+        map_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        problem_id INTEGER,
+        concept_id INTEGER,
+        UNIQUE(problem_id, concept_id),
+        FOREIGN KEY(problem_id) REFERENCES problems(problem_id) ON DELETE CASCADE,
+        FOREIGN KEY(concept_id) REFERENCES concepts(concept_id) ON DELETE CASCADE
+    )
+    ''')
+
+    # ----- patterns / pitfalls (+ map) -----
+    _create_vocabulary_schema(cursor)
+
+    # ----- problem_changes (+ 트리거) -----
+    _create_change_log_schema(cursor)
+
+    # ----- text_dictionaries -----
+    _create_text_dictionary_schema(cursor)
+
+# 변경 로그 트리거를 다는 테이블 (문제 본문 + 문제-용어 매핑)
+CHANGE_LOG_TABLES = ["problems", "problem_concept_map", "problem_pattern_map", "problem_pitfall_map"]
+PROBLEM_CHANGES_NO_DELETE_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS trg_problem_changes_no_delete
+    BEFORE DELETE ON problem_changes
+    BEGIN
+        SELECT RAISE(ABORT, 'problem_changes is append-only (use prune_problem_changes)');
+    END
+'''
+
+def _create_change_log_schema(cursor):
+    """
+    추가 전용(append-only) 변경 로그 테이블 problem_changes와
+    problems / 매핑 테이블의 INSERT/UPDATE/DELETE 트리거 생성
+    seq는 AUTOINCREMENT라 삭제(정리) 후에도 재사용되지 않고 계속 증가함
+    problems의 UPDATE는 content_hash가 바뀐 경우만 기록 (같은 내용의 upsert, 텍스트 압축 등 저장 형식 변경은 제외)
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS problem_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        problem_id INTEGER NOT NULL,
+        table_name TEXT NOT NULL,
+        operation TEXT NOT NULL CHECK(operation IN ('INSERT', 'UPDATE', 'DELETE')),
+        changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_problem_changes_problem ON problem_changes(problem_id)")
+
+    # 기록된 변경은 수정/삭제 불가 (오래된 기록 정리는 prune_problem_changes()만 삭제 트리거를 잠시 내리고 수행)
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_problem_changes_no_update
+    BEFORE UPDATE ON problem_changes
+    BEGIN
+        SELECT RAISE(ABORT, 'problem_changes is append-only');
+    END
+    ''')
+    cursor.execute(PROBLEM_CHANGES_NO_DELETE_TRIGGER)
+
+    # 이전 버전에서 만든 조건 없는 problems UPDATE 트리거는 교체
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_problems_update_log'")
+    row = cursor.fetchone()
+    if row and "WHEN" not in row[0]:
+        cursor.execute("DROP TRIGGER trg_problems_update_log")
+
+    for table in CHANGE_LOG_TABLES:
+        for operation, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            when = "WHEN OLD.content_hash IS NOT NEW.content_hash" if (table, operation) == ("problems", "UPDATE") else ""
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_log
+            AFTER {operation} ON {table} {when}
+            BEGIN
+                INSERT INTO problem_changes (problem_id, table_name, operation)
+                VALUES ({row}.problem_id, '{table}', '{operation}');
+            END
+            ''')
+
+def _create_text_dictionary_schema(cursor):
+    """
+    압축 텍스트 컬럼의 zlib 사전 테이블 생성
+    압축값 헤더에 사전 키(dict_key)가 들어 있어 사전을 다시 학습해도 기존 값은 그대로 해제됨
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS text_dictionaries (
+        dict_key BLOB PRIMARY KEY,
+        column_name TEXT NOT NULL,
+        dictionary BLOB NOT NULL,
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+    )
+    ''')
+
+def _create_vocabulary_schema(cursor):
+    """
+    pattern_type / pitfalls 용어 테이블과 문제-용어 매핑 테이블 생성 (concepts와 같은 구조)
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS patterns (
+        pattern_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        pattern_name TEXT UNIQUE NOT NULL
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS pitfalls (
+        pitfall_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        pitfall_name TEXT UNIQUE NOT NULL
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS problem_pattern_map (
+        map_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        problem_id INTEGER,
+        pattern_id INTEGER,
+        UNIQUE(problem_id, pattern_id),
+        FOREIGN KEY(problem_id) REFERENCES problems(problem_id) ON DELETE CASCADE,
+        FOREIGN KEY(pattern_id) REFERENCES patterns(pattern_id) ON DELETE CASCADE
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS problem_pitfall_map (
+        map_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        problem_id INTEGER,
+        pitfall_id INTEGER,
+        UNIQUE(problem_id, pitfall_id),
+        FOREIGN KEY(problem_id) REFERENCES problems(problem_id) ON DELETE CASCADE,
+        FOREIGN KEY(pitfall_id) REFERENCES pitfalls(pitfall_id) ON DELETE CASCADE
+    )
+    ''')
+
+def create_database(is_user_db : bool = False, db_path = None, profile: str = "default"):
 
     """
     DB 생성 및 스키마 자동 동기화.
@@ -58,97 +438,25 @@ def create_database(is_user_db : bool = False):
 
     is_user_db=False : probdex.db 생성
     is_user_db=True  : user_probdex.db 생성
+    db_path 지정 시 : 해당 경로의 DB 생성 (과목별 샤드 DB 등)
+    profile: 기본은 "default" (initialize_database()의 재구축 경로에서만 "bulk_load")
     """
     
-    connection = None # 변수 초기화 
-    db_path = path["user_db"] if is_user_db else path["db"]
+    if db_path is None:
+        db_path = path["user_db"] if is_user_db else path["db"]
 
     try:
-        connection = sqlite3.connect(db_path)
-        cursor = connection.cursor()
-        
-        cursor.execute("PRAGMA foreign_keys = ON;") 
-
-        # ----- subjects -----
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS subjects (
-            subject_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            subject_name TEXT UNIQUE NOT NULL
-        )
-        ''')
-
-        # ----- units -----
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS units (
-            unit_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            unit_name TEXT NOT NULL,
-            subject_id INTEGER,
-            FOREIGN KEY(subject_id) REFERENCES subjects(subject_id)
-        )
-        ''')
-
-        # ----- concepts -----
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS concepts (
-            concept_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            concept_name TEXT UNIQUE NOT NULL
-        )
-        ''')
-
-        # ----- problems -----
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS problems (
-            problem_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            source_text TEXT NOT NULL,
-            year INTEGER,
-            month INTEGER,
-            number INTEGER,
-            unit_id INTEGER,
-            problem_type TEXT,
-            logic_structure TEXT,
-            pitfalls TEXT,
-            problem_image_path TEXT,
-            difficulty_level INTEGER,
-            FOREIGN KEY(unit_id) REFERENCES units(unit_id)
-        )
-        ''')
-
-        # 테이블이 이미 존재하더라도, 아래 컬럼들이 없으면 자동으로 추가
-        if '_ensure_columns' in globals(): # 함수 존재 여부 확인 
-             _ensure_columns(cursor, "problems", [
-                ("problem_type", "TEXT"),
-                ("logic_structure", "TEXT"),
-                ("pitfalls", "TEXT"),
-                ("problem_image_path", "TEXT"),
-                ("difficulty_level", "INTEGER")
-            ])
-
-        # ----- problem_concept_map -----
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS problem_concept_map (
-            map_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            problem_id INTEGER,
-            concept_id INTEGER,
-            UNIQUE(problem_id, concept_id),
-            FOREIGN KEY(problem_id) REFERENCES problems(problem_id) ON DELETE CASCADE,
-            FOREIGN KEY(concept_id) REFERENCES concepts(concept_id) ON DELETE CASCADE
-        )
-        ''')
-
-        connection.commit()
+        with db_manager.transaction(db_path, profile=profile) as cursor:
+            _create_schema(cursor)
         print("✅ DB 생성 및 스키마 점검 완료")
 
     except Exception as e:
         print(f"[DB 구성 중 오류] {e}")
-        # 필요하다면 여기서 connection.rollback()을 호출할 수도 있습니다.
-
-    finally:
-        if connection:
-            connection.close()
 
 def initialize_database(is_user_db: bool = False):
     """
     DB 초기화: 모든 테이블 삭제 후 재생성 및 기초 데이터 주입
+    (어차피 처음부터 다시 만드는 작업이므로 bulk_load 프로파일 사용, 끝나면 기본 journal_mode로 복구)
     """
     db_path = path["user_db"] if is_user_db else path["db"]
     db_label = "user_probdex.db" if is_user_db else "probdex.db"
@@ -158,8 +466,14 @@ def initialize_database(is_user_db: bool = False):
 
     tables = [
         "problem_concept_map",
+        "problem_pattern_map",
+        "problem_pitfall_map",
         "problems",
         "concepts",
+        "patterns",
+        "pitfalls",
+        "problem_changes",
+        "text_dictionaries",
         "units",
         "subjects"
     ]
@@ -170,12 +484,13 @@ def initialize_database(is_user_db: bool = False):
 
         # 재생성
         print("  - 테이블 재생성 중...")
-        create_database(is_user_db=is_user_db)
+        create_database(is_user_db=is_user_db, profile="bulk_load")
 
         # 기초 데이터 주입
         print("  - 기초 데이터 주입 중...")
-        populate_subjects_and_units_tables(is_user_db=is_user_db)
+        populate_subjects_and_units_tables(is_user_db=is_user_db, profile="bulk_load")
 
+        _finish_bulk_load(db_path)
         print(f"✅ {db_label} 초기화 완료\n")
         return True
 
@@ -209,50 +524,48 @@ def get_or_create_normalized_subject_id(cursor, messy_subject_name):
         cursor.execute("INSERT INTO subjects (subject_name) VALUES (?)", (normalized_name,))
         return cursor.lastrowid # 방금 삽입한 행의 ID를 반환
     
-def populate_subjects_and_units_tables(is_user_db: bool = False):
+def _populate_master_tables(cursor):
+    """
+    전달받은 커서의 DB에 master_data 기반 과목/단원 데이터를 삽입
+    """
+    # 'subjects' 테이블(과목) 채우기
+    for subject_name in master_data.keys():
+        # 'INSERT OR IGNORE'로 과목 이름 삽입
+        cursor.execute("INSERT OR IGNORE INTO subjects (subject_name) VALUES (?)", (subject_name,))
+        
+        # 'units' 테이블(단원) 채우기 (과목 ID와 연결)
+        
+        # 방금 삽입(하거나 무시)한 과목의 subject_id를 다시 조회하여 가져옵니다.
+        cursor.execute("SELECT subject_id FROM subjects WHERE subject_name = ?", (subject_name,))
+        subject_id_result = cursor.fetchone() 
+        
+        if subject_id_result:
+            subject_id = subject_id_result[0] # ID 추출
+            
+            # 해당 과목에 속한 단원들을 'units' 테이블에 삽입
+            for unit_name in master_data[subject_name]:
+                cursor.execute("INSERT OR IGNORE INTO units (unit_name, subject_id) VALUES (?, ?)", 
+                               (unit_name, subject_id))
+
+def populate_subjects_and_units_tables(is_user_db: bool = False, db_path = None, profile: str = "default"):
     """
     'subjects'와 'units' 마스터 테이블을 표준 데이터로 초기화합니다.
     """
 
-    connection = None
-    db_path = path["user_db"] if is_user_db else path["db"]
+    if db_path is None:
+        db_path = path["user_db"] if is_user_db else path["db"]
     
     try:
-        connection = sqlite3.connect(db_path)
-        cursor = connection.cursor()
-
         print("마스터 테이블(subjects, units) 데이터 삽입을 시작합니다...")
 
-        # 'subjects' 테이블(과목) 채우기
-        for subject_name in master_data.keys():
-            # 'INSERT OR IGNORE'로 과목 이름 삽입
-            cursor.execute("INSERT OR IGNORE INTO subjects (subject_name) VALUES (?)", (subject_name,))
-            
-            # 'units' 테이블(단원) 채우기 (과목 ID와 연결)
-            
-            # 방금 삽입(하거나 무시)한 과목의 subject_id를 다시 조회하여 가져옵니다.
-            cursor.execute("SELECT subject_id FROM subjects WHERE subject_name = ?", (subject_name,))
-            subject_id_result = cursor.fetchone() 
-            
-            if subject_id_result:
-                subject_id = subject_id_result[0] # ID 추출
-                
-                # 해당 과목에 속한 단원들을 'units' 테이블에 삽입
-                for unit_name in master_data[subject_name]:
-                    cursor.execute("INSERT OR IGNORE INTO units (unit_name, subject_id) VALUES (?, ?)", 
-                                   (unit_name, subject_id))
-            
-        # 모든 변경사항을 최종 저장
-        connection.commit()
+        # 오류 발생 시 transaction()이 작업을 되돌림
+        with db_manager.transaction(db_path, profile=profile) as cursor:
+            _populate_master_tables(cursor)
+
         print("마스터 테이블 데이터 삽입/업데이트가 완료되었습니다.")
 
     except sqlite3.Error as e:
         print(f"데이터베이스 작업 중 오류 발생: {e}")
-        if connection:
-            connection.rollback() # 오류 발생 시, 작업 되돌리기
-    finally:
-        if connection:
-            connection.close()
 
 # JSON 파일과 DB 동기화 함수
 def load_json(json_path):
@@ -264,12 +577,6 @@ def load_json(json_path):
     with open(json_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def connect_db(db_path):
-    """
-    SQLite DB 연결 객체를 반환하는 함수
-    """
-    return sqlite3.connect(db_path)
-
 def find_unit_id(cursor, subject_name, unit_name):
     """
     과목명·단원명으로부터 unit_id를 찾아 반환
@@ -304,25 +611,75 @@ def parse_ai_data(raw):
 
     pattern = raw.get('pattern_type', [])
     pitfalls = raw.get('pitfalls', [])
+    pattern_list = pattern if isinstance(pattern, list) else [str(pattern)]
+    pitfall_list = pitfalls if isinstance(pitfalls, list) else [str(pitfalls)]
 
     return {
-        "pattern_type": ", ".join(pattern) if isinstance(pattern, list) else str(pattern),
-        "pitfalls": ", ".join(pitfalls) if isinstance(pitfalls, list) else str(pitfalls),
+        # problems 테이블의 기존 TEXT 컬럼용 (하위 호환)
+        "pattern_type": ", ".join(pattern_list),
+        "pitfalls": ", ".join(pitfall_list),
+        # patterns / pitfalls 매핑 테이블용
+        "pattern_list": pattern_list,
+        "pitfall_list": pitfall_list,
         "logic_flow": raw.get('logic_flow', ''),
         "difficulty": raw.get('difficulty_level', 0),
         "core_concepts": raw.get('core_concepts', []),
     }
 
-def upsert_problem(cursor, item, unit_id, ai):
+def compute_content_hash(item):
+    """
+    JSON 문제 항목의 내용 해시(SHA-256)를 계산.
+    출처(source_data, 연도/월/번호), 과목/단원, 이미지 경로, ai_analysis를 대상으로 하며
+    ai_analysis는 문자열이면 파싱 후 키 정렬하여 직렬화 형식 차이에 영향을 받지 않도록 함.
+    """
+    ai_raw = item.get("ai_analysis")
+    if isinstance(ai_raw, str):
+        try:
+            ai_raw = json.loads(ai_raw)
+        except json.JSONDecodeError:
+            pass
+
+    payload = {
+        "source_data": item.get("source_data"),
+        "year": item.get("year"),
+        "month": item.get("month"),
+        "number": item.get("number"),
+        "subject_name": item.get("subject_name"),
+        "unit_name": item.get("unit_name"),
+        "problem_image_path": item.get("problem_image_path"),
+        "ai_analysis": ai_raw,
+    }
+    serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+def upsert_problem(cursor, item, unit_id, ai, content_hash=None):
     """
-    problem 데이터를 INSERT OR REPLACE로 db에 저장
+    problem 데이터를 db에 저장 (problem_id가 이미 있으면 UPDATE)
+    INSERT OR REPLACE와 달리 기존 행을 지우지 않으므로
+    problem_concept_map의 ON DELETE CASCADE가 발생하지 않음
+    content_hash를 주지 않으면 item으로 계산 (변경 로그 트리거가 해시로 실제 변경 여부를 판단하므로)
     """
+    if content_hash is None:
+        content_hash = compute_content_hash(item)
     cursor.execute("""
-        INSERT OR REPLACE INTO problems (
+        INSERT INTO problems (
             problem_id, source_text, year, month, number,
             unit_id, problem_type,
-            logic_structure, pitfalls, problem_image_path, difficulty_level
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            logic_structure, pitfalls, problem_image_path, difficulty_level,
+            content_hash
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(problem_id) DO UPDATE SET
+            source_text = excluded.source_text,
+            year = excluded.year,
+            month = excluded.month,
+            number = excluded.number,
+            unit_id = excluded.unit_id,
+            problem_type = excluded.problem_type,
+            logic_structure = excluded.logic_structure,
+            pitfalls = excluded.pitfalls,
+            problem_image_path = excluded.problem_image_path,
+            difficulty_level = excluded.difficulty_level,
+            content_hash = excluded.content_hash
     """, (
         item.get("problem_id"), 
         item.get("source_data", ""),
@@ -334,45 +691,484 @@ def upsert_problem(cursor, item, unit_id, ai):
         ai["logic_flow"],
         ai["pitfalls"],
         item.get("problem_image_path", ""),
-        ai["difficulty"]
+        ai["difficulty"],
+        content_hash
     ))
 
+# 용어 종류별 (용어 테이블, id 컬럼, 이름 컬럼, 매핑 테이블)
+VOCABULARIES = {
+    "concept": ("concepts", "concept_id", "concept_name", "problem_concept_map"),
+    "pattern": ("patterns", "pattern_id", "pattern_name", "problem_pattern_map"),
+    "pitfall": ("pitfalls", "pitfall_id", "pitfall_name", "problem_pitfall_map"),
+}
+
+def _clean_vocabulary_names(names):
+    """
+    용어 이름 정리: 문자열만, 앞뒤 공백 제거, 빈 값/중복 제거 (순서 유지)
+    """
+    clean_names = []
+    seen = set()
+    for name in names or []:
+        if not isinstance(name, str):
+            continue
+        name = name.strip()
+        if name and name not in seen:
+            seen.add(name)
+            clean_names.append(name)
+    return clean_names
+
+def _resolve_vocabulary_ids(cursor, kind, names, create: bool = True):
+    """
+    용어 이름 목록을 용어 테이블 id로 일괄 변환 (create=True면 없는 용어를 한 번에 추가)
+    반환: {용어 이름: 용어 id}
+    """
+    vocab_table, id_col, name_col, _ = VOCABULARIES[kind]
+    if not names:
+        return {}
+
+    placeholders = ", ".join("?" for _ in names)
+    select_sql = f"SELECT {name_col}, {id_col} FROM {vocab_table} WHERE {name_col} IN ({placeholders})"
+
+    cursor.execute(select_sql, names)
+    known = dict(cursor.fetchall())
+
+    missing = [name for name in names if name not in known]
+    if missing and create:
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO {vocab_table} ({name_col}) VALUES (?)",
+            [(name,) for name in missing]
+        )
+        cursor.execute(select_sql, names)
+        known = dict(cursor.fetchall())
+    return known
+
+def _sync_vocabulary(cursor, kind, problem_id, names):
+    """
+    문제와 용어(개념/유형/함정)의 연결 관계를 최신 상태로 동기화
+    기존 매핑 id 집합과 목표 id 집합의 차이만 일괄 삭제/추가
+    (내용이 같으면 쓰기 없음 -> 인덱스 갱신, 외래키 확인, 변경 로그 기록이 발생하지 않음)
+    반환: (추가한 매핑 수, 삭제한 매핑 수)
+    """
+    _, id_col, _, map_table = VOCABULARIES[kind]
+
+    clean_names = _clean_vocabulary_names(names)
+    name_to_id = _resolve_vocabulary_ids(cursor, kind, clean_names)
+    desired_ids = [name_to_id[name] for name in clean_names if name in name_to_id]
+
+    cursor.execute(f"SELECT {id_col} FROM {map_table} WHERE problem_id = ?", (problem_id,))
+    existing_ids = {row[0] for row in cursor.fetchall()}
+
+    desired_set = set(desired_ids)
+    to_delete = existing_ids - desired_set
+    to_insert = [vocab_id for vocab_id in desired_ids if vocab_id not in existing_ids]
+
+    if to_delete:
+        cursor.executemany(
+            f"DELETE FROM {map_table} WHERE problem_id = ? AND {id_col} = ?",
+            [(problem_id, vocab_id) for vocab_id in to_delete]
+        )
+    if to_insert:
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO {map_table} (problem_id, {id_col}) VALUES (?, ?)",
+            [(problem_id, vocab_id) for vocab_id in to_insert]
+        )
+    return len(to_insert), len(to_delete)
+
 def sync_concepts(cursor, problem_id, concepts):
     """
     문제와 개념의 연결 관계를 최신 상태로 동기화
     """
-    cursor.execute("DELETE FROM problem_concept_map WHERE problem_id = ?", (problem_id,))
+    return _sync_vocabulary(cursor, "concept", problem_id, concepts)
 
-    for name in concepts:
-        name = name.strip()
-        if not name:
+def sync_patterns(cursor, problem_id, patterns):
+    """
+    문제와 유형(pattern_type)의 연결 관계를 최신 상태로 동기화
+    """
+    return _sync_vocabulary(cursor, "pattern", problem_id, patterns)
+
+def sync_pitfalls(cursor, problem_id, pitfalls):
+    """
+    문제와 함정(pitfalls)의 연결 관계를 최신 상태로 동기화
+    """
+    return _sync_vocabulary(cursor, "pitfall", problem_id, pitfalls)
+
+def migrate_vocabulary_maps(cursor):
+    """
+    [마이그레이션] 매핑이 없는 기존 문제의 problem_type / pitfalls TEXT 컬럼을
+    ", " 기준으로 분리하여 patterns / pitfalls 매핑 테이블로 옮김
+    (새로 동기화되는 문제는 원본 리스트를 그대로 사용하므로 이 경로를 타지 않음)
+    반환: {"pattern": 이전한 문제 수, "pitfall": 이전한 문제 수}
+    """
+    _create_vocabulary_schema(cursor)
+
+    migrated = {}
+    for kind, column in (("pattern", "problem_type"), ("pitfall", "pitfalls")):
+        map_table = VOCABULARIES[kind][3]
+        cursor.execute(f"""
+            SELECT p.problem_id, p.{column}
+            FROM problems p
+            WHERE p.{column} IS NOT NULL AND p.{column} != ''
+              AND NOT EXISTS (SELECT 1 FROM {map_table} m WHERE m.problem_id = p.problem_id)
+        """)
+        rows = cursor.fetchall()
+
+        for problem_id, text in rows:
+            text = decode_column_text(cursor, text)
+            _sync_vocabulary(cursor, kind, problem_id, text.split(", "))
+        migrated[kind] = len(rows)
+
+    return migrated
+
+def migrate_vocabulary_tables(is_user_db: bool = False, db_path = None):
+    """
+    기존 DB에 patterns / pitfalls 테이블을 만들고 기존 문제 데이터를 이전
+    """
+    if db_path is None:
+        db_path = path["user_db"] if is_user_db else path["db"]
+
+    try:
+        with db_manager.transaction(db_path, profile="default") as cursor:
+            migrated = migrate_vocabulary_maps(cursor)
+    except Exception as e:
+        print(f"[용어 테이블 마이그레이션 실패] {e}")
+        return
+
+    print(f"✅ 용어 테이블 마이그레이션 완료: 유형 {migrated['pattern']}문제, 함정 {migrated['pitfall']}문제")
+    return migrated
+
+def sync_problem_items(cursor, items, delete_missing: bool = False, existing_hashes: dict = None):
+    """
+    문제 항목(dict)들을 내용 해시 비교로 DB와 동기화
+    - 저장된 content_hash와 같은 문제는 건너뜀 (unchanged)
+    - 해시가 다르거나 없는 문제만 upsert + 개념 매핑 동기화 (inserted / updated)
+    - delete_missing=True면 items에 없는 문제를 DB에서 삭제 (deleted, 기본 꺼짐)
+      items가 전체 원본일 때(재구축)만 켤 것: insert_meta_data_user_db() 등으로 따로 쓴 문제도 지워짐
+    - existing_hashes: {problem_id: content_hash} (배치로 나눠 호출할 때 한 번만 조회하여 전달)
+    반환: {"inserted", "updated", "unchanged", "deleted", "failed"} 개수 딕셔너리
+    """
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0, "failed": 0}
+
+    if existing_hashes is None:
+        cursor.execute("SELECT problem_id, content_hash FROM problems")
+        existing_hashes = dict(cursor.fetchall())
+    seen_ids = set()
+
+    # 문제별 SAVEPOINT가 곧바로 커밋되지 않도록 바깥 트랜잭션을 먼저 연다
+    if not cursor.connection.in_transaction:
+        cursor.execute("BEGIN")
+
+    for item in items:
+        problem_id = item.get("problem_id")
+        if not problem_id:
             continue
+        seen_ids.add(problem_id)
 
-        cursor.execute("SELECT concept_id FROM concepts WHERE concept_name = ?", (name,))
-        res = cursor.fetchone()
+        content_hash = compute_content_hash(item)
+        if problem_id in existing_hashes and existing_hashes[problem_id] == content_hash:
+            stats["unchanged"] += 1
+            continue
 
-        if res:
-            concept_id = res[0]
-        else:
-            cursor.execute("INSERT INTO concepts (concept_name) VALUES (?)", (name,))
-            concept_id = cursor.lastrowid
+        # 한 문제 처리 중 오류가 나면 그 문제의 변경분만 되돌림 (해시만 저장되는 상황 방지)
+        cursor.execute("SAVEPOINT sync_item")
+        try:
+            unit_id = find_unit_id(cursor, item.get("subject_name"), item.get("unit_name"))
+            ai = parse_ai_data(item.get("ai_analysis"))
 
-        cursor.execute(
-            "INSERT OR IGNORE INTO problem_concept_map (problem_id, concept_id) VALUES (?, ?)",
-            (problem_id, concept_id)
-        )
+            upsert_problem(cursor, item, unit_id, ai, content_hash=content_hash)
+            sync_concepts(cursor, problem_id, ai["core_concepts"])
+            sync_patterns(cursor, problem_id, ai["pattern_list"])
+            sync_pitfalls(cursor, problem_id, ai["pitfall_list"])
+
+            stats["updated" if problem_id in existing_hashes else "inserted"] += 1
+            existing_hashes[problem_id] = content_hash
+
+        except Exception as e:
+            cursor.execute("ROLLBACK TO sync_item")
+            stats["failed"] += 1
+            print(f"ID {problem_id} 처리 실패: {e}")
+        finally:
+            cursor.execute("RELEASE sync_item")
+
+    if delete_missing:
+        stale_ids = [(problem_id,) for problem_id in existing_hashes if problem_id not in seen_ids]
+        if stale_ids:
+            # problem_concept_map은 ON DELETE CASCADE로 함께 삭제
+            cursor.executemany("DELETE FROM problems WHERE problem_id = ?", stale_ids)
+            print(f"  [삭제] 목록에 없는 문제 {len(stale_ids)}개를 DB에서 삭제했습니다.")
+        stats["deleted"] = len(stale_ids)
+
+    return stats
+
+def _prepare_sync_schema(cursor):
+    """
+    동기화 전 기존 DB 스키마를 최신으로 맞춤
+    - problems.content_hash 컬럼 추가
+    - patterns / pitfalls 용어 매핑 이전 (해시가 같아 건너뛰는 기존 문제도 매핑을 갖도록)
+    - problem_changes 변경 로그 테이블/트리거 생성
+    """
+    _ensure_columns(cursor, "problems", [("content_hash", "TEXT")])
+    migrate_vocabulary_maps(cursor)
+    _create_change_log_schema(cursor)
+
+def get_db_version(cursor):
+    """
+    DB 데이터 버전 (PRAGMA user_version) 조회
+    """
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+def bump_db_version(cursor):
+    """
+    DB 데이터 버전을 1 증가시키고 새 버전을 반환 (호출한 트랜잭션과 함께 커밋됨)
+    """
+    version = get_db_version(cursor) + 1
+    cursor.execute(f"PRAGMA user_version = {version}")
+    return version
+
+def get_latest_change_seq(cursor):
+    """
+    problem_changes의 마지막 seq (기록이 없으면 0)
+    정리(DELETE)로 행이 비어도 AUTOINCREMENT 카운터 값을 반환
+    """
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'problem_changes'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def get_changes_since(since_seq: int = 0, db_path = None, limit: int = None, profile: str = "search"):
+    """
+    [변경 로그] seq가 since_seq보다 큰 변경 기록을 순서대로 조회
+    반환: [{"seq", "problem_id", "table_name", "operation", "changed_at"}, ...]
+    """
+    if db_path is None:
+        db_path = path["db"]
+
+    query = """
+        SELECT seq, problem_id, table_name, operation, changed_at
+        FROM problem_changes
+        WHERE seq > ?
+        ORDER BY seq
+    """
+    params = [since_seq]
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    with db_manager.cursor(db_path, profile=profile) as cursor:
+        cursor.execute(query, params)
+        return [
+            {"seq": row[0], "problem_id": row[1], "table_name": row[2], "operation": row[3], "changed_at": row[4]}
+            for row in cursor.fetchall()
+        ]
+
+def get_changed_problem_ids_since(since_seq: int = 0, db_path = None, profile: str = "search"):
+    """
+    [변경 로그] since_seq 이후 변경된 problem_id 집합 (캐시/인덱스/스냅샷 증분 갱신용)
+    반환: {"latest_seq", "problem_ids", "deleted_ids", "full_reload"}
+    - deleted_ids: 마지막 변경이 problems 행 삭제인 문제
+    - full_reload: since_seq가 현재 seq보다 크면 (DB 초기화 등으로 로그가 재시작됨) True
+    """
+    if db_path is None:
+        db_path = path["db"]
+
+    with db_manager.cursor(db_path, profile=profile) as cursor:
+        latest_seq = get_latest_change_seq(cursor)
+        if since_seq > latest_seq:
+            return {"latest_seq": latest_seq, "problem_ids": set(), "deleted_ids": set(), "full_reload": True}
+
+        cursor.execute("""
+            SELECT problem_id, table_name, operation
+            FROM problem_changes
+            WHERE seq > ? AND seq <= ?
+            ORDER BY seq
+        """, (since_seq, latest_seq))
+
+        last_problem_op = {}
+        problem_ids = set()
+        for problem_id, table_name, operation in cursor.fetchall():
+            problem_ids.add(problem_id)
+            if table_name == "problems":
+                last_problem_op[problem_id] = operation
+
+    deleted_ids = {problem_id for problem_id, operation in last_problem_op.items() if operation == "DELETE"}
+    return {"latest_seq": latest_seq, "problem_ids": problem_ids, "deleted_ids": deleted_ids, "full_reload": False}
+
+def prune_problem_changes(before_seq: int, db_path = None):
+    """
+    [변경 로그] seq가 before_seq 이하인 오래된 기록 삭제 (seq 카운터는 유지됨)
+    problem_changes에서 허용되는 유일한 삭제 경로: 같은 트랜잭션 안에서 삭제 방지 트리거를 내렸다가 다시 만듦
+    반환: 삭제한 행 수
+    """
+    if db_path is None:
+        db_path = path["db"]
+
+    with db_manager.transaction(db_path) as cursor:
+        cursor.execute("DROP TRIGGER IF EXISTS trg_problem_changes_no_delete")
+        cursor.execute("DELETE FROM problem_changes WHERE seq <= ?", (before_seq,))
+        deleted = cursor.rowcount
+        cursor.execute(PROBLEM_CHANGES_NO_DELETE_TRIGGER)
+        return deleted
+
+def decode_column_text(cursor, value):
+    """
+    [읽기] 압축된 텍스트 컬럼 값을 해제 (압축값이 아니면 그대로 반환)
+    처음 보는 사전 키는 커서의 DB(또는 ATTACH된 DB)의 text_dictionaries에서 읽어 등록
+    """
+    if not is_compressed(value):
+        return value
+
+    key = compressed_dictionary_key(value)
+    if not has_dictionary(key):
+        _load_text_dictionary(cursor, key)
+    return decode_text(value)
+
+def _load_text_dictionary(cursor, key):
+    cursor.execute("SELECT name FROM pragma_database_list")
+    schemas = [row[0] for row in cursor.fetchall()]
+    for schema in schemas:
+        try:
+            cursor.execute(f"SELECT dictionary FROM {schema}.text_dictionaries WHERE dict_key = ?", (key,))
+        except sqlite3.OperationalError:
+            # 사전 테이블이 없는 DB (압축을 한 번도 하지 않은 DB)
+            continue
+        row = cursor.fetchone()
+        if row:
+            register_dictionary(row[0])
+            return
+    raise KeyError(f"압축 사전을 찾을 수 없습니다: {key.hex()}")
+
+def _get_text_dictionary(cursor, column, retrain: bool = False, dict_size: int = 32768):
+    """
+    컬럼의 최신 사전을 반환 (없거나 retrain=True면 현재 평문 값으로 학습하여 저장)
+    """
+    if not retrain:
+        cursor.execute("""
+            SELECT dictionary FROM text_dictionaries
+            WHERE column_name = ?
+            ORDER BY created_at DESC LIMIT 1
+        """, (column,))
+        row = cursor.fetchone()
+        if row:
+            register_dictionary(row[0])
+            return row[0]
+
+    cursor.execute(f"SELECT {column} FROM problems WHERE typeof({column}) = 'text'")
+    dictionary = train_dictionary((row[0] for row in cursor.fetchall()), dict_size=dict_size)
+    if not dictionary:
+        return None
+
+    key = register_dictionary(dictionary)
+    cursor.execute(
+        "INSERT OR IGNORE INTO text_dictionaries (dict_key, column_name, dictionary) VALUES (?, ?, ?)",
+        (key, column, dictionary)
+    )
+    return dictionary
 
-def sync_database_from_json(json_path, db_path = None,  is_user_db : bool = False):
+def compress_text_columns(db_path = None, columns: list = None, retrain: bool = False, vacuum: bool = True):
+    """
+    [압축] problems의 긴 텍스트 컬럼(기본: config.text_compression["columns"])을
+    컬럼별 학습 사전 + zlib으로 압축하여 같은 컬럼에 BLOB으로 저장
+    - 평문(TEXT)으로 남아 있는 값만 압축하므로 동기화 후 반복 실행해도 새로 쓰인 행만 처리
+    - 압축 결과가 평문보다 크거나 min_length보다 짧은 값은 그대로 둠
+    - 읽기 경로(_build_candidates 등)는 decode_column_text()로 자동 해제
+    - vacuum=True면 압축 후 VACUUM으로 파일 크기를 실제로 줄임
+    - 저장 형식만 바뀌고 content_hash는 그대로이므로 problem_changes에 기록되지 않음
+      (이전 버전 DB의 조건 없는 UPDATE 트리거는 먼저 _create_change_log_schema()로 교체)
+    반환: {컬럼: {"rows": 압축한 행 수, "before": 평문 바이트, "after": 압축 바이트}}
+    """
+    if db_path is None:
+        db_path = path["db"]
+    columns = columns or text_compression["columns"]
+    min_length = text_compression["min_length"]
+
+    stats = {}
+    try:
+        with db_manager.transaction(db_path, profile="default") as cursor:
+            _create_change_log_schema(cursor)
+            _create_text_dictionary_schema(cursor)
+
+            for column in columns:
+                dictionary = _get_text_dictionary(
+                    cursor, column, retrain=retrain, dict_size=text_compression["dict_size"]
+                )
+                if dictionary is None:
+                    stats[column] = {"rows": 0, "before": 0, "after": 0}
+                    continue
+
+                cursor.execute(f"""
+                    SELECT problem_id, {column} FROM problems
+                    WHERE typeof({column}) = 'text' AND length({column}) >= ?
+                """, (min_length,))
+
+                updates = []
+                before_bytes = after_bytes = 0
+                for problem_id, text in cursor.fetchall():
+                    plain_size = len(text.encode("utf-8"))
+                    blob = compress_text(text, dictionary, level=text_compression["level"])
+                    if len(blob) >= plain_size:
+                        continue
+                    updates.append((blob, problem_id))
+                    before_bytes += plain_size
+                    after_bytes += len(blob)
+
+                cursor.executemany(f"UPDATE problems SET {column} = ? WHERE problem_id = ?", updates)
+                stats[column] = {"rows": len(updates), "before": before_bytes, "after": after_bytes}
+
+        if vacuum:
+            connection = db_manager.get_connection(db_path, profile="default")
+            connection.execute("VACUUM")
+
+        for column, stat in stats.items():
+            ratio = stat["after"] / stat["before"] * 100 if stat["before"] else 0
+            print(f"  - {column}: {stat['rows']}행 압축 ({stat['before']:,}B -> {stat['after']:,}B, {ratio:.1f}%)")
+        print("✅ 텍스트 컬럼 압축 완료")
+        return stats
+
+    except Exception as e:
+        print(f"[텍스트 컬럼 압축 중 오류] {e}")
+        return None
+
+def decompress_text_columns(db_path = None, columns: list = None, vacuum: bool = True):
+    """
+    [압축 해제] 압축된 텍스트 컬럼을 다시 평문(TEXT)으로 되돌림 (압축과 마찬가지로 변경 로그에 기록되지 않음)
+    반환: {컬럼: 해제한 행 수}
+    """
+    if db_path is None:
+        db_path = path["db"]
+    columns = columns or text_compression["columns"]
+
+    stats = {}
+    try:
+        with db_manager.transaction(db_path, profile="default") as cursor:
+            _create_change_log_schema(cursor)
+            for column in columns:
+                cursor.execute(f"SELECT problem_id, {column} FROM problems WHERE typeof({column}) = 'blob'")
+                updates = [
+                    (decode_column_text(cursor, value), problem_id)
+                    for problem_id, value in cursor.fetchall()
+                    if is_compressed(value)
+                ]
+                cursor.executemany(f"UPDATE problems SET {column} = ? WHERE problem_id = ?", updates)
+                stats[column] = len(updates)
+
+        if vacuum:
+            connection = db_manager.get_connection(db_path, profile="default")
+            connection.execute("VACUUM")
+
+        print(f"✅ 텍스트 컬럼 압축 해제 완료: {stats}")
+        return stats
+
+    except Exception as e:
+        print(f"[텍스트 컬럼 압축 해제 중 오류] {e}")
+        return None
+
+def sync_database_from_json(json_path, db_path = None,  is_user_db : bool = False, profile: str = "default", delete_missing: bool = False):
     """
     1) JSON 로드
     2) DB 연결
-    3) 문제 단위 반복 처리
-    4) find_unit_id()
-    5) parse_ai_data()
-    6) upsert_problem()
-    7) sync_concepts()
-    8) 커밋
-    9) 로그 출력
+    3) sync_problem_items()로 내용 해시가 바뀐 문제만 동기화
+       (find_unit_id() -> parse_ai_data() -> upsert_problem() -> sync_concepts/patterns/pitfalls())
+    4) 커밋
+    5) 신규/변경/동일/삭제 개수 로그 출력 및 반환
     """
 
     print(f"\n--- DB 동기화 시작 ---")
@@ -388,36 +1184,130 @@ def sync_database_from_json(json_path, db_path = None,  is_user_db : bool = Fals
         db_path = path["user_db"] if is_user_db else path["db"]
 
     try:
-        conn = connect_db(db_path)
-        cur = conn.cursor()
-        # 외래키 제약 활성화
-        cur.execute("PRAGMA foreign_keys = ON;") 
+        # 외래키 제약은 프로파일에서 활성화
+        with db_manager.transaction(db_path, profile=profile) as cur:
+            _prepare_sync_schema(cur)
+            stats = sync_problem_items(cur, data, delete_missing=delete_missing)
+            # 내용이 바뀐 경우에만 DB 버전 증가 (코퍼스 스냅샷 최신 여부 판단용)
+            if stats["inserted"] or stats["updated"] or stats["deleted"]:
+                bump_db_version(cur)
     except Exception as e:
-        print(f"DB 연결 실패: {e}")
+        print(f"DB 동기화 실패: {e}")
         return
-    updated = 0
 
-    for item in data:
-        try:
-            problem_id = item.get("problem_id")
-            if not problem_id:
-                continue
+    print(f"--- 동기화 완료: 신규 {stats['inserted']}개, 변경 {stats['updated']}개, "
+          f"동일 {stats['unchanged']}개, 삭제 {stats['deleted']}개, 실패 {stats['failed']}개 ---")
+    return stats
 
-            unit_id = find_unit_id(cur, item.get("subject_name"), item.get("unit_name"))
-            ai = parse_ai_data(item.get("ai_analysis"))
+def upsert_problem_items(items: list, db_path = None, is_user_db: bool = False, profile: str = "default",
+                         delete_missing: bool = False):
+    """
+    JSON 형식의 문제 항목(dict)을 DB에 반영
+    sync_database_from_json()과 같은 내용 해시 비교를 사용
+    delete_missing=False(기본)면 목록에 없는 문제는 삭제하지 않음
+    반환: sync_problem_items()의 개수 딕셔너리
+    """
+    if db_path is None:
+        db_path = path["user_db"] if is_user_db else path["db"]
 
-            upsert_problem(cur, item, unit_id, ai)
-            sync_concepts(cur, problem_id, ai["core_concepts"])
+    with db_manager.transaction(db_path, profile=profile) as cur:
+        _prepare_sync_schema(cur)
+        stats = sync_problem_items(cur, items, delete_missing=delete_missing)
+        if stats["inserted"] or stats["updated"] or stats["deleted"]:
+            bump_db_version(cur)
+    return stats
 
-            updated += 1
+def _iter_batches(items, batch_size):
+    """
+    이터러블을 batch_size개씩 리스트로 묶어 반환
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def sync_database_from_excel(excel_path = None, db_path = None, is_user_db: bool = False, profile: str = "default",
+                             delete_missing: bool = False, batch_size: int = 200, json_export_path = None):
+    """
+    엑셀(base_problems.xlsx)을 JSON을 거치지 않고 바로 DB에 동기화
+    1) iter_excel_problem_items()로 워크북을 한 행씩 읽음 (openpyxl 읽기 전용)
+    2) batch_size개씩 sync_problem_items()로 내용 해시가 바뀐 문제만 반영
+    3) delete_missing=True면 엑셀에 없는 문제 삭제 (기본 꺼짐, 엑셀이 전체 원본일 때만 켤 것)
+    json_export_path를 주면 같은 데이터를 JSON 파일로도 내보냄 (선택)
+    반환: {"inserted", "updated", "unchanged", "deleted", "failed"} 개수 딕셔너리
+    """
+    if excel_path is None:
+        excel_path = path["user_base_problems_xlsx"] if is_user_db else path["base_problems_xlsx"]
+    if db_path is None:
+        db_path = path["user_db"] if is_user_db else path["db"]
 
-        except Exception as e:
-            print(f"ID {item.get('problem_id')} 처리 실패: {e}")
+    print(f"\n--- DB 동기화 시작 (Excel 직접 적재) ---")
+    print(f"Source: {excel_path}")
 
-    conn.commit()
-    conn.close()
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0, "failed": 0}
+    json_file = None
+    json_tmp_path = None
+    try:
+        if json_export_path:
+            # JSON은 임시 파일에 한 문제씩 기록한 뒤 성공 시 교체
+            json_tmp_path = f"{json_export_path}.tmp"
+            json_file = open(json_tmp_path, "w", encoding="utf-8")
+            json_file.write("[")
+
+        with db_manager.transaction(db_path, profile=profile) as cur:
+            _prepare_sync_schema(cur)
+
+            cur.execute("SELECT problem_id, content_hash FROM problems")
+            existing_hashes = dict(cur.fetchall())
+            stored_ids = set(existing_hashes)
+            seen_ids = set()
+            exported = 0
+
+            for batch in _iter_batches(iter_excel_problem_items(excel_path), batch_size):
+                batch_stats = sync_problem_items(cur, batch, delete_missing=False, existing_hashes=existing_hashes)
+                for key in ("inserted", "updated", "unchanged", "failed"):
+                    stats[key] += batch_stats[key]
+                seen_ids.update(item.get("problem_id") for item in batch if item.get("problem_id"))
+
+                if json_file:
+                    for item in batch:
+                        json_file.write(",\n" if exported else "\n")
+                        json_file.write(json.dumps(item, ensure_ascii=False, indent=4))
+                        exported += 1
+
+            if delete_missing:
+                stale_ids = [(problem_id,) for problem_id in stored_ids if problem_id not in seen_ids]
+                if stale_ids:
+                    cur.executemany("DELETE FROM problems WHERE problem_id = ?", stale_ids)
+                    print(f"  [삭제] 엑셀에 없는 문제 {len(stale_ids)}개를 DB에서 삭제했습니다.")
+                stats["deleted"] = len(stale_ids)
+
+            if stats["inserted"] or stats["updated"] or stats["deleted"]:
+                bump_db_version(cur)
+
+        if json_file:
+            json_file.write("\n]\n")
+            json_file.close()
+            json_file = None
+            os.replace(json_tmp_path, json_export_path)
+            print(f"✅ JSON 내보내기 완료: {json_export_path} ({exported}개)")
+
+    except Exception as e:
+        print(f"DB 동기화 실패: {e}")
+        return
+    finally:
+        if json_file:
+            json_file.close()
+        if json_tmp_path and os.path.exists(json_tmp_path):
+            os.remove(json_tmp_path)
 
-    print(f"--- 동기화 완료: {updated}개 업데이트 ---")
+    print(f"--- 동기화 완료: 신규 {stats['inserted']}개, 변경 {stats['updated']}개, "
+          f"동일 {stats['unchanged']}개, 삭제 {stats['deleted']}개, 실패 {stats['failed']}개 ---")
+    return stats
 
 def __sync_database_from_json():
     """
@@ -445,7 +1335,7 @@ def __sync_database_from_json():
 
     connection = None
     try:
-        connection = sqlite3.connect(db_path)
+        connection = connect_db(db_path, profile="default")
         cursor = connection.cursor()
         
         success_count = 0
@@ -575,119 +1465,175 @@ def insert_meta_data_user_db(problems: list, is_user_db: bool = True):
     db_path = path["user_db"] if is_user_db else path["db"]
     print(f"\n--- DB 직접 저장 시작 ({'User DB' if is_user_db else 'System DB'}) ---")
     
-    connection = None
+    success_count = 0
     try:
-        connection = sqlite3.connect(db_path)
-        cursor = connection.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON;")
-
-        success_count = 0
+        with db_manager.transaction(db_path) as cursor:
+            for prob in problems:
+                try:
+                    # Pydantic 모델 -> 딕셔너리 변환
+                    item = prob.model_dump(exclude_none=True)
 
-        for prob in problems:
-            try:
-                # Pydantic 모델 -> 딕셔너리 변환
-                item = prob.model_dump(exclude_none=True)
-
-                unit_id = find_unit_id(cursor, prob.subject_name, prob.unit_name)
+                    unit_id = find_unit_id(cursor, prob.subject_name, prob.unit_name)
 
-                ai_obj = prob.ai_analysis
+                    ai_obj = prob.ai_analysis
                 
-                # upsert_problem이 기대하는 ai 딕셔너리 구조 생성
-                ai_data_formatted = {
-                    "pattern_type": ", ".join(ai_obj.pattern_type) if ai_obj else "",
-                    "logic_flow": ai_obj.logic_flow if ai_obj else "",
-                    "pitfalls": ", ".join(ai_obj.pitfalls) if ai_obj else "",
-                    "difficulty": ai_obj.difficulty_level if ai_obj else 0,
-                    # core_concepts는 별도 sync_concepts에서 사용
-                }
-
-                # item 딕셔너리에 필요한 키가 없으면 채워넣음 
-                if "source_data" not in item:
-                    item["source_data"] = f"{prob.year} {prob.month} {prob.subject_name} {prob.number}번"
+                    # upsert_problem이 기대하는 ai 딕셔너리 구조 생성
+                    ai_data_formatted = {
+                        "pattern_type": ", ".join(ai_obj.pattern_type) if ai_obj else "",
+                        "logic_flow": ai_obj.logic_flow if ai_obj else "",
+                        "pitfalls": ", ".join(ai_obj.pitfalls) if ai_obj else "",
+                        "difficulty": ai_obj.difficulty_level if ai_obj else 0,
+                        # core_concepts는 별도 sync_concepts에서 사용
+                    }
+
+                    # item 딕셔너리에 필요한 키가 없으면 채워넣음 
+                    if "source_data" not in item:
+                        item["source_data"] = f"{prob.year} {prob.month} {prob.subject_name} {prob.number}번"
                 
-                upsert_problem(cursor, item, unit_id, ai_data_formatted)
+                    upsert_problem(cursor, item, unit_id, ai_data_formatted)
+
+                    current_pid = item.get("problem_id")
+                    if not current_pid:
+                        current_pid = cursor.lastrowid # 방금 INSERT된 행의 ID (Auto Increment)
 
-                current_pid = item.get("problem_id")
-                if not current_pid:
-                    current_pid = cursor.lastrowid # 방금 INSERT된 행의 ID (Auto Increment)
+                    if ai_obj and ai_obj.core_concepts and current_pid:
+                        sync_concepts(cursor, current_pid, ai_obj.core_concepts)
 
-                if ai_obj and ai_obj.core_concepts and current_pid:
-                    sync_concepts(cursor, current_pid, ai_obj.core_concepts)
+                    if ai_obj and current_pid:
+                        sync_patterns(cursor, current_pid, ai_obj.pattern_type)
+                        sync_pitfalls(cursor, current_pid, ai_obj.pitfalls)
                 
-                success_count += 1
+                    success_count += 1
 
-            except Exception as e:
-                print(f" 문제 저장 실패 (Num: {prob.number}): {e}")
+                except Exception as e:
+                    print(f" 문제 저장 실패 (Num: {prob.number}): {e}")
 
-        connection.commit()
         print(f"✅ 총 {success_count}개의 문제를 DB에 성공적으로 저장했습니다.")
 
     except Exception as e:
+        # 롤백은 transaction()이 처리
         print(f"DB 저장 중 치명적 오류: {e}")
-        if connection: connection.rollback()
-    finally:
-        if connection: connection.close()
 
-def get_problem_candidates_by_unit(subject_name: str, unit_name: str):
+# 유사도 분석에 필요한 컬럼만 조회
+_CANDIDATE_COLUMNS = """
+    SELECT 
+        p.problem_id, 
+        p.problem_type, 
+        p.logic_structure, 
+        p.pitfalls, 
+        p.difficulty_level,
+        p.problem_image_path,
+        p.source_text
+    FROM problems p
+"""
+
+def _fetch_vocabulary(cursor, kind, problem_ids):
+    """
+    problem_id 목록의 용어(id, 이름)를 한 번의 쿼리로 조회
+    반환: {problem_id: [(용어 id, 용어 이름), ...]}
+    """
+    vocab_table, id_col, name_col, map_table = VOCABULARIES[kind]
+    placeholders = ", ".join("?" for _ in problem_ids)
+
+    try:
+        cursor.execute(f"""
+            SELECT m.problem_id, v.{id_col}, v.{name_col}
+            FROM {map_table} m
+            JOIN {vocab_table} v ON v.{id_col} = m.{id_col}
+            WHERE m.problem_id IN ({placeholders})
+            ORDER BY m.map_id
+        """, list(problem_ids))
+    except sqlite3.OperationalError:
+        # 아직 마이그레이션되지 않은 DB (용어 테이블 없음) -> 기존 TEXT 컬럼 사용
+        # 검색 연결은 읽기 전용이므로 여기서 마이그레이션하지 않음
+        return {}
+
+    vocab = {}
+    for problem_id, vocab_id, name in cursor.fetchall():
+        vocab.setdefault(problem_id, []).append((vocab_id, name))
+    return vocab
+
+def _build_candidates(cursor, rows):
+    """
+    problems 조회 결과(rows)에 개념/유형/함정 용어를 붙여 후보 딕셔너리 리스트로 변환
+    - *_ids: 용어 테이블의 정수 id (유사도 집합 연산용)
+    - 매핑이 아직 없는(마이그레이션 전) 문제는 기존 TEXT 컬럼을 분리하여 사용
+    """
+    if not rows:
+        return []
+
+    problem_ids = [row[0] for row in rows]
+    concepts = _fetch_vocabulary(cursor, "concept", problem_ids)
+    patterns = _fetch_vocabulary(cursor, "pattern", problem_ids)
+    pitfalls = _fetch_vocabulary(cursor, "pitfall", problem_ids)
+
+    candidates = []
+    for row in rows:
+        row = [decode_column_text(cursor, value) for value in row]
+        p_id = row[0]
+        pattern_terms = patterns.get(p_id)
+        pitfall_terms = pitfalls.get(p_id)
+        concept_terms = concepts.get(p_id, [])
+        
+        # 딕셔너리로 구조화
+        candidate = {
+            "problem_id": p_id,
+            "pattern_type": [name for _, name in pattern_terms] if pattern_terms else (row[1].split(', ') if row[1] else []),
+            "logic_flow": row[2],
+            "pitfalls": [name for _, name in pitfall_terms] if pitfall_terms else (row[3].split(', ') if row[3] else []),
+            "difficulty_level": row[4],
+            "problem_image_path": row[5],
+            "source_text": row[6],
+            "core_concepts": [name for _, name in concept_terms],
+            "concept_ids": [vocab_id for vocab_id, _ in concept_terms],
+            "pattern_ids": [vocab_id for vocab_id, _ in pattern_terms or []],
+            "pitfall_ids": [vocab_id for vocab_id, _ in pitfall_terms or []]
+        }
+        candidates.append(candidate)
+
+    return candidates
+
+def get_vocabulary_ids(kind: str, names: list, db_path = None, profile: str = "search"):
+    """
+    [검색] 사용자 문제의 용어 이름을 probdex.db 용어 테이블의 id로 변환
+    probdex.db에 없는 용어는 서로 겹치지 않는 음수 id를 부여하여
+    자카드 유사도의 합집합 크기에는 포함되고 교집합에는 포함되지 않도록 함
+    """
+    if db_path is None:
+        db_path = path["db"] # 시스템 DB
+
+    clean_names = _clean_vocabulary_names(names)
+    if not clean_names:
+        return []
+
+    try:
+        with db_manager.cursor(db_path, profile=profile) as cursor:
+            known = _resolve_vocabulary_ids(cursor, kind, clean_names, create=False)
+    except Exception as e:
+        print(f"용어 id 조회 실패: {e}")
+        known = {}
+
+    return [known.get(name, -(idx + 1)) for idx, name in enumerate(clean_names)]
+
+def get_problem_candidates_by_unit(subject_name: str, unit_name: str, db_path = None, profile: str = "search"):
     """
     [검색] 
     probdex.db에서 동일한 과목/단원을 가진 문제들의
     핵심 정보(ID, AI분석, 이미지경로)를 모두 가져옵니다.
     """
-    db_path = path["db"] # 시스템 DB
-    candidates = []
+    if db_path is None:
+        db_path = path["db"] # 시스템 DB
     
     try:
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            
+        with db_manager.cursor(db_path, profile=profile) as cursor:
             # 해당 과목/단원의 unit_id 찾기
             unit_id = find_unit_id(cursor, subject_name, unit_name)
             if not unit_id:
                 print(f"검색 대상 단원({subject_name} > {unit_name})이 DB에 없습니다.")
                 return []
 
-            # 유사도 분석에 필요한 컬럼만 조회
-            query = """
-                SELECT 
-                    p.problem_id, 
-                    p.problem_type, 
-                    p.logic_structure, 
-                    p.pitfalls, 
-                    p.difficulty_level,
-                    p.problem_image_path,
-                    p.source_text
-                FROM problems p
-                WHERE p.unit_id = ?
-            """
-            cursor.execute(query, (unit_id,))
-            rows = cursor.fetchall()
-            
-            # 각 문제별 Core Concepts 조회 
-            for row in rows:
-                p_id = row[0]
-                
-                # 개념 조회
-                cursor.execute("""
-                    SELECT c.concept_name 
-                    FROM concepts c
-                    JOIN problem_concept_map pcm ON c.concept_id = pcm.concept_id
-                    WHERE pcm.problem_id = ?
-                """, (p_id,))
-                concepts = [c[0] for c in cursor.fetchall()]
-                
-                # 딕셔너리로 구조화
-                candidate = {
-                    "problem_id": p_id,
-                    "pattern_type": row[1].split(', ') if row[1] else [],
-                    "logic_flow": row[2],
-                    "pitfalls": row[3].split(', ') if row[3] else [],
-                    "difficulty_level": row[4],
-                    "problem_image_path": row[5],
-                    "source_text": row[6],
-                    "core_concepts": concepts
-                }
-                candidates.append(candidate)
+            cursor.execute(_CANDIDATE_COLUMNS + " WHERE p.unit_id = ?", (unit_id,))
+            candidates = _build_candidates(cursor, cursor.fetchall())
                 
     except Exception as e:
         print(f"후보 문제 조회 실패: {e}")
@@ -695,37 +1641,269 @@ def get_problem_candidates_by_unit(subject_name: str, unit_name: str):
         
     return candidates
 
-def sync_excel_to_db():
+def get_problem_candidates_by_ids(problem_ids: list, db_path = None, profile: str = "search"):
     """
-    사용자가 수동으로 수정한 base_problems.xlsx 파일을
-    JSON으로 변환하고, DB(probdex.db)에 동기화하는 스크립트
+    [검색]
+    지정한 problem_id 목록의 후보 정보를 조회 (입력 순서 유지)
     """
-    # 이 부분에 excel_to_json 임포트가 필요하다면 상단이 아닌 함수 안에서 임포트하거나, 
-    # prob_data_processer에서 가져와야 합니다. (보통 상단에 이미 있을 것입니다)
-    from .prob_data_processer import excel_to_json 
+    if not problem_ids:
+        return []
+    if db_path is None:
+        db_path = path["db"] # 시스템 DB
 
-    print("\n[Excel -> DB 수동 동기화 시작]")
-    
-    # 1. Excel -> JSON 변환
-    print(f"\n1. 엑셀 파일 읽기 및 JSON 변환: {path['base_problems_xlsx']}")
     try:
-        excel_to_json(
-            excel_path=path['base_problems_xlsx'],
-            output_path=path['base_problems_json']
-        )
+        with db_manager.cursor(db_path, profile=profile) as cursor:
+            placeholders = ", ".join("?" for _ in problem_ids)
+            cursor.execute(_CANDIDATE_COLUMNS + f" WHERE p.problem_id IN ({placeholders})", list(problem_ids))
+            candidates = _build_candidates(cursor, cursor.fetchall())
+
     except Exception as e:
-        print(f" 엑셀 -> JSON 변환 실패: {e}")
-        return
+        print(f"후보 문제 조회 실패: {e}")
+        return []
 
-    # 2. JSON -> DB 동기화 (run_sync_database 대신 직접 실행)
-    print(f"\n2. 데이터베이스 동기화: {path['db']}")
+    order = {problem_id: idx for idx, problem_id in enumerate(problem_ids)}
+    candidates.sort(key=lambda cand: order[cand["problem_id"]])
+    return candidates
+
+def attach_master_db(connection, db_path = None, immutable: bool = False):
+    """
+    연결에 probdex.db를 읽기 전용 'corpus' 스키마로 ATTACH (같은 파일이 이미 붙어 있으면 생략)
+    다른 파일(예: 다른 과목 샤드)이 붙어 있으면 DETACH 후 다시 ATTACH
+    연결은 uri=True로 열려 있어야 함
+    immutable=True: 검색 중 probdex.db가 바뀌지 않을 때 잠금 없이 읽음
+    """
+    if db_path is None:
+        db_path = path["db"]
+
+    attached = {row[1]: row[2] for row in connection.execute("PRAGMA database_list")}
+    if "corpus" in attached:
+        if os.path.realpath(attached["corpus"]) == os.path.realpath(db_path):
+            return
+        connection.execute("DETACH DATABASE corpus")
+
+    db_uri = _read_only_uri(db_path, immutable=immutable)
+    connection.execute("ATTACH DATABASE ? AS corpus", (db_uri,))
+
+def shortlist_candidate_ids(connection, user_problem_id: int, difficulty_window: int = None,
+                            min_shared_concepts: int = None, limit: int = None):
+    """
+    [검색] user DB(main)와 probdex.db(corpus)를 한 번의 SQL 조인으로 비교하여
+    사용자 문제와 비교할 후보 problem_id만 선별
+    - 같은 과목/단원 (두 DB의 id가 다를 수 있으므로 이름으로 조인)
+    - 공유 핵심 개념 수 >= min_shared_concepts 또는 난이도 차이 <= difficulty_window
+    - 공유 개념 수 내림차순, 난이도 차이 오름차순으로 상위 limit개 (잘라내면 로그 출력, 0이면 제한 없음)
+    None인 인자는 config.search_shortlist 값 사용
+    반환: [(problem_id, 공유 개념 수, 난이도 차이), ...]
+    attach_master_db()로 corpus가 붙어 있어야 함
+    """
+    if difficulty_window is None:
+        difficulty_window = search_shortlist["difficulty_window"]
+    if min_shared_concepts is None:
+        min_shared_concepts = search_shortlist["min_shared_concepts"]
+    if limit is None:
+        limit = search_shortlist["limit"]
+
+    query = """
+        WITH user_problem AS (
+            SELECT s.subject_name, u.unit_name, p.difficulty_level
+            FROM main.problems p
+            JOIN main.units u ON u.unit_id = p.unit_id
+            JOIN main.subjects s ON s.subject_id = u.subject_id
+            WHERE p.problem_id = :user_problem_id
+        ),
+        user_concepts AS (
+            SELECT c.concept_name
+            FROM main.problem_concept_map m
+            JOIN main.concepts c ON c.concept_id = m.concept_id
+            WHERE m.problem_id = :user_problem_id
+        ),
+        scored AS (
+            SELECT
+                cp.problem_id,
+                (
+                    SELECT COUNT(*)
+                    FROM corpus.problem_concept_map cm
+                    JOIN corpus.concepts cc ON cc.concept_id = cm.concept_id
+                    WHERE cm.problem_id = cp.problem_id
+                      AND cc.concept_name IN (SELECT concept_name FROM user_concepts)
+                ) AS shared_concepts,
+                ABS(COALESCE(cp.difficulty_level, 0) - COALESCE(up.difficulty_level, 0)) AS difficulty_gap
+            FROM user_problem up
+            JOIN corpus.subjects cs ON cs.subject_name = up.subject_name
+            JOIN corpus.units cu ON cu.subject_id = cs.subject_id AND cu.unit_name = up.unit_name
+            JOIN corpus.problems cp ON cp.unit_id = cu.unit_id
+        )
+        SELECT problem_id, shared_concepts, difficulty_gap
+        FROM scored
+        WHERE shared_concepts >= :min_shared_concepts OR difficulty_gap <= :difficulty_window
+        ORDER BY shared_concepts DESC, difficulty_gap ASC, problem_id ASC
+        LIMIT :limit
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, {
+            "user_problem_id": user_problem_id,
+            "min_shared_concepts": min_shared_concepts,
+            "difficulty_window": difficulty_window,
+            # 잘렸는지 알 수 있도록 1개 더 조회 (SQLite에서 LIMIT -1은 제한 없음)
+            "limit": limit + 1 if limit > 0 else -1
+        })
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if limit > 0 and len(rows) > limit:
+        print(f"  [선별] 조건을 만족하는 후보가 {limit}개를 넘어 상위 {limit}개만 사용합니다. (config.search_shortlist['limit'])")
+        rows = rows[:limit]
+    return rows
+
+# 사용자 DB 템플릿 (스키마 + 과목/단원 마스터 데이터가 채워진 메모리 DB)
+_user_db_template = None
+_user_db_template_lock = threading.Lock()
+
+def _get_user_db_template():
+    """
+    user DB 템플릿을 반환 (프로세스당 최초 1회만 생성)
+    """
+    global _user_db_template
+    with _user_db_template_lock:
+        if _user_db_template is None:
+            template = sqlite3.connect(":memory:", check_same_thread=False)
+            cursor = template.cursor()
+            _create_schema(cursor)
+            _populate_master_tables(cursor)
+            template.commit()
+            cursor.close()
+            _user_db_template = template
+    return _user_db_template
+
+class UserDBSession:
+    """
+    검색 1회 동안만 사용하는 임시 user DB 세션
+    - 디스크의 user_probdex.db를 매번 삭제/재생성하는 대신
+      미리 만들어 둔 템플릿을 SQLite 백업 API로 메모리(또는 임시 파일)에 복제
+    - persist_path가 주어지면 close() 시 세션 내용을 해당 파일로 저장
+    """
+    def __init__(self, persist_path=None, use_temp_file: bool = False):
+        self.persist_path = persist_path
+        self.use_temp_file = use_temp_file
+        self.connection = None
+        self.setup_ms = 0.0 # 세션 준비 소요 시간 (밀리초)
+        self._temp_path = None
+
+    def open(self):
+        """
+        템플릿을 복제하여 세션 DB를 준비
+        """
+        start_time = time.perf_counter()
+        template = _get_user_db_template()
+
+        if self.use_temp_file:
+            fd, self._temp_path = tempfile.mkstemp(prefix="probdex_user_", suffix=".db")
+            os.close(fd)
+            target = self._temp_path
+        else:
+            target = ":memory:"
+
+        # uri=True: attach_master_db()에서 읽기 전용 URI로 probdex.db를 붙이기 위함
+        self.connection = sqlite3.connect(target, uri=True, factory=connection_factory(), check_same_thread=False)
+        instrument_connection(self.connection)
+        with _user_db_template_lock:
+            template.backup(self.connection)
+        self.connection.execute("PRAGMA foreign_keys = ON;")
+
+        self.setup_ms = (time.perf_counter() - start_time) * 1000
+        return self
+
+    @contextmanager
+    def transaction(self):
+        """
+        세션 DB 쓰기용 컨텍스트 매니저 (정상 종료 시 커밋, 예외 시 롤백)
+        """
+        cursor = self.connection.cursor()
+        try:
+            yield cursor
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def attach_master_db(self, db_path = None, immutable: bool = True):
+        """
+        세션 연결에 probdex.db를 'corpus'로 ATTACH
+        (검색 세션은 probdex.db를 읽기만 하므로 기본 immutable)
+        """
+        attach_master_db(self.connection, db_path, immutable=immutable)
+
+    def shortlist_candidate_ids(self, user_problem_id: int, db_path = None, **kwargs):
+        """
+        세션의 사용자 문제와 probdex.db(또는 db_path의 샤드 DB)를 SQL 조인으로 비교해 후보 id를 선별
+        """
+        self.attach_master_db(db_path)
+        return shortlist_candidate_ids(self.connection, user_problem_id, **kwargs)
+
+    def persist(self, db_path=None):
+        """
+        세션 DB 내용을 디스크 DB 파일로 저장 (기존 내용은 덮어씀)
+        """
+        db_path = db_path or self.persist_path
+        if not db_path:
+            return
+
+        # 연결 관리자가 대상 파일을 열고 있으면 먼저 닫음
+        db_manager.close_db(db_path)
+        target = sqlite3.connect(db_path)
+        try:
+            self.connection.backup(target)
+        finally:
+            target.close()
+
+    def close(self):
+        """
+        (persist_path가 있으면 저장 후) 세션을 종료하고 임시 파일을 정리
+        """
+        if self.connection is None:
+            return
+        try:
+            if self.persist_path:
+                self.persist()
+        finally:
+            self.connection.close()
+            self.connection = None
+            if self._temp_path and os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+            self._temp_path = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def sync_excel_to_db(export_json: bool = True, rebuild: bool = False):
+    """
+    사용자가 수동으로 수정한 base_problems.xlsx 파일을
+    DB(probdex.db)에 바로 동기화하는 스크립트
+    export_json=True이면 같은 데이터로 base_problems.json도 갱신 (DB 적재에는 사용하지 않음)
+    rebuild=True이면 엑셀을 전체 원본으로 보고 엑셀에 없는 문제를 DB에서 삭제
+    """
+    print("\n[Excel -> DB 수동 동기화 시작]")
+
+    print(f"\n데이터베이스 동기화: {path['base_problems_xlsx']} -> {path['db']}")
     try:
-        # [수정됨] 파이프라인 함수 대신 내부 함수 직접 호출
         is_user_db = False
         create_database(is_user_db=is_user_db)
         populate_subjects_and_units_tables(is_user_db=is_user_db)
-        sync_database_from_json(path["base_problems_json"], path["db"], is_user_db=is_user_db)
-        
+        stats = sync_database_from_excel(
+            path["base_problems_xlsx"], path["db"], is_user_db=is_user_db, delete_missing=rebuild,
+            json_export_path=path["base_problems_json"] if export_json else None
+        )
+        if stats is None:
+            return
+
         print("\n✅ 모든 동기화 작업이 완료되었습니다.")
             
     except Exception as e:
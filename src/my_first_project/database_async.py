@@ -0,0 +1,214 @@
+# --- database_async.py ---
+import queue
+import asyncio
+import weakref
+import threading
+# 프로젝트 모듈 임포트
+from .database import (
+    db_manager,
+    upsert_problem_items,
+    sync_database_from_json,
+    insert_meta_data_user_db,
+    get_problem_candidates_by_unit,
+    get_problem_candidates_by_ids,
+    get_vocabulary_ids
+)
+
+def _set_future_result(future, result):
+    if not future.done():
+        future.set_result(result)
+
+def _set_future_exception(future, exc):
+    if not future.done():
+        future.set_exception(exc)
+
+class AsyncDatabase:
+    """
+    asyncio 서비스에서 database.py의 블로킹 sqlite3 호출을 이벤트 루프 밖에서 실행하는 계층
+    - 쓰기: 전용 스레드 1개 (SQLite는 한 번에 하나만 쓸 수 있으므로 직렬화)
+    - 읽기: read_workers개의 전용 스레드 (스레드마다 db_manager의 연결을 따로 사용)
+    - 요청 큐에 동시에 들어갈 수 있는 요청 수를 max_pending으로 제한하여
+      초과한 호출은 await에서 대기 (backpressure)
+    - 여러 이벤트 루프(스레드마다 asyncio.run 등)에서 같이 써도 되며, max_pending 제한은 이벤트 루프마다 따로 적용됨
+
+    사용 예:
+        async with AsyncDatabase() as adb:
+            candidates = await adb.get_problem_candidates_by_unit("수학1", "삼각함수")
+    """
+    def __init__(self, read_workers: int = 2, max_pending: int = 64):
+        if read_workers < 1 or max_pending < 1:
+            raise ValueError("read_workers와 max_pending은 1 이상이어야 합니다.")
+        self.read_workers = read_workers
+        self.max_pending = max_pending
+        self.pending = 0 # 큐에 들어갔지만 아직 끝나지 않은 요청 수
+
+        self._read_queue = queue.Queue()
+        self._write_queue = queue.Queue()
+        self._threads = []
+        self._semaphores = weakref.WeakKeyDictionary() # 이벤트 루프 -> 해당 루프에서 만든 세마포어
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    def start(self):
+        """
+        DB 작업 스레드 시작 (첫 요청 시 자동 호출)
+        """
+        with self._start_lock:
+            if self._threads:
+                return self
+            if self._closed:
+                raise RuntimeError("이미 종료된 AsyncDatabase입니다.")
+
+            for idx in range(self.read_workers):
+                self._threads.append(threading.Thread(
+                    target=self._worker, args=(self._read_queue,),
+                    name=f"probdex-db-read-{idx}", daemon=True
+                ))
+            self._threads.append(threading.Thread(
+                target=self._worker, args=(self._write_queue,),
+                name="probdex-db-write", daemon=True
+            ))
+            for thread in self._threads:
+                thread.start()
+        return self
+
+    @staticmethod
+    def _worker(request_queue):
+        """
+        (DB 스레드) 큐에서 요청을 꺼내 실행하고 결과를 요청한 이벤트 루프로 돌려줌
+        """
+        try:
+            while True:
+                request = request_queue.get()
+                if request is None: # 종료 신호
+                    break
+
+                func, args, kwargs, loop, future = request
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    callback, value = _set_future_exception, e
+                else:
+                    callback, value = _set_future_result, result
+
+                try:
+                    loop.call_soon_threadsafe(callback, future, value)
+                except RuntimeError:
+                    # 요청한 이벤트 루프가 이미 닫힌 경우
+                    pass
+        finally:
+            db_manager.close_thread()
+
+    async def _submit(self, request_queue, func, *args, **kwargs):
+        if self._closed:
+            raise RuntimeError("이미 종료된 AsyncDatabase입니다.")
+        self.start()
+
+        loop = asyncio.get_running_loop()
+        async with self._get_semaphore(loop):
+            future = loop.create_future()
+            self.pending += 1
+            try:
+                request_queue.put((func, args, kwargs, loop, future))
+                return await future
+            finally:
+                self.pending -= 1
+
+    def _get_semaphore(self, loop):
+        """
+        이벤트 루프별 세마포어 (asyncio.Semaphore는 처음 사용한 루프에 묶이므로 루프마다 따로 생성)
+        """
+        with self._start_lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_pending)
+                self._semaphores[loop] = semaphore
+            return semaphore
+
+    async def run_read(self, func, *args, **kwargs):
+        """
+        임의의 읽기 함수를 읽기 스레드에서 실행
+        """
+        return await self._submit(self._read_queue, func, *args, **kwargs)
+
+    async def run_write(self, func, *args, **kwargs):
+        """
+        임의의 쓰기 함수를 쓰기 스레드에서 실행 (모든 쓰기는 순서대로 하나씩 실행됨)
+        """
+        return await self._submit(self._write_queue, func, *args, **kwargs)
+
+    # ----- 읽기 API -----
+    async def get_problem_candidates_by_unit(self, subject_name: str, unit_name: str, db_path = None, profile: str = "search"):
+        return await self.run_read(get_problem_candidates_by_unit, subject_name, unit_name, db_path=db_path, profile=profile)
+
+    async def get_problem_candidates_by_ids(self, problem_ids: list, db_path = None, profile: str = "search"):
+        return await self.run_read(get_problem_candidates_by_ids, problem_ids, db_path=db_path, profile=profile)
+
+    async def get_vocabulary_ids(self, kind: str, names: list, db_path = None, profile: str = "search"):
+        return await self.run_read(get_vocabulary_ids, kind, names, db_path=db_path, profile=profile)
+
+    # ----- 쓰기 API -----
+    async def upsert_problems(self, items: list, db_path = None, is_user_db: bool = False, profile: str = "default"):
+        """
+        JSON 형식의 문제 항목들을 upsert (내용이 같은 문제는 건너뜀)
+        반환: sync_problem_items()의 개수 딕셔너리
+        """
+        return await self.run_write(upsert_problem_items, items, db_path=db_path, is_user_db=is_user_db, profile=profile)
+
+    async def insert_meta_data_user_db(self, problems: list, is_user_db: bool = True):
+        return await self.run_write(insert_meta_data_user_db, problems, is_user_db=is_user_db)
+
+    async def sync_database_from_json(self, json_path, db_path = None, is_user_db: bool = False,
+                                      profile: str = "default", delete_missing: bool = False):
+        return await self.run_write(
+            sync_database_from_json, json_path, db_path=db_path, is_user_db=is_user_db,
+            profile=profile, delete_missing=delete_missing
+        )
+
+    # ----- 종료 -----
+    def close(self):
+        """
+        대기 중인 요청을 모두 처리한 뒤 DB 스레드를 종료하고 연결을 닫음
+        """
+        with self._start_lock:
+            if self._closed:
+                return
+            self._closed = True
+            threads = self._threads
+
+        for _ in range(self.read_workers):
+            self._read_queue.put(None)
+        self._write_queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    async def aclose(self):
+        # 스레드 join이 이벤트 루프를 막지 않도록 별도 스레드에서 종료
+        await asyncio.to_thread(self.close)
+
+    async def __aenter__(self):
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+        return False
+
+if __name__ == "__main__":
+    # poetry run python -m src.my_first_project.database_async
+    from .model import master_data
+
+    async def _demo():
+        targets = [
+            (subject, unit)
+            for subject, units in master_data.items() if subject != "분류 불가"
+            for unit in units
+        ]
+        async with AsyncDatabase(read_workers=2, max_pending=8) as adb:
+            results = await asyncio.gather(*(
+                adb.get_problem_candidates_by_unit(subject, unit) for subject, unit in targets
+            ))
+        for (subject, unit), candidates in zip(targets, results):
+            print(f"  - {subject} > {unit}: 후보 {len(candidates)}개")
+        print("✅ 비동기 DB 조회 완료")
+
+    asyncio.run(_demo())
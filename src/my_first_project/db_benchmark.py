@@ -0,0 +1,236 @@
+# --- db_benchmark.py ---
+import io
+import os
+import time
+import shutil
+import sqlite3
+import tempfile
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+# 프로젝트 모듈 임포트
+from .model import master_data
+from .config import path
+from .database import (
+    connect_db,
+    db_manager,
+    load_json,
+    sync_database_from_json,
+    compress_text_columns,
+    get_problem_candidates_by_unit
+)
+from .text_codec import clear_decode_cache
+
+# 벤치마크 대상 프로파일
+SYNC_PROFILES = ["default", "bulk_load"]
+SEARCH_PROFILES = ["default", "search", "search_immutable"]
+# 동시 검색 프로세스 수
+CONCURRENT_SEARCH_PROCESSES = 4
+
+def _copy_db(source_db_path, target_db_path):
+    """
+    백업 API로 DB 파일을 복사 (WAL에 남은 변경분까지 포함)
+    """
+    # 연결 관리자가 들고 있는 기존 연결을 먼저 닫은 뒤 파일 교체
+    db_manager.close_db(target_db_path)
+    if os.path.exists(target_db_path):
+        os.remove(target_db_path)
+
+    source = connect_db(source_db_path)
+    target = sqlite3.connect(target_db_path)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+def _prepare_empty_db(source_db_path, target_db_path):
+    """
+    원본 DB를 복사한 뒤 문제/개념 데이터만 비워
+    스키마와 마스터 테이블(subjects, units)만 남긴 벤치마크용 DB를 만든다.
+    """
+    _copy_db(source_db_path, target_db_path)
+
+    with contextlib.closing(sqlite3.connect(target_db_path)) as target:
+        # 이전 측정의 WAL 설정이 남지 않도록 기본 저널 모드로 되돌림
+        target.execute("PRAGMA journal_mode = DELETE;")
+        target.execute("PRAGMA foreign_keys = ON;")
+        target.execute("DELETE FROM problem_concept_map")
+        target.execute("DELETE FROM problems")
+        target.execute("DELETE FROM concepts")
+        target.commit()
+
+def _search_targets():
+    """
+    검색 벤치마크에 사용할 (과목, 단원) 목록
+    """
+    return [
+        (subject, unit)
+        for subject, units in master_data.items() if subject != "분류 불가"
+        for unit in units
+    ]
+
+def benchmark_sync(profile, json_path, source_db_path, work_dir, rounds=3):
+    """
+    JSON -> DB 동기화 처리량(문제/초)을 측정
+    - 전체 동기화: 빈 DB에 모든 문제를 삽입
+    - 재동기화: 변경 없는 JSON으로 다시 동기화 (내용 해시 비교만 수행)
+    """
+    problem_count = len(load_json(json_path))
+    target_db_path = os.path.join(work_dir, f"bench_sync_{profile}.db")
+
+    durations = []
+    resync_durations = []
+    for _ in range(rounds):
+        _prepare_empty_db(source_db_path, target_db_path)
+        # 동기화 로그는 측정에서 제외
+        with contextlib.redirect_stdout(io.StringIO()):
+            start_time = time.perf_counter()
+            sync_database_from_json(json_path, target_db_path, profile=profile)
+            durations.append(time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            sync_database_from_json(json_path, target_db_path, profile=profile)
+            resync_durations.append(time.perf_counter() - start_time)
+
+    best = min(durations)
+    return {
+        "profile": profile,
+        "problems": problem_count,
+        "best_sec": best,
+        "throughput": problem_count / best if best > 0 else 0.0,
+        "resync_sec": min(resync_durations)
+    }
+
+def benchmark_search(profile, db_path, rounds=20):
+    """
+    단원별 후보 조회(get_problem_candidates_by_unit) 처리량(검색/초)을 측정
+    """
+    targets = _search_targets()
+
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(rounds):
+            for subject_name, unit_name in targets:
+                get_problem_candidates_by_unit(subject_name, unit_name, db_path=db_path, profile=profile)
+    duration = time.perf_counter() - start_time
+
+    search_count = rounds * len(targets)
+    return {
+        "profile": profile,
+        "searches": search_count,
+        "total_sec": duration,
+        "throughput": search_count / duration if duration > 0 else 0.0
+    }
+
+def _concurrent_search_worker(profile, db_path, rounds):
+    """
+    (자식 프로세스) 검색 벤치마크를 실행하고 소요 시간을 반환
+    """
+    result = benchmark_search(profile, db_path, rounds=rounds)
+    return result["total_sec"]
+
+def benchmark_concurrent_search(profile, db_path, processes=CONCURRENT_SEARCH_PROCESSES, rounds=10):
+    """
+    여러 검색 프로세스가 같은 DB를 동시에 읽을 때의 전체 처리량(검색/초)을 측정
+    """
+    # fork된 자식이 부모의 풀링된 연결을 물려받지 않도록 먼저 닫음
+    db_manager.close_all()
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(_concurrent_search_worker, profile, db_path, rounds)
+            for _ in range(processes)
+        ]
+        worker_durations = [future.result() for future in futures]
+    duration = time.perf_counter() - start_time
+
+    search_count = processes * rounds * len(_search_targets())
+    return {
+        "profile": profile,
+        "processes": processes,
+        "searches": search_count,
+        "total_sec": duration,
+        "slowest_worker_sec": max(worker_durations),
+        "throughput": search_count / duration if duration > 0 else 0.0
+    }
+
+def benchmark_text_compression(source_db_path, work_dir, rounds=20):
+    """
+    텍스트 컬럼 압축 전/후의 DB 파일 크기와 단원별 후보 조회 지연 시간을 비교
+    - cold: 해제 캐시를 비운 첫 회차 (모든 압축값을 실제로 해제)
+    - warm: 이후 회차 평균 (LRU 캐시 적중)
+    """
+    results = []
+    for label, compress in (("plain", False), ("compressed", True)):
+        target_db_path = os.path.join(work_dir, f"bench_text_{label}.db")
+        _copy_db(source_db_path, target_db_path)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            if compress:
+                compress_text_columns(target_db_path)
+            else:
+                # 크기 비교를 공정하게 하기 위해 평문 DB도 VACUUM
+                db_manager.get_connection(target_db_path, profile="bulk_load").execute("VACUUM")
+        db_manager.close_db(target_db_path)
+
+        clear_decode_cache()
+        cold = benchmark_search("search", target_db_path, rounds=1)
+        warm = benchmark_search("search", target_db_path, rounds=rounds)
+        results.append({
+            "label": label,
+            "size_bytes": os.path.getsize(target_db_path),
+            "cold_ms": cold["total_sec"] * 1000 / cold["searches"],
+            "warm_ms": warm["total_sec"] * 1000 / warm["searches"]
+        })
+    return results
+
+def run_database_benchmarks(sync_rounds=3, search_rounds=20):
+    """
+    프로파일별 동기화/검색 처리량을 측정하여 출력
+    원본 probdex.db는 변경하지 않고 임시 폴더의 복사본으로만 측정한다.
+    """
+    json_path = path["base_problems_json"]
+    source_db_path = path["db"]
+
+    print("\n--- DB 프로파일 벤치마크 시작 ---")
+    print(f"Source: {json_path}")
+
+    work_dir = tempfile.mkdtemp(prefix="probdex_bench_")
+    try:
+        print("\n[동기화 처리량] (JSON -> DB 전체 동기화)")
+        for profile in SYNC_PROFILES:
+            result = benchmark_sync(profile, json_path, source_db_path, work_dir, rounds=sync_rounds)
+            print(f"  - {result['profile']:<10} : {result['best_sec']:.3f}초 "
+                  f"({result['throughput']:.1f} 문제/초, {result['problems']}문제), "
+                  f"변경 없는 재동기화 {result['resync_sec']:.3f}초")
+
+        # 검색은 원본 DB 복사본에서 측정
+        search_db_path = os.path.join(work_dir, "bench_search.db")
+        _copy_db(source_db_path, search_db_path)
+
+        print("\n[검색 처리량] (단원별 후보 조회)")
+        for profile in SEARCH_PROFILES:
+            result = benchmark_search(profile, search_db_path, rounds=search_rounds)
+            print(f"  - {result['profile']:<16} : {result['total_sec']:.3f}초 "
+                  f"({result['throughput']:.1f} 검색/초, {result['searches']}회)")
+
+        print(f"\n[동시 검색 처리량] ({CONCURRENT_SEARCH_PROCESSES}개 프로세스가 같은 DB를 동시에 조회)")
+        for profile in SEARCH_PROFILES:
+            result = benchmark_concurrent_search(profile, search_db_path, rounds=max(1, search_rounds // 2))
+            print(f"  - {result['profile']:<16} : {result['total_sec']:.3f}초 "
+                  f"({result['throughput']:.1f} 검색/초, {result['searches']}회, "
+                  f"가장 느린 프로세스 {result['slowest_worker_sec']:.3f}초)")
+
+        print("\n[텍스트 컬럼 압축] (DB 크기 / 검색 1회당 지연 시간)")
+        for result in benchmark_text_compression(source_db_path, work_dir, rounds=search_rounds):
+            print(f"  - {result['label']:<16} : {result['size_bytes'] / 1024:,.1f}KB, "
+                  f"cold {result['cold_ms']:.3f}ms, warm {result['warm_ms']:.3f}ms")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n✅ DB 프로파일 벤치마크 완료")
+
+if __name__ == "__main__":
+    # poetry run python -m src.my_first_project.db_benchmark
+    run_database_benchmarks()
@@ -0,0 +1,252 @@
+# --- db_profiler.py ---
+import os
+import re
+import time
+import sqlite3
+import threading
+# 프로젝트 모듈 임포트
+from .config import sql_profiler_settings
+
+# 통계 키를 만들 때 리터럴을 '?'로 치환 (trace 콜백은 값이 채워진 SQL을 넘겨주기 때문)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_sql(sql: str) -> str:
+    """
+    같은 형태의 SQL이 하나의 통계로 모이도록 공백/리터럴/IN 목록을 정규화
+    """
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("IN (?, ...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+def _percentile(values, ratio):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(ratio * (len(ordered) - 1)))))
+    return ordered[idx]
+
+class SQLProfiler:
+    """
+    SQL 문장별 실행 통계 수집기 (opt-in)
+    - 타이밍 래퍼(ProfilingConnection/ProfilingCursor): 실행 횟수, 총/p95 실행 시간, 반환 행 수
+    - set_trace_callback: SQLite가 실제로 실행한 문장 수 (트리거 내부, 암묵적 BEGIN/COMMIT 포함)
+    - slow_query_ms 이상 걸린 문장은 느린 쿼리 로그 파일에 기록
+    문장 1회의 시간은 execute()부터 그 커서로 결과를 fetch한 시간까지 합친 값 (p95, 느린 쿼리 판단 모두)
+    """
+    def __init__(self, enabled: bool = False, slow_query_ms: float = 20.0, log_path: str = None, summary_top_n: int = 15):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.log_path = log_path
+        self.summary_top_n = summary_top_n
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _entry(self, key):
+        entry = self._stats.get(key)
+        if entry is None:
+            entry = {"count": 0, "traced": 0, "total_ms": 0.0, "durations": [], "rows": 0}
+            self._stats[key] = entry
+        return entry
+
+    def record(self, sql: str, duration_ms: float, rows: int = 0):
+        """
+        execute() 1회 실행 결과 기록 (타이밍 래퍼에서 호출)
+        반환값(sample)을 record_fetch에 넘기면 fetch 시간이 같은 실행의 시간에 더해짐
+        """
+        key = normalize_sql(sql)
+        with self._lock:
+            entry = self._entry(key)
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["durations"].append(duration_ms)
+            entry["rows"] += max(rows, 0)
+            sample = (entry, len(entry["durations"]) - 1)
+
+        if duration_ms >= self.slow_query_ms:
+            self._write_log(f"[SLOW] {duration_ms:.2f}ms rows={rows} | {key}")
+        return sample
+
+    def record_fetch(self, sql: str, duration_ms: float, rows: int, sample=None, elapsed_ms: float = None):
+        """
+        fetch 결과 행 수와 시간 누적
+        - sample: record()가 반환한 값 (해당 실행의 p95 표본에 fetch 시간을 더함)
+        - elapsed_ms: execute부터 이번 fetch까지의 누적 시간 (이번 fetch로 느린 쿼리 기준을 넘으면 로그 기록)
+        """
+        key = normalize_sql(sql)
+        with self._lock:
+            entry = self._entry(key)
+            entry["total_ms"] += duration_ms
+            entry["rows"] += rows
+            if sample is not None:
+                # reset() 이후의 표본이면 이미 통계에서 빠진 항목이므로 그대로 두어도 무방
+                sample_entry, index = sample
+                sample_entry["durations"][index] += duration_ms
+
+        if elapsed_ms is not None and elapsed_ms - duration_ms < self.slow_query_ms <= elapsed_ms:
+            self._write_log(f"[SLOW] {elapsed_ms:.2f}ms (fetch 포함) rows={rows} | {key}")
+
+    def trace(self, sql: str):
+        """
+        set_trace_callback용 콜백 (SQLite가 실행한 모든 문장)
+        """
+        key = normalize_sql(sql)
+        with self._lock:
+            self._entry(key)["traced"] += 1
+
+    def summary(self, top_n: int = None):
+        """
+        총 실행 시간 순으로 정렬한 문장별 통계 리스트
+        """
+        top_n = top_n or self.summary_top_n
+        with self._lock:
+            rows = [
+                {
+                    "sql": key,
+                    "count": entry["count"],
+                    "traced": entry["traced"],
+                    "total_ms": entry["total_ms"],
+                    "p95_ms": _percentile(entry["durations"], 0.95),
+                    "rows": entry["rows"]
+                }
+                for key, entry in self._stats.items()
+            ]
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return rows[:top_n]
+
+    def report(self, title: str = "SQL 프로파일", reset: bool = True):
+        """
+        통계 요약을 출력하고 느린 쿼리 로그에도 남김 (파이프라인 실행 종료 시 호출)
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            total_ms = sum(entry["total_ms"] for entry in self._stats.values())
+            total_count = sum(entry["count"] for entry in self._stats.values())
+
+        lines = [f"--- {title}: 문장 {total_count}회, 총 {total_ms:.1f}ms ---"]
+        for row in self.summary():
+            sql_preview = row["sql"] if len(row["sql"]) <= 90 else row["sql"][:87] + "..."
+            lines.append(
+                f"  {row['total_ms']:9.2f}ms | {row['count']:6d}회 (trace {row['traced']:6d}) | "
+                f"p95 {row['p95_ms']:7.2f}ms | {row['rows']:7d}행 | {sql_preview}"
+            )
+
+        print("\n" + "\n".join(lines))
+        self._write_log("\n".join(lines))
+        if reset:
+            self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def _write_log(self, message: str):
+        if not self.log_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(f"{timestamp} {message}\n")
+        except OSError as e:
+            print(f"느린 쿼리 로그 기록 실패: {e}")
+
+class ProfilingCursor(sqlite3.Cursor):
+    """
+    execute/executemany 실행 시간과 fetch 행 수를 sql_profiler에 기록하는 커서
+    fetch 시간은 직전 execute의 실행 시간에 더해짐 (큰 SELECT의 결과 읽기 시간도 p95/느린 쿼리에 반영)
+    """
+    _last_sql = None
+    _last_sample = None
+    _elapsed_ms = 0.0
+
+    def execute(self, sql, parameters=()):
+        self._last_sql = sql
+        start_time = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            duration_ms = (time.perf_counter() - start_time) * 1000
+            rows = self.rowcount if self.description is None else 0
+            self._last_sample = sql_profiler.record(sql, duration_ms, rows)
+            self._elapsed_ms = duration_ms
+
+    def executemany(self, sql, seq_of_parameters):
+        self._last_sql = sql
+        start_time = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            duration_ms = (time.perf_counter() - start_time) * 1000
+            self._last_sample = sql_profiler.record(sql, duration_ms, self.rowcount)
+            self._elapsed_ms = duration_ms
+
+    def _timed_fetch(self, fetch, *args):
+        start_time = time.perf_counter()
+        result = fetch(*args)
+        if self._last_sql is not None:
+            if isinstance(result, list):
+                rows = len(result)
+            else:
+                rows = 0 if result is None else 1
+            duration_ms = (time.perf_counter() - start_time) * 1000
+            self._elapsed_ms += duration_ms
+            sql_profiler.record_fetch(self._last_sql, duration_ms, rows, self._last_sample, self._elapsed_ms)
+        return result
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._timed_fetch(super().fetchmany)
+        return self._timed_fetch(super().fetchmany, size)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+    def __next__(self):
+        return self._timed_fetch(super().__next__)
+
+class ProfilingConnection(sqlite3.Connection):
+    """
+    ProfilingCursor를 기본 커서로 사용하는 연결
+    sqlite3.Connection.execute()/executemany()는 내부에서 cursor()를 거치지 않으므로
+    직접 self.cursor()로 실행하도록 재정의 (executescript는 문장별 시간을 알 수 없어 trace 통계만 남음)
+    """
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+# 모든 모듈이 공유하는 SQL 프로파일러 (config.sql_profiler_settings로 설정)
+sql_profiler = SQLProfiler(**sql_profiler_settings)
+
+def enable_sql_profiler(enabled: bool = True):
+    """
+    SQL 프로파일러 켜기/끄기 (이후 새로 여는 연결부터 적용)
+    """
+    sql_profiler.enabled = enabled
+
+def instrument_connection(connection):
+    """
+    (connect_db에서 호출) 프로파일러가 켜져 있으면 trace 콜백 등록
+    """
+    if sql_profiler.enabled:
+        connection.set_trace_callback(sql_profiler.trace)
+    return connection
+
+def connection_factory():
+    """
+    (connect_db에서 호출) 프로파일러가 켜져 있으면 타이밍 래퍼 연결 클래스를 반환
+    """
+    return ProfilingConnection if sql_profiler.enabled else sqlite3.Connection
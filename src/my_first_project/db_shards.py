@@ -0,0 +1,195 @@
+# --- db_shards.py ---
+import os
+from concurrent.futures import ProcessPoolExecutor
+# 프로젝트 모듈 임포트
+from .model import subject_code_map, subject_normalization_map
+from .config import path, corpus_sharding
+from .database import (
+    db_manager,
+    load_json,
+    create_database,
+    populate_subjects_and_units_tables,
+    upsert_problem_items,
+    get_problem_candidates_by_unit as _get_candidates_by_unit,
+    get_problem_candidates_by_ids as _get_candidates_by_ids,
+    get_vocabulary_ids as _get_vocabulary_ids
+)
+from .corpus_snapshot import get_current_snapshot, snapshot_candidates_by_unit, snapshot_candidates_by_ids
+
+# 샤드를 나누는 과목 (subject_code_map 순서, '분류 불가' 제외)
+SHARD_SUBJECTS = [subject for subject in subject_code_map if subject != "분류 불가"]
+# 과목 코드 -> 과목명 (problem_id 끝 두 자리가 과목 코드)
+_SUBJECT_BY_CODE = {code: subject for subject, code in subject_code_map.items()}
+
+def _normalize_subject(subject_name):
+    return subject_normalization_map.get(subject_name, subject_name)
+
+def get_shard_path(subject_name: str):
+    """
+    과목의 샤드 DB 경로 (shards/probdex_<과목코드>.db), 샤드 대상 과목이 아니면 None
+    """
+    subject_name = _normalize_subject(subject_name)
+    if subject_name not in SHARD_SUBJECTS:
+        return None
+    return os.path.join(path["shards"], f"probdex_{subject_code_map[subject_name]}.db")
+
+def subject_for_problem_id(problem_id: int):
+    """
+    problem_id(YYYYMMNNCC)의 과목 코드(CC)로 과목명을 찾음
+    """
+    return _SUBJECT_BY_CODE.get(f"{int(problem_id) % 100:02d}")
+
+def resolve_db_path(subject_name: str):
+    """
+    [라우팅] 과목의 검색 대상 DB 경로
+    샤드 모드가 꺼져 있거나 샤드 파일이 아직 없으면 단일 probdex.db
+    """
+    if corpus_sharding["enabled"]:
+        shard_path = get_shard_path(subject_name)
+        if shard_path and os.path.exists(shard_path):
+            return shard_path
+    return path["db"]
+
+def create_shard_database(subject_name: str):
+    """
+    과목 샤드 DB 생성 (스키마 + 처음 만들 때만 과목/단원 마스터 데이터)
+    반환: 샤드 DB 경로
+    """
+    shard_path = get_shard_path(subject_name)
+    if shard_path is None:
+        raise ValueError(f"샤드 대상 과목이 아닙니다: {subject_name}")
+
+    os.makedirs(path["shards"], exist_ok=True)
+    is_new = not os.path.exists(shard_path)
+    create_database(db_path=shard_path)
+    if is_new:
+        populate_subjects_and_units_tables(db_path=shard_path)
+    return shard_path
+
+def split_items_by_subject(items: list):
+    """
+    JSON 문제 항목들을 샤드 과목별로 분리
+    반환: ({과목명: [항목, ...]}, 샤드에 속하지 않는 항목 수)
+    """
+    shards = {subject: [] for subject in SHARD_SUBJECTS}
+    skipped = 0
+    for item in items:
+        subject_name = _normalize_subject(item.get("subject_name"))
+        if subject_name in shards:
+            shards[subject_name].append(item)
+        else:
+            skipped += 1
+    return shards, skipped
+
+def sync_shard_items(subject_name: str, items: list, profile: str = "default", delete_missing: bool = False):
+    """
+    한 과목 샤드에 해당 과목의 문제 항목들을 동기화 (병렬 동기화의 작업 단위)
+    반환: sync_problem_items()의 개수 딕셔너리
+    """
+    shard_path = create_shard_database(subject_name)
+    try:
+        return upsert_problem_items(items, db_path=shard_path, profile=profile, delete_missing=delete_missing)
+    finally:
+        # 작업 프로세스는 atexit 없이 종료될 수 있으므로 직접 닫아 WAL을 체크포인트
+        db_manager.close_db(shard_path)
+
+def sync_shards_from_json(json_path = None, subjects: list = None, profile: str = "default",
+                          delete_missing: bool = False, max_workers: int = None):
+    """
+    [샤드 동기화] JSON 전체를 과목별로 나누어 각 샤드 DB에 병렬로 동기화
+    - 샤드마다 별도 파일이므로 쓰기 잠금이 겹치지 않아 프로세스별로 동시에 진행
+    - subjects를 지정하면 해당 과목 샤드만 다시 동기화 (다른 과목 샤드는 건드리지 않음)
+    - delete_missing=True면 JSON에 없는 문제를 샤드에서 삭제 (기본 꺼짐, JSON이 전체 원본일 때만 켤 것)
+    반환: {과목명: 개수 딕셔너리 또는 None(실패)}
+    """
+    if json_path is None:
+        json_path = path["base_problems_json"]
+    subjects = [_normalize_subject(subject) for subject in (subjects or SHARD_SUBJECTS)]
+    max_workers = max_workers or corpus_sharding["max_workers"] or min(len(subjects), os.cpu_count() or 1)
+
+    print(f"\n--- 과목별 샤드 동기화 시작 ({len(subjects)}개 샤드, 프로세스 {max_workers}개) ---")
+    print(f"Source: {json_path}")
+
+    try:
+        items_by_subject, skipped = split_items_by_subject(load_json(json_path))
+    except Exception as e:
+        print(f"JSON Load 실패: {e}")
+        return None
+    if skipped:
+        print(f"  [경고] 샤드 대상 과목이 아닌 문제 {skipped}개는 건너뜁니다.")
+
+    # fork된 자식이 부모의 풀링된 연결을 물려받지 않도록 먼저 닫음
+    db_manager.close_all()
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            subject: executor.submit(
+                sync_shard_items, subject, items_by_subject.get(subject, []),
+                profile=profile, delete_missing=delete_missing
+            )
+            for subject in subjects
+        }
+        for subject, future in futures.items():
+            try:
+                stats = future.result()
+                print(f"  - {subject}: 신규 {stats['inserted']}개, 변경 {stats['updated']}개, "
+                      f"동일 {stats['unchanged']}개, 삭제 {stats['deleted']}개, 실패 {stats['failed']}개")
+            except Exception as e:
+                print(f"  [샤드 동기화 실패] {subject}: {e}")
+                stats = None
+            results[subject] = stats
+
+    print("✅ 과목별 샤드 동기화 완료")
+    return results
+
+# ----- 연합 조회 (database.py 검색 함수와 같은 시그니처 + 과목 라우팅) -----
+def _snapshot_for(db_path):
+    """
+    probdex.db를 조회할 때 DB와 일치하는 코퍼스 스냅샷(6단계에서 생성)이 있으면 반환 (샤드는 스냅샷 없음)
+    """
+    if os.path.abspath(db_path) != os.path.abspath(path["db"]):
+        return None
+    return get_current_snapshot(db_path=db_path)
+
+def get_problem_candidates_by_unit(subject_name: str, unit_name: str, profile: str = "search"):
+    """
+    [검색] 과목에 해당하는 샤드 DB(없으면 probdex.db)에서 단원별 후보 조회
+    probdex.db이고 최신 코퍼스 스냅샷이 있으면 DB 대신 스냅샷에서 조회
+    """
+    db_path = resolve_db_path(subject_name)
+    snapshot = _snapshot_for(db_path)
+    if snapshot is not None:
+        return snapshot_candidates_by_unit(snapshot, _normalize_subject(subject_name), unit_name)
+    return _get_candidates_by_unit(subject_name, unit_name, db_path=db_path, profile=profile)
+
+def get_problem_candidates_by_ids(problem_ids: list, profile: str = "search"):
+    """
+    [검색] problem_id의 과목 코드로 샤드를 찾아 샤드별로 모아 조회한 뒤 입력 순서대로 병합
+    """
+    ids_by_db = {}
+    for problem_id in problem_ids:
+        db_path = resolve_db_path(subject_for_problem_id(problem_id))
+        ids_by_db.setdefault(db_path, []).append(problem_id)
+
+    candidates = []
+    for db_path, shard_ids in ids_by_db.items():
+        snapshot = _snapshot_for(db_path)
+        if snapshot is not None:
+            candidates.extend(snapshot_candidates_by_ids(snapshot, shard_ids))
+        else:
+            candidates.extend(_get_candidates_by_ids(shard_ids, db_path=db_path, profile=profile))
+
+    order = {problem_id: idx for idx, problem_id in enumerate(problem_ids)}
+    candidates.sort(key=lambda cand: order[cand["problem_id"]])
+    return candidates
+
+def get_vocabulary_ids(kind: str, names: list, subject_name: str, profile: str = "search"):
+    """
+    [검색] 용어 id는 DB마다 다르므로 후보를 조회한 샤드와 같은 DB에서 변환
+    """
+    return _get_vocabulary_ids(kind, names, db_path=resolve_db_path(subject_name), profile=profile)
+
+if __name__ == "__main__":
+    # poetry run python -m src.my_first_project.db_shards
+    sync_shards_from_json()
@@ -1,9 +1,15 @@
 # --- engine.py ---
 import os
+import re
 import sys
 import json
 import time
+import queue
 import traceback
+import threading
+import httpx
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import pathlib
 from pydantic import BaseModel, Field, ValidationError, model_validator
@@ -18,7 +24,343 @@ from .model import (
     AiAnalysis, PDFProbData, PDFProbResponse, subject_code_map,
     generate_problem_id, subject_map
 )
-from .config import path 
+from .config import path, gemini_model_cascade, gemini_thinking_budget, gemini_replay
+from .rate_limiter import get_rate_limiter
+from .response_cache import get_response_cache, make_cache_key, CachedResponse
+from .gemini_replay import create_recording_client, create_replay_client
+from .retry_policy import (
+    RetryPolicy, get_circuit_breaker,
+    CircuitOpenError, DeadlineExceededError, EmptyResponseError, NonRetryableError
+)
+
+# 프로세스 공유 Gemini 클라이언트 / 엔진
+_shared_client = None
+_shared_client_pid = None
+_shared_engine = None
+_shared_lock = threading.Lock()
+
+class GeminiClientError(NonRetryableError):
+    """
+    Gemini 클라이언트를 만들 수 없음 (API 키 누락 등, 재시도하지 않음)
+    """
+
+def get_genai_client():
+    """
+    프로세스 공유 Gemini 클라이언트 (첫 호출 시 .env를 읽고 생성)
+    - 하나의 httpx 연결 풀을 재사용하므로 요청마다 TLS 연결을 새로 맺지 않음
+    - fork된 자식 프로세스는 부모의 연결을 공유하지 않도록 새로 생성
+    - config.gemini_replay 모드가 replay면 녹화 재생 클라이언트, record면 녹화 클라이언트로 감싸서 반환
+    - 실패하면 GeminiClientError 발생 (작업 스레드에서 호출될 수 있으므로 프로세스를 종료하지 않고 호출한 쪽이 처리)
+    """
+    global _shared_client, _shared_client_pid
+    with _shared_lock:
+        if _shared_client is not None and _shared_client_pid == os.getpid():
+            return _shared_client
+
+        if gemini_replay["mode"] == "replay":
+            _shared_client = create_replay_client()
+            _shared_client_pid = os.getpid()
+            print(f"✅ Gemini 재생 모드: {gemini_replay['recording_path']}")
+            return _shared_client
+
+        # 구글 AI Studio API 키 활성화
+        load_dotenv() 
+        try:
+            GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+            if not GEMINI_API_KEY:
+                raise ValueError("GEMINI_API_KEY가 없습니다. {.env}파일을 저장 했는지 확인하십시오")
+
+            _shared_client = genai.Client(
+                api_key=GEMINI_API_KEY,
+                http_options={
+                    'timeout': ProbDexEngine.TIME_OUT, # 밀리초 단위
+                    # 페이지 분석 사이 간격(수십 초)에도 연결이 유지되도록 keep-alive 시간을 늘림
+                    'client_args': {
+                        'limits': httpx.Limits(
+                            max_connections=ProbDexEngine.HTTP_MAX_CONNECTIONS,
+                            max_keepalive_connections=ProbDexEngine.HTTP_MAX_CONNECTIONS,
+                            keepalive_expiry=ProbDexEngine.HTTP_KEEPALIVE_SECONDS
+                        )
+                    }
+                }
+            )
+            if gemini_replay["mode"] == "record":
+                _shared_client = create_recording_client(_shared_client)
+                print(f"  (녹화 모드: {gemini_replay['recording_path']})")
+            _shared_client_pid = os.getpid()
+            print("✅ Gemini API가 성공적으로 설정되었습니다.")
+
+        except (ValueError, Exception) as e:
+            print(f"API 키 설정 및 클라이언트 초기화 실패: {e}")
+            raise GeminiClientError(f"Gemini 클라이언트 초기화 실패: {e}") from e
+
+        return _shared_client
+
+def get_engine():
+    """
+    프로세스 공유 ProbDexEngine (매번 ProbDexEngine()을 새로 만들지 않고 재사용)
+    클라이언트는 첫 API 호출 시점에 만들어짐 (지연 초기화)
+    """
+    global _shared_engine
+    with _shared_lock:
+        if _shared_engine is None:
+            _shared_engine = ProbDexEngine()
+        return _shared_engine
+
+class _PageBatchSizer:
+    '''
+    여러 페이지 일괄 요청의 배치 크기 조정기 (덧셈 증가 / 곱셈 감소)
+    - 꽉 찬 배치가 목표 시간 안에 성공하면 1 증가, 목표 시간을 넘기면 1 감소
+    - 실패(검증 실패, 출력 토큰 한도로 잘림, 문항 누락)하면 절반으로 감소
+    '''
+    def __init__(self, initial_size, max_size, target_seconds):
+        self.max_size = max(1, max_size)
+        self.size = max(1, min(initial_size, self.max_size))
+        self.target_seconds = target_seconds
+
+    def on_success(self, batch_pages, duration):
+        if duration > self.target_seconds:
+            self.size = max(1, self.size - 1)
+        elif batch_pages >= self.size:
+            self.size = min(self.max_size, self.size + 1)
+
+    def on_failure(self):
+        self.size = max(1, self.size // 2)
+
+class _ProblemStreamParser:
+    '''
+    {"problems": [{...}, {...}]} JSON이 조각으로 도착할 때 배열 원소(문제 1개)가 완성되는 즉시 꺼내는 증분 파서
+    - 문자열 안의 괄호/따옴표는 무시하도록 문자열, 이스케이프 상태를 추적
+    - 이미 읽은 위치부터 이어서 읽으므로 조각마다 전체를 다시 파싱하지 않음
+    '''
+    ARRAY_START = re.compile(r'"problems"\s*:\s*\[')
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = None # 다음에 읽을 위치 (배열 시작 전이면 None)
+        self.depth = 0 # 배열 안에서의 괄호 깊이
+        self.in_string = False
+        self.escape = False
+        self.item_start = None
+        self.count = 0 # 꺼낸 원소 수
+        self.done = False # 배열이 닫혔는지
+
+    def feed(self, text):
+        '''
+        새 조각을 추가하고 이번에 완성된 원소(dict) 리스트를 반환
+        '''
+        self.buffer += text
+        if self.pos is None:
+            match = self.ARRAY_START.search(self.buffer)
+            if match is None:
+                return []
+            self.pos = match.end()
+
+        items = []
+        buffer = self.buffer
+        while self.pos < len(buffer) and not self.done:
+            ch = buffer[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                if self.depth == 0 and ch == '{':
+                    self.item_start = self.pos
+                self.depth += 1
+            elif ch in '}]':
+                if self.depth == 0:
+                    self.done = True # problems 배열 끝
+                else:
+                    self.depth -= 1
+                    if self.depth == 0 and self.item_start is not None:
+                        items.append(json.loads(buffer[self.item_start:self.pos + 1]))
+                        self.item_start = None
+                        self.count += 1
+            self.pos += 1
+        return items
+
+class _ThinkingBudgetPlanner:
+    '''
+    페이지별 thinking budget 결정기 (PDF 텍스트 레이어의 로컬 신호만 사용, API 호출 없음)
+    - 배점: 페이지의 최고 배점 [2점] -> 0단계, [3점] -> 1단계, [4점] -> 2단계
+    - 본문 길이: 문항당 글자 수가 long_text_chars 이상이면 +1단계
+    - 문항 번호: hard_numbers(고난도 문항 번호)가 있으면 최고 단계
+    - 문항 번호/배점이 없는 페이지(표지 등)는 0단계, 텍스트 레이어가 없으면(스캔본) 최고 단계
+    - 이전 기록: 같은 단계로 분류된 페이지들이 평균 slow_seconds 이상 걸렸거나 자주 실패했으면 한 단계 올림
+    프로세스 공유 (이전 PDF의 기록도 다음 PDF에 반영), 여러 스레드에서 호출 가능
+    '''
+    def __init__(self, budgets, long_text_chars, hard_numbers, slow_seconds, min_samples):
+        self.budgets = tuple(budgets)
+        self.long_text_chars = long_text_chars
+        self.hard_numbers = set(hard_numbers)
+        self.slow_seconds = slow_seconds
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._history = {} # 기본 단계 -> {"count", "seconds", "failures"}
+
+    @property
+    def top_tier(self):
+        return len(self.budgets) - 1
+
+    def classify(self, signals, numbers):
+        '''
+        페이지 신호로 기본 단계 결정
+        signals: utility_pdf.get_pdf_page_text_signals()의 한 페이지 값 (없으면 None)
+        numbers: 페이지의 문항 번호 (problem_number_map 또는 텍스트에서 찾은 번호)
+        '''
+        if not signals or signals["text_length"] == 0:
+            return self.top_tier
+        if self.hard_numbers.intersection(numbers):
+            return self.top_tier
+
+        points = signals["points"]
+        if not numbers and not points:
+            return 0
+        tier = {2: 0, 3: 1, 4: 2}.get(max(points), 2) if points else 2
+        if signals["text_length"] / max(1, len(numbers)) >= self.long_text_chars:
+            tier += 1
+        return min(tier, self.top_tier)
+
+    def adjusted_tier(self, base_tier):
+        '''
+        이전 기록을 반영한 단계
+        '''
+        with self._lock:
+            history = self._history.get(base_tier)
+        if history is None or history["count"] < self.min_samples:
+            return base_tier
+        average_seconds = history["seconds"] / history["count"]
+        failure_rate = history["failures"] / history["count"]
+        if average_seconds >= self.slow_seconds or failure_rate >= 1 / 3:
+            return min(base_tier + 1, self.top_tier)
+        return base_tier
+
+    def record(self, base_tier, seconds, success):
+        with self._lock:
+            history = self._history.setdefault(base_tier, {"count": 0, "seconds": 0.0, "failures": 0})
+            history["count"] += 1
+            history["seconds"] += seconds
+            history["failures"] += 0 if success else 1
+
+    def plan(self, page_signals, expected_numbers, page_nums):
+        return _ThinkingBudgetPlan(self, {
+            page_num: self.classify(
+                page_signals.get(page_num),
+                (expected_numbers or {}).get(page_num) or (page_signals.get(page_num) or {}).get("numbers") or []
+            )
+            for page_num in page_nums
+        })
+
+class _ThinkingBudgetPlan:
+    '''
+    PDF 1개의 페이지별 기본 단계 (요청마다 planner의 이전 기록을 반영해 budget 결정)
+    '''
+    def __init__(self, planner, page_tiers):
+        self.planner = planner
+        self.page_tiers = page_tiers
+
+    def _base_tier(self, page_nums):
+        # 여러 페이지 일괄 요청은 가장 어려운 페이지 기준
+        return max(self.page_tiers.get(page_num, self.planner.top_tier) for page_num in page_nums)
+
+    def config_for(self, config, page_nums):
+        budget = self.planner.budgets[self.planner.adjusted_tier(self._base_tier(page_nums))]
+        return config.model_copy(update={"thinking_config": types.ThinkingConfig(thinking_budget=budget)})
+
+    def record(self, page_nums, seconds, success):
+        per_page_seconds = seconds / max(1, len(page_nums))
+        for page_num in page_nums:
+            base_tier = self.page_tiers.get(page_num, self.planner.top_tier)
+            # 기본 단계의 budget으로 보낸 요청만 기록 (한 단계 올린 뒤의 빠른 응답으로 다시 내려가지 않도록)
+            if self.planner.adjusted_tier(base_tier) == base_tier:
+                self.planner.record(base_tier, per_page_seconds, success)
+
+    def describe(self):
+        counts = Counter(self.planner.budgets[tier] for tier in self.page_tiers.values())
+        return ", ".join(f"{budget}: {count}페이지" for budget, count in sorted(counts.items()))
+
+class _ModelCascade:
+    '''
+    flash -> pro 모델 단계 실행 기록 (PDF 1개 단위, 여러 스레드가 공유)
+    - flash 결과를 채택한 요청 수, pro로 재분석한 요청 수와 사유, 모델별 소요 시간을 집계
+    - 절약 시간은 "모든 요청을 pro로 보냈을 때의 예상 시간 - 실제 시간"으로 추정
+      (pro 1회 평균 시간은 프로세스 전체의 pro 호출 기록으로 계산)
+    '''
+    # 프로세스 전체 pro 호출 기록 (PDF가 바뀌어도 유지, 절약 시간 추정용)
+    _pro_seconds_total = 0.0
+    _pro_calls_total = 0
+    _class_lock = threading.Lock()
+
+    def __init__(self, flash_config, escalate_difficulty):
+        self.flash_config = flash_config
+        self.escalate_difficulty = escalate_difficulty
+        self._lock = threading.Lock()
+        self.flash_accepted = 0
+        self.escalated = 0
+        self.reasons = Counter()
+        self.flash_seconds = 0.0
+        self.pro_seconds = 0.0
+
+    def record_accepted(self, flash_duration):
+        with self._lock:
+            self.flash_accepted += 1
+            self.flash_seconds += flash_duration
+
+    def record_escalated(self, reason, flash_duration, pro_duration):
+        with self._lock:
+            self.escalated += 1
+            self.reasons[reason] += 1
+            self.flash_seconds += flash_duration
+            self.pro_seconds += pro_duration
+        with _ModelCascade._class_lock:
+            _ModelCascade._pro_seconds_total += pro_duration
+            _ModelCascade._pro_calls_total += 1
+
+    def summary(self, label):
+        '''
+        집계 결과 한 줄 요약 (출력 + 로그 파일 기록용)
+        '''
+        with self._lock:
+            total = self.flash_accepted + self.escalated
+            if total == 0:
+                return None
+            escalation_rate = self.escalated / total * 100
+            actual_seconds = self.flash_seconds + self.pro_seconds
+            reasons = ", ".join(f"{reason} {count}" for reason, count in self.reasons.most_common()) or "없음"
+
+        with _ModelCascade._class_lock:
+            pro_calls = _ModelCascade._pro_calls_total
+            pro_average = _ModelCascade._pro_seconds_total / pro_calls if pro_calls else None
+
+        if pro_average is None:
+            saving = "pro 호출 기록이 없어 추정 불가"
+        else:
+            saved_seconds = total * pro_average - actual_seconds
+            saving = f"약 {saved_seconds:.1f}초 (pro 평균 {pro_average:.1f}초 기준)"
+        return (f"[{label}] 요청 {total}개 중 flash 채택 {self.flash_accepted}개, pro 재분석 {self.escalated}개 "
+                f"(재분석률 {escalation_rate:.1f}%, 사유: {reasons}) | 소요 flash {self.flash_seconds:.1f}초 + "
+                f"pro {self.pro_seconds:.1f}초 | 절약 {saving}")
+
+    def report(self, label, log_path = None):
+        message = self.summary(label)
+        if message is None:
+            return
+        print(f"✅ 모델 단계 실행 결과 {message}")
+        if not log_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(f"{timestamp} {message}\n")
+        except OSError as e:
+            print(f"모델 단계 실행 로그 기록 실패: {e}")
 
 # 핵심 AI 분석 엔진 클래스
 class ProbDexEngine:
@@ -26,9 +368,22 @@ class ProbDexEngine:
     ProbDex의 핵심 AI 분석 엔진 클래스
     '''
     # 클래스 상수 정의
-    MAX_RETRIES = 3 # 최대 재시도 횟수
-    RETRY_DELAY_SECONDS = 15 # 재시도 간 대기 시간 (초)
+    MAX_RETRIES = 3 # 최대 시도 횟수
+    RETRY_BASE_DELAY_SECONDS = 2 # 재시도 대기 시간 하한 (decorrelated jitter 시작값, 초)
+    RETRY_MAX_DELAY_SECONDS = 60 # 재시도 대기 시간 상한 (초)
+    PDF_DEADLINE_SECONDS = 1800 # PDF 1개 분석의 전체 시간 예산 (초)
+    CIRCUIT_FAILURE_THRESHOLD = 5 # 연속 5xx가 이 횟수에 도달하면 회로 차단
+    CIRCUIT_RESET_SECONDS = 60 # 회로 차단 유지 시간 (초)
+    MAX_CONCURRENT_PAGES = 4 # extract_pdf_meta_data에서 동시에 분석할 최대 페이지 수
+    PDF_PAGE_TOKENS = 258 # Gemini가 PDF 1페이지를 세는 입력 토큰 수 (요청 제한기 예상치용)
+    PAGES_PER_REQUEST = 1 # 한 요청에 묶어 보낼 시작 페이지 수 (1이면 페이지 단위 요청)
+    MAX_PAGES_PER_REQUEST = 4 # 적응형 일괄 요청의 최대 페이지 수
+    BATCH_TARGET_SECONDS = 240 # 일괄 요청 1회의 목표 소요 시간 (초과하면 배치 크기 감소)
+    HTTP_MAX_CONNECTIONS = 16 # 공유 클라이언트의 최대 동시 연결 수
+    HTTP_KEEPALIVE_SECONDS = 300 # 유휴 연결 유지 시간 (초)
     TEMPERATURE = 0  # AI의 창의성과 다양성
+    MODEL_PRO = 'gemini-2.5-pro'
+    MODEL_FLASH = 'gemini-2.5-flash'
     # PRO 모델 상수
     TIME_OUT_PRO = 600000  # API 호출 타임아웃 (밀리초)
     THINKING_BUDGET_PRO = 16384 * 2  
@@ -39,31 +394,213 @@ class ProbDexEngine:
     # [모델 상수 결정]
     TIME_OUT = TIME_OUT_PRO
     THINKING_BUDGET = THINKING_BUDGET_PRO
+    # 적응형 thinking budget 상수 (_ThinkingBudgetPlanner)
+    THINKING_BUDGET_TIERS = (2048, 8192, 16384, THINKING_BUDGET) # 단계별 budget (최고 단계 = 기존 고정 budget)
+    THINKING_LONG_TEXT_CHARS = 180 # 문항당 본문 글자 수가 이 이상이면 한 단계 올림
+    THINKING_HARD_NUMBERS = (15, 21, 22, 29, 30) # 고난도 문항 번호 (항상 최고 단계)
+    THINKING_SLOW_SECONDS = 180 # 같은 단계 페이지의 평균 소요 시간이 이 이상이면 한 단계 올림
+    THINKING_HISTORY_MIN_SAMPLES = 3 # 이전 기록을 반영하기 시작하는 최소 페이지 수
 
     # RETRY_CODE_429 = 429
     # TOO_MANY_REQUESTS_CODE_429 = 429
     # SERVER_INTERNAL = 500
 
-    def __init__(self):
-        # 구글 AI Studio API 키 활성화
-        load_dotenv() 
+    def __init__(self, client = None):
+        # Gemini 클라이언트는 첫 API 호출 시 프로세스 공유 클라이언트를 가져옴 (get_genai_client)
+        self._client = client
+        # 기본 모델 설정
+        self.model = self.MODEL_PRO
+        print("\nProbDexEngin model\n:", self.model)
+        # 모델별 RPM/TPM 제한기 (스레드/프로세스 공유, 설정이 꺼져 있으면 None)
+        self.rate_limiter = get_rate_limiter(self.model)
+        # 응답 캐시 (같은 입력의 재호출 방지, 설정이 꺼져 있으면 None)
+        # 녹화/재생 모드에서는 캐시 적중이 녹화/재생 클라이언트를 건너뛰지 않도록 끔
+        self.response_cache = get_response_cache() if gemini_replay["mode"] == "live" else None
+        # 페이지별 thinking budget 결정기 (이전 페이지 소요 시간 기록을 PDF가 바뀌어도 유지)
+        self.thinking_budget_planner = _ThinkingBudgetPlanner(
+            self.THINKING_BUDGET_TIERS, self.THINKING_LONG_TEXT_CHARS, self.THINKING_HARD_NUMBERS,
+            self.THINKING_SLOW_SECONDS, self.THINKING_HISTORY_MIN_SAMPLES
+        )
+        # 재시도 정책 (회로 차단기는 모델별로 프로세스 공유)
+        self.retry_policy = RetryPolicy(
+            max_attempts=self.MAX_RETRIES,
+            base_delay=self.RETRY_BASE_DELAY_SECONDS,
+            max_delay=self.RETRY_MAX_DELAY_SECONDS,
+            deadline_seconds=self.PDF_DEADLINE_SECONDS,
+            circuit_breaker=get_circuit_breaker(self.model, self.CIRCUIT_FAILURE_THRESHOLD, self.CIRCUIT_RESET_SECONDS)
+        )
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_genai_client()
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def _estimate_request_tokens(self, contents, config) -> int:
+        '''
+        요청의 입력 토큰 수 예상치 (PDF 페이지는 PDF_PAGE_TOKENS, 텍스트는 2글자당 1토큰으로 어림)
+        '''
+        text_length = len(getattr(config, "system_instruction", None) or "")
+        pdf_parts = 0
+        for part in contents:
+            if isinstance(part, str):
+                text_length += len(part)
+            else:
+                pdf_parts += 1
+        return pdf_parts * self.PDF_PAGE_TOKENS + text_length // 2
+
+    def _retry_policy_for(self, model):
+        '''
+        모델의 재시도 정책 (기본 모델이 아니면 그 모델의 회로 차단기를 쓰는 정책)
+        '''
+        if model is None or model == self.model:
+            return self.retry_policy
+        return RetryPolicy(
+            max_attempts=self.MAX_RETRIES,
+            base_delay=self.RETRY_BASE_DELAY_SECONDS,
+            max_delay=self.RETRY_MAX_DELAY_SECONDS,
+            deadline_seconds=self.PDF_DEADLINE_SECONDS,
+            circuit_breaker=get_circuit_breaker(model, self.CIRCUIT_FAILURE_THRESHOLD, self.CIRCUIT_RESET_SECONDS)
+        )
+
+    def _generate_content(self, contents, config, model = None):
+        '''
+        generate_content 호출 공통 경로
+        - 응답 캐시에 같은 입력(페이지, 모델, 프롬프트, 설정)의 응답이 있으면 API를 호출하지 않고 반환
+        - 호출 전 요청 제한기에서 요청 1개 + 예상 토큰을 확보 (한도를 넘으면 여기서 대기)
+        - 응답의 실제 입력 토큰 수(usage_metadata)로 예상치를 정산
+        - 429 응답이면 제한기에 알려 다른 스레드/프로세스도 잠시 쉬도록 함
+        model: 호출할 모델 (None이면 self.model)
+        '''
+        model = model or self.model
+        cache = getattr(self, "response_cache", None)
+        cache_key = None
+        if cache is not None:
+            cache_key = make_cache_key(model, contents, config)
+            cached_text = cache.get(cache_key)
+            if cached_text is not None:
+                print("  (응답 캐시 적중)")
+                return CachedResponse(cached_text)
+
+        limiter = getattr(self, "rate_limiter", None) if model == self.model else get_rate_limiter(model)
+        estimated_tokens = 0
+        if limiter is not None:
+            estimated_tokens = self._estimate_request_tokens(contents, config)
+            waited = limiter.acquire(estimated_tokens)
+            if waited >= 1:
+                print(f"  (요청 한도 대기 {waited:.1f}초)")
+
         try:
-            GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-            if not GEMINI_API_KEY:
-                raise ValueError("GEMINI_API_KEY가 없습니다. {.env}파일을 저장 했는지 확인하십시오")
-            
-            self.client = genai.Client(
-                api_key=GEMINI_API_KEY,
-                http_options={'timeout': self.TIME_OUT} # 밀리초 단위
+            response = self.client.models.generate_content(
+                model=model,
+                contents=contents,
+                config=config
             )
-            print("✅ Gemini API가 성공적으로 설정되었습니다.")
+        except errors.APIError as e:
+            if limiter is not None and getattr(e, 'code', None) == 429:
+                limiter.on_rate_limited()
+            raise
 
-        except (ValueError, Exception) as e:
-            print(f"API 키 설정 및 클라이언트 초기화 실패: {e}")
-            sys.exit(1) # API 키가 없으면 프로그램 중단
-        # 기본 모델 설정
-        self.model = 'gemini-2.5-pro'
-        print("\nProbDexEngin model\n:", self.model)
+        if limiter is not None:
+            usage = getattr(response, "usage_metadata", None)
+            limiter.record_usage(estimated_tokens, getattr(usage, "prompt_token_count", None))
+
+        if cache_key is not None and self._is_cacheable(response, config):
+            cache.put(cache_key, model, response.text)
+        return response
+
+    def _generate_content_stream(self, contents, config, model = None):
+        '''
+        generate_content_stream 호출 공통 경로 (_generate_content()의 스트리밍 버전, 응답 조각을 차례로 반환)
+        - 응답 캐시에 있으면 캐시된 전체 응답을 조각 1개로 반환
+        - 스트림이 끝나면 전체 응답으로 요청 제한기 정산 및 캐시 저장
+        '''
+        model = model or self.model
+        cache = getattr(self, "response_cache", None)
+        cache_key = None
+        if cache is not None:
+            cache_key = make_cache_key(model, contents, config)
+            cached_text = cache.get(cache_key)
+            if cached_text is not None:
+                print("  (응답 캐시 적중)")
+                yield CachedResponse(cached_text)
+                return
+
+        limiter = getattr(self, "rate_limiter", None) if model == self.model else get_rate_limiter(model)
+        estimated_tokens = 0
+        if limiter is not None:
+            estimated_tokens = self._estimate_request_tokens(contents, config)
+            waited = limiter.acquire(estimated_tokens)
+            if waited >= 1:
+                print(f"  (요청 한도 대기 {waited:.1f}초)")
+
+        text_parts = []
+        usage = None
+        candidates = None
+        try:
+            for chunk in self.client.models.generate_content_stream(model=model, contents=contents, config=config):
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                candidates = getattr(chunk, "candidates", None) or candidates
+                if chunk.text:
+                    text_parts.append(chunk.text)
+                yield chunk
+        except errors.APIError as e:
+            if limiter is not None and getattr(e, 'code', None) == 429:
+                limiter.on_rate_limited()
+            raise
+
+        if limiter is not None:
+            limiter.record_usage(estimated_tokens, getattr(usage, "prompt_token_count", None))
+
+        # 마지막 조각의 finish_reason으로 잘린 응답인지 판단
+        full_response = CachedResponse("".join(text_parts), candidates)
+        if cache_key is not None and self._is_cacheable(full_response, config):
+            cache.put(cache_key, model, full_response.text)
+
+    def _call_with_retry(self, label, contents, config, deadline = None, model = None):
+        '''
+        _generate_content()를 retry_policy에 따라 호출 (빈 응답도 재시도)
+        반환: 응답 (최종 실패, 회로 차단, 시간 예산 초과 시 None)
+        '''
+        def attempt():
+            response = self._generate_content(contents=contents, config=config, model=model)
+            if not (response and response.text):
+                raise EmptyResponseError("API 응답이 비어있습니다.")
+            return response
+
+        try:
+            return self._retry_policy_for(model).call(attempt, label=label, deadline=deadline)
+        except (CircuitOpenError, DeadlineExceededError) as e:
+            print(f"  {e}")
+        except Exception:
+            # 시도별 오류는 retry_policy에서 이미 출력함
+            pass
+        return None
+
+    @staticmethod
+    def _is_cacheable(response, config) -> bool:
+        '''
+        재실행 시 다시 호출되어야 하는 응답은 캐시하지 않음
+        - 비어 있거나 출력 토큰 한도(MAX_TOKENS)로 잘린 응답
+        - JSON이 깨졌거나 response_schema(Pydantic 모델) 검증에 실패하는 응답 (예: 허용되지 않은 과목명)
+        '''
+        text = getattr(response, "text", None)
+        if not text or ProbDexEngine._is_truncated(response):
+            return False
+        if getattr(config, "response_mime_type", None) == 'application/json':
+            schema = getattr(config, "response_schema", None)
+            try:
+                if hasattr(schema, "model_validate_json"):
+                    schema.model_validate_json(text)
+                else:
+                    json.loads(text)
+            except (ValidationError, ValueError):
+                return False
+        return True
 
     @staticmethod
     def is_ai_analysis_valid(ai_data):
@@ -310,50 +847,25 @@ class ProbDexEngine:
             print(f"PDF 페이지 분할/읽기 중 오류 발생: {e}", file=sys.stderr)
             return None
 
+        deadline = self.retry_policy.new_deadline() # PDF 1개의 전체 시간 예산
         for i, page_bytes in enumerate(pdf_page_bytes):
             page_num = i + 1
             print(f"\n--- {page_num} / {end_pages} 페이지 Base Data 추출 시작 ---")
             start_time = time.time()
             response_text = None # 페이지마다 초기화
 
-            # API 재시도 루프 (페이지당) 
-            for attempt in range(self.MAX_RETRIES):
-                try:
-                    # --- AI API 호출 ---
-                    response = self.client.models.generate_content(
-                        model=self.model,
-                        contents=[
-                            types.Part.from_bytes(data=page_bytes, mime_type='application/pdf'),
-                            prompt
-                        ],
-                        config=config
-                    )
-                    
-                    if response and response.text:
-                        response_text = response.text
-                        break # [SUCCESS] API 호출 성공, 재시도 루프 탈출
-                    else:
-                        print(f"  API 응답이 비어있습니다. (시도 {attempt + 1}/{self.MAX_RETRIES})")
-
-                except errors.APIError as e: 
-                    status_code = getattr(e, 'status_code', 500)
-                    is_retryable = (status_code == 429) or (status_code >= 500)
-                    
-                    print(f"  API 오류 (HTTP {status_code})... (시도 {attempt + 1}/{self.MAX_RETRIES})")
-                    
-                    if not is_retryable or (attempt + 1) == self.MAX_RETRIES:
-                        print(f"  재시도 불가능 오류({status_code})이거나, 최대 재시도 횟수에 도달했습니다.")
-                        break # 재시도 루프 탈출
-                    
-                    wait_time = 2 ** attempt
-                    print(f"  재시도 전 {wait_time}초 대기...")
-                    time.sleep(wait_time)
-                
-                except Exception as e: 
-                    print(f"  API 호출 중 예상 못한 오류 (시도 {attempt + 1}/{self.MAX_RETRIES}): {e}")
-                    if (attempt + 1) == self.MAX_RETRIES:
-                        break # 재시도 루프 탈출
-                    time.sleep(1) # 잠시 대기 후 재시도
+            # API 호출 (재시도 정책 적용)
+            response = self._call_with_retry(
+                f"{page_num}p",
+                contents=[
+                    types.Part.from_bytes(data=page_bytes, mime_type='application/pdf'),
+                    prompt
+                ],
+                config=config,
+                deadline=deadline
+            )
+            if response is not None:
+                response_text = response.text
             
             duration_time = time.time() - start_time
             
@@ -558,50 +1070,25 @@ class ProbDexEngine:
             return None
 
         
+        deadline = self.retry_policy.new_deadline() # PDF 1개의 전체 시간 예산
         for i, page_bytes in enumerate(pdf_page_bytes):
             page_num = i + 1
             print(f"\n--- {page_num} / {end_pages} 페이지 AI 분석 시작 ---")
             start_time = time.time()
             response_text = None # 페이지마다 초기화
 
-            # API 재시도 루프 (페이지당) 
-            for attempt in range(self.MAX_RETRIES):
-                try:
-                    # --- AI API 호출 ---
-                    response = self.client.models.generate_content(
-                        model=self.model,
-                        contents=[
-                            types.Part.from_bytes(data=page_bytes, mime_type='application/pdf'),
-                            prompt
-                        ],
-                        config=config
-                    )
-                    
-                    if response and response.text:
-                        response_text = response.text
-                        break # [SUCCESS] API 호출 성공, 재시도 루프 탈출
-                    else:
-                        print(f"  API 응답이 비어있습니다. (시도 {attempt + 1}/{self.MAX_RETRIES})")
-
-                except errors.APIError as e: 
-                    status_code = getattr(e, 'status_code', 500)
-                    is_retryable = (status_code == 429) or (status_code >= 500)
-                    
-                    print(f"  API 오류 (HTTP {status_code})... (시도 {attempt + 1}/{self.MAX_RETRIES})")
-                    
-                    if not is_retryable or (attempt + 1) == self.MAX_RETRIES:
-                        print(f"  재시도 불가능 오류({status_code})이거나, 최대 재시도 횟수에 도달했습니다.")
-                        break # 재시도 루프 탈출
-                    
-                    wait_time = 2 ** attempt
-                    print(f"  재시도 전 {wait_time}초 대기...")
-                    time.sleep(wait_time)
-                
-                except Exception as e: 
-                    print(f"  API 호출 중 예상 못한 오류 (시도 {attempt + 1}/{self.MAX_RETRIES}): {e}")
-                    if (attempt + 1) == self.MAX_RETRIES:
-                        break # 재시도 루프 탈출
-                    time.sleep(1) # 잠시 대기 후 재시도
+            # API 호출 (재시도 정책 적용)
+            response = self._call_with_retry(
+                f"{page_num}p",
+                contents=[
+                    types.Part.from_bytes(data=page_bytes, mime_type='application/pdf'),
+                    prompt
+                ],
+                config=config,
+                deadline=deadline
+            )
+            if response is not None:
+                response_text = response.text
             duration_time = time.time() - start_time
             
             # 페이지별 결과 파싱 
@@ -660,9 +1147,424 @@ class ProbDexEngine:
 
         return base_data
 
-    def extract_pdf_meta_data(self, input_pdf_path, skip_pages = None):
+    def _request_pdf_problems(self, label, pdf_bytes, prompt, config, deadline = None, cascade = None, model = None):
+        '''
+        PDF 바이트(한 페이지 또는 여러 페이지)를 AI로 분석 (retry_policy에 따라 재시도)
+        반환: (문제 리스트 또는 None(실패), 소요 시간(초), 출력 토큰 한도로 응답이 잘렸는지)
+        여러 스레드에서 동시에 호출될 수 있으므로 로그에 label(페이지 번호)을 붙임
+        cascade가 있으면 flash로 먼저 분석하고 필요할 때만 config(pro)로 재분석
+        '''
+        if cascade is not None:
+            return self._request_pdf_problems_cascade(label, pdf_bytes, prompt, config, deadline, cascade)
+
+        start_time = time.time()
+        response_text = None
+        truncated = False
+
+        # API 호출 (재시도 정책 적용)
+        response = self._call_with_retry(
+            label,
+            contents=[
+                types.Part.from_bytes(data=pdf_bytes, mime_type='application/pdf'),
+                prompt
+            ],
+            config=config,
+            deadline=deadline,
+            model=model
+        )
+        if response is not None:
+            response_text = response.text
+            truncated = self._is_truncated(response)
+
+        duration_time = time.time() - start_time
+
+        if not response_text:
+            print(f"  실패: {label} 분석에 최종 실패했습니다 (API 응답 없음).")
+            return None, duration_time, truncated
+
+        # 결과 파싱
+        try:
+            # Pydantic이 JSON을 검증
+            # 'ai_analysis' 필드가 없으면 default=None으로 자동 처리
+            parsed_data = PDFProbResponse.model_validate_json(response_text)
+            return parsed_data.problems, duration_time, truncated
+
+        except ValidationError as e: 
+            # JSON 잘림 오류 감지
+            print(f"[{label}] 데이터 유효성 검증 오류 (AI가 잘못된 JSON 반환): {e}", file=sys.stderr)
+            print(f"  (AI 원본 응답: {response_text[:100]}...)")
+
+        except json.JSONDecodeError as e: # (JSON 파싱 실패)
+            print(f"  [{label}] JSON 파싱 오류: {e}", file=sys.stderr)
+            print(f"  (AI 원본 응답: {response_text[:100]}...)")
+
+        return None, duration_time, True
+
+    def _request_pdf_problems_cascade(self, label, pdf_bytes, prompt, config, deadline, cascade):
+        '''
+        flash -> pro 단계 실행
+        flash 결과가 검증 실패, ai_analysis 무효, 고난도이면 pro(config)로 같은 요청을 다시 보냄
+        '''
+        problems, flash_duration, truncated = self._request_pdf_problems(
+            f"{label} flash", pdf_bytes, prompt, cascade.flash_config, deadline, model=self.MODEL_FLASH
+        )
+        reason = self._cascade_escalation_reason(problems, truncated, cascade.escalate_difficulty)
+        if reason is None:
+            cascade.record_accepted(flash_duration)
+            return problems, flash_duration, truncated
+
+        print(f"  [{label}] pro 모델로 재분석합니다. (사유: {reason})")
+        problems, pro_duration, truncated = self._request_pdf_problems(label, pdf_bytes, prompt, config, deadline)
+        cascade.record_escalated(reason, flash_duration, pro_duration)
+        return problems, flash_duration + pro_duration, truncated
+
+    @staticmethod
+    def _cascade_escalation_reason(problems, truncated, escalate_difficulty):
+        '''
+        flash 결과를 pro로 재분석해야 하는 사유 (채택 가능하면 None)
+        - 분류 불가 항목(표지, 해설 등)은 ai_analysis 검사에서 제외
+        '''
+        if problems is None:
+            return "검증 실패"
+        if truncated:
+            return "응답 잘림"
+        for problem in problems:
+            if problem.subject_name == "분류 불가":
+                continue
+            ai_data = problem.ai_analysis.model_dump() if problem.ai_analysis else None
+            if not ProbDexEngine.is_ai_analysis_valid(ai_data):
+                return "ai_analysis 무효"
+            if ai_data['difficulty_level'] >= escalate_difficulty:
+                return "고난도"
+        return None
+
+    @staticmethod
+    def _is_truncated(response) -> bool:
+        '''
+        출력 토큰 한도(MAX_TOKENS)로 응답이 잘렸는지 확인
+        '''
+        for candidate in getattr(response, "candidates", None) or []:
+            finish_reason = getattr(candidate, "finish_reason", None)
+            if finish_reason is not None and "MAX_TOKENS" in str(finish_reason):
+                return True
+        return False
+
+    def _analyze_pdf_page(self, page_num, end_pages, page_bytes, prompt, config, deadline = None, cascade = None,
+                          budget_plan = None) -> List[PDFProbData]:
+        '''
+        PDF 한 페이지를 AI로 분석
+        반환: 추출된 문제 리스트 (실패 시 빈 리스트)
+        '''
+        print(f"\n--- {page_num} / {end_pages} 페이지 meta Data 추출 시작 ---")
+        if budget_plan is not None:
+            config = budget_plan.config_for(config, [page_num])
+        problems, duration_time, _ = self._request_pdf_problems(f"{page_num}p", page_bytes, prompt, config, deadline, cascade)
+        if budget_plan is not None:
+            budget_plan.record([page_num], duration_time, problems is not None)
+
+        if problems:
+            print(f"✅ {page_num} 페이지에서 {len(problems)}문제의 meta data를 성공적으로 추출했습니다. (소요 시간: {duration_time:.2f}초)")
+            return problems
+        if problems is not None:
+            print(f"{page_num} 페이지에서 추출된 문제가 없습니다. (소요 시간: {duration_time:.2f}초)")
+        return []
+
+    def _analyze_pdf_pages(self, pending_pages, end_pages, prompt, config, max_concurrency, deadline = None, cascade = None,
+                           budget_plan = None):
+        '''
+        페이지 단위 분석 (max_concurrency > 1이면 스레드 풀로 동시에 호출)
+        반환: {페이지 번호: 문제 리스트}
+        '''
+        page_results = {}
+        if max_concurrency == 1:
+            for page_num, page_bytes in pending_pages:
+                page_results[page_num] = self._analyze_pdf_page(
+                    page_num, end_pages, page_bytes, prompt, config, deadline, cascade, budget_plan
+                )
+        else:
+            print(f"  {len(pending_pages)}개 페이지를 최대 {max_concurrency}개씩 동시에 분석합니다.")
+            with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="probdex-page") as executor:
+                futures = {
+                    executor.submit(
+                        self._analyze_pdf_page, page_num, end_pages, page_bytes, prompt, config, deadline, cascade, budget_plan
+                    ): page_num
+                    for page_num, page_bytes in pending_pages
+                }
+                for future in as_completed(futures):
+                    page_num = futures[future]
+                    try:
+                        page_results[page_num] = future.result()
+                    except Exception as e:
+                        print(f"  실패: {page_num} 페이지 분석 중 오류: {e}", file=sys.stderr)
+                        page_results[page_num] = []
+
+        return page_results
+
+    def _analyze_pdf_batches(self, pending_pages, end_pages, prompt, config, expected_numbers,
+                             pages_per_request, max_concurrency, deadline = None, cascade = None, budget_plan = None):
+        '''
+        적응형 여러 페이지 일괄 분석
+        - 연속된 페이지를 배치 크기만큼 하나의 PDF로 합쳐 요청 (max_concurrency개 배치씩 동시에)
+        - 응답은 problem_number_map의 페이지별 문항 번호로 나누어 페이지별 결과로 재구성
+        - 각 묶음의 결과(소요 시간, 실패)로 다음 배치 크기를 조정
+        - 실패한 배치의 페이지는 페이지 단위로 다시 분석
+        반환: {페이지 번호: 문제 리스트}
+        '''
+        sizer = _PageBatchSizer(pages_per_request, self.MAX_PAGES_PER_REQUEST, self.BATCH_TARGET_SECONDS)
+        queue = list(pending_pages)
+        single_pages = set() # 일괄 요청에 실패하여 페이지 단위로 다시 분석할 페이지
+        page_results = {}
+
+        while queue:
+            # 이번 묶음의 배치 구성 (연속된 페이지만 하나로 합침)
+            batches = []
+            while queue and len(batches) < max(1, max_concurrency):
+                batch = [queue.pop(0)]
+                while (queue and len(batch) < sizer.size and batch[0][0] not in single_pages
+                       and queue[0][0] not in single_pages and queue[0][0] == batch[-1][0] + 1):
+                    batch.append(queue.pop(0))
+                batches.append(batch)
+
+            with ThreadPoolExecutor(max_workers=len(batches), thread_name_prefix="probdex-batch") as executor:
+                results = list(executor.map(
+                    lambda batch: self._analyze_pdf_batch(
+                        batch, end_pages, prompt, config, expected_numbers, deadline, cascade, budget_plan
+                    ),
+                    batches
+                ))
+
+            retry_pages = []
+            for batch, (split, duration) in zip(batches, results):
+                if split is not None:
+                    page_results.update(split)
+                    # 실패 후 페이지 단위로 다시 분석한 결과는 배치 크기 조정에 반영하지 않음
+                    if batch[0][0] not in single_pages:
+                        sizer.on_success(len(batch), duration)
+                else:
+                    sizer.on_failure()
+                    single_pages.update(page_num for page_num, _ in batch)
+                    retry_pages.extend(batch)
+
+            queue = sorted(retry_pages + queue, key=lambda page: page[0])
+
+        return page_results
+
+    def _analyze_pdf_batch(self, batch, end_pages, prompt, config, expected_numbers, deadline = None, cascade = None,
+                           budget_plan = None):
+        '''
+        배치 1개 분석
+        반환: ({페이지 번호: 문제 리스트} 또는 None(실패), 소요 시간(초))
+        '''
+        start_time = time.time()
+        if len(batch) == 1:
+            page_num, page_bytes = batch[0]
+            problems = self._analyze_pdf_page(page_num, end_pages, page_bytes, prompt, config, deadline, cascade, budget_plan)
+            return {page_num: problems}, time.time() - start_time
+
+        first_page, last_page = batch[0][0], batch[-1][0]
+        label = f"{first_page}-{last_page}p"
+        print(f"\n--- {first_page}~{last_page} / {end_pages} 페이지 meta Data 일괄 추출 시작 ---")
+
+        numbers_by_page = {page_num: list(expected_numbers.get(page_num, [])) for page_num, _ in batch}
+        all_numbers = [number for numbers in numbers_by_page.values() for number in numbers]
+        batch_prompt = prompt + f" 이 PDF는 {len(batch)}개 페이지이며, 문항 번호는 {all_numbers}입니다."
+
+        try:
+            from .utility_pdf import merge_pdf_pages_to_bytes
+            batch_bytes = merge_pdf_pages_to_bytes([page_bytes for _, page_bytes in batch])
+        except Exception as e:
+            print(f"  [{label}] 페이지 병합 실패: {e}", file=sys.stderr)
+            return None, time.time() - start_time
+
+        batch_pages = [page_num for page_num, _ in batch]
+        if budget_plan is not None:
+            config = budget_plan.config_for(config, batch_pages)
+        problems, duration_time, truncated = self._request_pdf_problems(label, batch_bytes, batch_prompt, config, deadline, cascade)
+        if budget_plan is not None:
+            budget_plan.record(batch_pages, duration_time, problems is not None and not truncated)
+        if problems is None:
+            return None, duration_time
+        if truncated:
+            print(f"  [{label}] 출력 토큰 한도로 응답이 잘렸습니다. 배치 크기를 줄입니다.")
+            return None, duration_time
+
+        split = self._split_problems_by_page(label, problems, numbers_by_page)
+        if split is None:
+            return None, duration_time
+
+        print(f"✅ {first_page}~{last_page} 페이지에서 {len(problems)}문제의 meta data를 일괄 추출했습니다. (소요 시간: {duration_time:.2f}초)")
+        return split, duration_time
+
+    @staticmethod
+    def _split_problems_by_page(label, problems, numbers_by_page):
+        '''
+        일괄 응답의 문제들을 문항 번호로 페이지별로 나눔 (problem_number_map 기준)
+        - 같은 번호가 여러 번 나오면 처음 것만 사용
+        - 예상 번호에 없는 분류 불가 / 0번 항목(표지, 해설 등)은 어느 페이지인지 알 수 없으므로 건너뜀 (배치 실패로 보지 않음)
+        - 예상하지 못한 번호가 있거나 예상한 번호가 빠졌으면 None (페이지 단위로 다시 분석)
+        '''
+        page_of_number = {number: page_num for page_num, numbers in numbers_by_page.items() for number in numbers}
+        split = {page_num: [] for page_num in numbers_by_page}
+        seen_numbers = set()
+        skipped = 0
+
+        for problem in problems:
+            page_num = page_of_number.get(problem.number)
+            if page_num is None and (problem.subject_name == "분류 불가" or not problem.number):
+                skipped += 1
+                continue
+            if page_num is None:
+                print(f"  [{label}] 예상하지 못한 문항 번호 {problem.number}번이 포함되어 있습니다.")
+                return None
+            if problem.number in seen_numbers:
+                continue
+            seen_numbers.add(problem.number)
+            split[page_num].append(problem)
+
+        missing_numbers = sorted(set(page_of_number) - seen_numbers)
+        if missing_numbers:
+            print(f"  [{label}] 누락된 문항 번호: {missing_numbers}")
+            return None
+        if skipped:
+            print(f"  [{label}] 분류 불가/번호 없는 항목 {skipped}개는 건너뜁니다.")
+        return split
+
+    def _stream_pdf_page(self, page_num, end_pages, page_bytes, prompt, config, emit, deadline = None, budget_plan = None):
+        '''
+        PDF 한 페이지를 스트리밍으로 분석하고, 문제가 하나 완성될 때마다 emit(문제)를 호출
+        - 문제 단위로 PDFProbData 검증 (검증에 실패한 문제만 건너뜀)
+        - 스트림 도중 실패하면 재시도하되, 이미 내보낸 문제는 다시 내보내지 않음
+          (문항 번호/과목/단원 조합으로 비교하므로 번호가 0이거나 없는 문제도 중복되지 않음)
+        반환: 내보낸 문제 수
+        '''
+        label = f"{page_num}p"
+        print(f"\n--- {page_num} / {end_pages} 페이지 meta Data 스트리밍 추출 시작 ---")
+        if budget_plan is not None:
+            config = budget_plan.config_for(config, [page_num])
+        contents = [types.Part.from_bytes(data=page_bytes, mime_type='application/pdf'), prompt]
+        emitted_keys = set()
+        start_time = time.time()
+
+        def attempt():
+            parser = _ProblemStreamParser()
+            for chunk in self._generate_content_stream(contents=contents, config=config):
+                for item in parser.feed(chunk.text or ""):
+                    try:
+                        problem = PDFProbData.model_validate(item)
+                    except ValidationError as e:
+                        print(f"  [{label}] 문제 데이터 유효성 검증 오류 (건너뜀): {e}", file=sys.stderr)
+                        continue
+                    key = (problem.number, problem.subject_name, problem.unit_name)
+                    if key in emitted_keys:
+                        continue
+                    emitted_keys.add(key)
+                    emit(problem)
+            if parser.pos is None:
+                raise EmptyResponseError("API 응답에 problems 배열이 없습니다.")
+            return parser.count
+
+        try:
+            self._retry_policy_for(None).call(attempt, label=label, deadline=deadline)
+        except (CircuitOpenError, DeadlineExceededError) as e:
+            print(f"  {e}")
+        except Exception:
+            # 시도별 오류는 retry_policy에서 이미 출력함
+            pass
+
+        duration_time = time.time() - start_time
+        if budget_plan is not None:
+            budget_plan.record([page_num], duration_time, bool(emitted_keys))
+        if emitted_keys:
+            print(f"✅ {page_num} 페이지에서 {len(emitted_keys)}문제의 meta data를 스트리밍으로 추출했습니다. (소요 시간: {duration_time:.2f}초)")
+        else:
+            print(f"{page_num} 페이지에서 추출된 문제가 없습니다. (소요 시간: {duration_time:.2f}초)")
+        return len(emitted_keys)
+
+    def _iter_streamed_problems(self, input_pdf_path, pending_pages, end_pages, prompt, config, max_concurrency,
+                                deadline = None, budget_plan = None):
+        '''
+        여러 페이지를 동시에 스트리밍 분석하며 완성된 문제를 호출한 쪽 스레드로 즉시 내보내는 제너레이터
+        (페이지 순서가 아니라 완성된 순서로 나옴, 연도/월/problem_id는 내보내기 직전에 주입)
+        호출한 쪽이 중간에 멈추면 아직 시작하지 않은 페이지는 취소하고 곧바로 반환함
+        이미 진행 중인 페이지 스트림은 중간에 끊을 수 없어 백그라운드에서 끝까지 진행되며, 그 결과는 버려짐
+        '''
+        completed = queue.Queue()
+        page_done = object()
+        stopped = threading.Event()
+
+        def emit_problem(page_num, problem):
+            if not stopped.is_set():
+                completed.put((page_num, problem))
+
+        def run_page(page_num, page_bytes):
+            try:
+                self._stream_pdf_page(
+                    page_num, end_pages, page_bytes, prompt, config,
+                    emit=lambda problem: emit_problem(page_num, problem),
+                    deadline=deadline, budget_plan=budget_plan
+                )
+            except Exception as e:
+                print(f"  실패: {page_num} 페이지 분석 중 오류: {e}", file=sys.stderr)
+            finally:
+                completed.put((page_num, page_done))
+
+        executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="probdex-stream")
+        try:
+            for page_num, page_bytes in pending_pages:
+                executor.submit(run_page, page_num, page_bytes)
+
+            remaining_pages = len(pending_pages)
+            while remaining_pages:
+                page_num, problem = completed.get()
+                if problem is page_done:
+                    remaining_pages -= 1
+                    continue
+                self._assign_problem_ids([problem], input_pdf_path)
+                yield problem
+        finally:
+            # 진행 중인 페이지 스트림을 기다리지 않음 (기다리면 페이지 전체 응답 시간만큼 호출한 쪽이 멈춤)
+            stopped.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _assign_problem_ids(problems, input_pdf_path):
+        '''
+        파일명의 연도와 월을 주입하고 problem_id 생성 (연도/월을 알 수 없으면 problem_id는 None)
+        '''
+        from .prob_data_processer import process_pdf_year_and_month
+        year_month = process_pdf_year_and_month(input_pdf_path)
+        year, month = None, None
+
+        if year_month is not None and len(year_month) == 2:
+            year, month = year_month
+
+        for problem in problems:
+            problem.year = int(year) if year is not None else None
+            problem.month = month
+
+        for problem in problems:
+            if problem.year is not None and problem.month is not None:
+                problem.problem_id = generate_problem_id(
+                    problem.year, 
+                    problem.month, 
+                    problem.number, 
+                    problem.subject_name
+                )
+            else:
+                problem.problem_id = None # DB가 알아서 채우도록 비워둠
+                # print(" (참고) problem_id 없이 진행합니다.")
+
+    def extract_pdf_meta_data(self, input_pdf_path, skip_pages = None, max_concurrency = None, pages_per_request = None,
+                              use_cascade = None, adaptive_thinking = None, stream: bool = False):
         '''
         PDF에서 기본 데이터와 AI 분석 데이터를 모두 추출하여 병합 후 반환.
+        max_concurrency: 동시에 분석할 최대 페이지 수 (None이면 MAX_CONCURRENT_PAGES, 1이면 순차 분석)
+        pages_per_request: 한 요청에 묶어 보낼 시작 페이지 수 (None이면 PAGES_PER_REQUEST, 2 이상이면 적응형 일괄 요청)
+        use_cascade: flash로 먼저 분석하고 필요할 때만 pro로 재분석 (None이면 config.gemini_model_cascade 설정)
+        adaptive_thinking: 페이지별 thinking budget 조정 (None이면 config.gemini_thinking_budget 설정)
+        stream: True면 generate_content_stream으로 분석하고, 문제가 완성되는 즉시 내보내는 이터레이터를 반환
+                (호출한 쪽이 명시적으로 켜야 함, 페이지 단위 요청만 사용하며 모델 단계 실행은 적용하지 않음)
+        결과는 페이지 순서대로 반환 (stream=False면 항상 리스트)
         '''
         if skip_pages is None:
             skip_pages = set()
@@ -767,9 +1669,27 @@ class ProbDexEngine:
             response_schema=PDFProbResponse,
             thinking_config=types.ThinkingConfig(thinking_budget= self.THINKING_BUDGET) 
         )
+
+        if use_cascade is None:
+            use_cascade = gemini_model_cascade["enabled"]
+        if stream and use_cascade:
+            # flash 결과를 이미 내보낸 뒤에는 pro로 바꿀 수 없으므로 스트리밍에서는 단계 실행을 쓰지 않음
+            print("  스트리밍 모드에서는 모델 단계 실행을 사용하지 않습니다.")
+            use_cascade = False
+        cascade = None
+        if use_cascade:
+            # flash 요청은 같은 프롬프트/스키마에 flash의 thinking budget과 타임아웃만 다르게 적용
+            flash_config = config.model_copy(update={
+                "thinking_config": types.ThinkingConfig(thinking_budget=self.THINKING_BUDGET_FLASH),
+                "http_options": types.HttpOptions(timeout=self.TIME_OUT_FLASH)
+            })
+            cascade = _ModelCascade(flash_config, gemini_model_cascade["escalate_difficulty"])
+            print(f"  모델 단계 실행: {self.MODEL_FLASH} -> (필요 시) {self.model}")
         
         try:
-            from .utility_pdf import extract_pdf_pages_to_bytes, get_pdf_page_count
+            from .utility_pdf import (
+                extract_pdf_pages_to_bytes, get_pdf_page_count, get_expected_problem_numbers, get_pdf_page_text_signals
+            )
             filepath = pathlib.Path(input_pdf_path)
             
             end_pages = get_pdf_page_count(input_pdf_path)
@@ -792,109 +1712,70 @@ class ProbDexEngine:
             print(f"PDF 페이지 분할/읽기 중 오류 발생: {e}", file=sys.stderr)
             return None
 
+        # 분석할 페이지 목록 (skip_pages 제외)
+        pending_pages = []
         for i, page_bytes in enumerate(pdf_page_bytes):
             page_num = i + 1
             if page_num in skip_pages:
                 print(f"  [SKIP] 이미 분석된 {page_num} 페이지")
                 continue
-            print(f"\n--- {page_num} / {end_pages} 페이지 meta Data 추출 시작 ---")
-            start_time = time.time()
-            response_text = None # 페이지마다 초기화
+            pending_pages.append((page_num, page_bytes))
+
+        if max_concurrency is None:
+            max_concurrency = self.MAX_CONCURRENT_PAGES
+        max_concurrency = max(1, min(max_concurrency, len(pending_pages) or 1))
+
+        if pages_per_request is None:
+            pages_per_request = self.PAGES_PER_REQUEST
+
+        # 여러 페이지 일괄 요청은 페이지별 문항 번호를 아는 분리 PDF에서만 사용 (응답을 페이지별로 나누기 위해)
+        # 스트리밍은 문제를 바로 내보내야 하므로 페이지 단위 요청만 사용
+        if stream:
+            pages_per_request = 1
+        expected_numbers = get_expected_problem_numbers(input_pdf_path) if pages_per_request > 1 else None
+        if pages_per_request > 1 and expected_numbers is None:
+            print("  페이지별 문항 번호를 알 수 없는 PDF라 페이지 단위로 분석합니다.")
+
+        if adaptive_thinking is None:
+            adaptive_thinking = gemini_thinking_budget["adaptive"]
+        budget_plan = None
+        if adaptive_thinking and pending_pages:
+            budget_plan = self.thinking_budget_planner.plan(
+                get_pdf_page_text_signals(input_pdf_path),
+                get_expected_problem_numbers(input_pdf_path),
+                [page_num for page_num, _ in pending_pages]
+            )
+            print(f"  thinking budget 계획: {budget_plan.describe()}")
 
-            # API 재시도 루프 (페이지당) 
-            for attempt in range(self.MAX_RETRIES):
-                try:
-                    # --- AI API 호출 ---
-                    
-                    response = self.client.models.generate_content(
-                        model=self.model,
-                        contents=[
-                            types.Part.from_bytes(data=page_bytes, mime_type='application/pdf'),
-                            prompt
-                        ],
-                        config=config
-                    )
-                    
-                    if response and response.text:
-                        response_text = response.text
-                        break # [SUCCESS] API 호출 성공, 재시도 루프 탈출
-                    else:
-                        print(f"  API 응답이 비어있습니다. (시도 {attempt + 1}/{self.MAX_RETRIES})")
+        deadline = self.retry_policy.new_deadline() # PDF 1개의 전체 시간 예산
+        if stream:
+            return self._iter_streamed_problems(
+                input_pdf_path, pending_pages, end_pages, prompt, config, max_concurrency, deadline, budget_plan
+            )
 
-                except errors.APIError as e: 
-                    status_code = getattr(e, 'status_code', 500)
-                    is_retryable = (status_code == 429) or (status_code >= 500) 
-                    
-                    print(f"  API 오류 (HTTP {status_code})... (시도 {attempt + 1}/{self.MAX_RETRIES})")
-                    
-                    if not is_retryable or (attempt + 1) == self.MAX_RETRIES:
-                        print(f"  재시도 불가능 오류({status_code})이거나, 최대 재시도 횟수에 도달했습니다.")
-                        break # 재시도 루프 탈출
-                    
-                    wait_time = self.RETRY_DELAY_SECONDS 
-                    print(f"  재시도 전 {wait_time}초 대기...")
-                    time.sleep(wait_time)
-                
-                except Exception as e: 
-                    print(f"  API 호출 중 예상 못한 오류 (시도 {attempt + 1}/{self.MAX_RETRIES}): {e}")
-                    if (attempt + 1) == self.MAX_RETRIES:
-                        break # 재시도 루프 탈출
-                    time.sleep(1) # 잠시 대기 후 재시도
-            
-            duration_time = time.time() - start_time
-            
-            # 페이지별 결과 파싱 
-            if response_text:
-                try:
-                    # Pydantic이 JSON을 검증
-                    # 'ai_analysis' 필드가 없으면 default=None으로 자동 처리
-                    parsed_data_for_page = PDFProbResponse.model_validate_json(response_text)
-                    
-                    if parsed_data_for_page.problems:
-                        print(f"✅ {page_num} 페이지에서 {len(parsed_data_for_page.problems)}문제의 meta data를 성공적으로 추출했습니다. (소요 시간: {duration_time:.2f}초)")
+        if expected_numbers:
+            page_results = self._analyze_pdf_batches(
+                pending_pages, end_pages, prompt, config, expected_numbers, pages_per_request, max_concurrency,
+                deadline, cascade, budget_plan
+            )
+        else:
+            page_results = self._analyze_pdf_pages(
+                pending_pages, end_pages, prompt, config, max_concurrency, deadline, cascade, budget_plan
+            )
 
-                        all_extracted_problems.extend(parsed_data_for_page.problems) 
-                    else:
-                        print(f"{page_num} 페이지에서 추출된 문제가 없습니다. (소요 시간: {duration_time:.2f}초)")
-                
-                except ValidationError as e: 
-                    # JSON 잘림 오류 감지
-                    print(f"데이터 유효성 검증 오류 (AI가 잘못된 JSON 반환): {e}", file=sys.stderr)
-                    print(f"  (AI 원본 응답: {response_text[:100]}...)")
-                
-                except json.JSONDecodeError as e: # (JSON 파싱 실패)
-                    print(f"  JSON 파싱 오류: {e}", file=sys.stderr)
-                    print(f"  (AI 원본 응답: {response_text[:100]}...)")
-            else:
-                print(f"  실패: {page_num} 페이지 분석에 최종 실패했습니다 (API 응답 없음).")
+        if cascade is not None:
+            cascade.report(filepath.name, gemini_model_cascade["log_path"])
+
+        # 완료 순서와 관계없이 페이지 순서대로 결과 재조립
+        for page_num, _ in pending_pages:
+            all_extracted_problems.extend(page_results.get(page_num) or [])
 
         if not all_extracted_problems:
             print("--- AI 분석 완료. 추출된 문제가 없습니다. ---")
             return []
         
         # 연도와 월 주입
-        from .prob_data_processer import process_pdf_year_and_month
-        year_month = process_pdf_year_and_month(input_pdf_path)
-        year, month = None, None
-
-        if year_month is not None and len(year_month) == 2:
-            year, month = year_month
-
-        for problem in all_extracted_problems:
-            problem.year = int(year) if year is not None else None
-            problem.month = month
-
-        for problem in all_extracted_problems:
-            if problem.year is not None and problem.month is not None:
-                problem.problem_id = generate_problem_id(
-                    problem.year, 
-                    problem.month, 
-                    problem.number, 
-                    problem.subject_name
-                )
-            else:
-                problem.problem_id = None # DB가 알아서 채우도록 비워둠
-                # print(" (참고) problem_id 없이 진행합니다.")
+        self._assign_problem_ids(all_extracted_problems, input_pdf_path)
 
         return all_extracted_problems
 
@@ -902,8 +1783,7 @@ class ProbDexEngine:
         '''
         사용자 pdf 파일에서 메타 데이터 분석
         '''
-        engine = ProbDexEngine()
-        meta_data = engine.extract_pdf_meta_data(
+        meta_data = self.extract_pdf_meta_data(
             input_pdf_path= user_pdf_path, 
             skip_pages = None
             )
@@ -0,0 +1,350 @@
+# --- gemini_replay.py ---
+import os
+import json
+import math
+import time
+import random
+import threading
+from collections import deque
+from types import SimpleNamespace
+from google.genai import errors
+# 프로젝트 모듈 임포트
+from .config import path, gemini_replay
+from .response_cache import make_cache_key
+
+class RecordedResponse:
+    """
+    녹화 파일에서 꺼낸 응답
+    (engine이 사용하는 text, candidates[].finish_reason, usage_metadata만 흉내냄)
+    """
+    def __init__(self, text: str, finish_reason: str = None, prompt_tokens: int = None, output_tokens: int = None):
+        self.text = text
+        self.candidates = [SimpleNamespace(finish_reason=finish_reason)] if finish_reason else []
+        self.usage_metadata = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens)
+        self.from_replay = True
+
+class RecordingStore:
+    """
+    요청/응답 녹화 파일 (JSONL, 한 줄에 호출 1개)
+    - 키: response_cache.make_cache_key()의 입력 해시 (PDF 바이트는 저장하지 않음)
+    - 같은 키가 여러 번 녹화되면 마지막 것을 사용
+    """
+    def __init__(self, recording_path: str):
+        self.recording_path = recording_path
+        self._lock = threading.Lock()
+        self._records = None
+
+    def load(self):
+        with self._lock:
+            if self._records is None:
+                self._records = {}
+                if os.path.exists(self.recording_path):
+                    with open(self.recording_path, "r", encoding="utf-8") as f:
+                        for line in f:
+                            line = line.strip()
+                            if not line:
+                                continue
+                            try:
+                                record = json.loads(line)
+                            except ValueError:
+                                continue # 녹화 중 끊긴 마지막 줄 등
+                            self._records[record["key"]] = record
+            return self._records
+
+    def get(self, cache_key: str):
+        return self.load().get(cache_key)
+
+    def append(self, record: dict):
+        os.makedirs(os.path.dirname(self.recording_path), exist_ok=True)
+        with self._lock:
+            with open(self.recording_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if self._records is not None:
+                self._records[record["key"]] = record
+
+    def latencies(self):
+        return [record["latency_seconds"] for record in self.load().values() if record.get("latency_seconds") is not None]
+
+class RecordingClient:
+    """
+    [녹화 모드] 실제 Gemini 클라이언트를 감싸 성공한 호출의 요청 키/응답/소요 시간을 녹화
+    engine은 client.models의 generate_content(), generate_content_stream()만 사용하므로 models로 자기 자신을 노출
+    """
+    def __init__(self, client, store: RecordingStore):
+        self._client = client
+        self.store = store
+        self.models = self
+
+    def _record(self, model, contents, config, text, response, latency_seconds):
+        usage = getattr(response, "usage_metadata", None)
+        candidates = getattr(response, "candidates", None) or []
+        finish_reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+        self.store.append({
+            "key": make_cache_key(model, contents, config),
+            "model": model,
+            "text": text,
+            "finish_reason": str(finish_reason) if finish_reason is not None else None,
+            "prompt_tokens": getattr(usage, "prompt_token_count", None),
+            "output_tokens": getattr(usage, "candidates_token_count", None),
+            "latency_seconds": round(latency_seconds, 3),
+            "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        })
+
+    def generate_content(self, model, contents, config):
+        start_time = time.time()
+        response = self._client.models.generate_content(model=model, contents=contents, config=config)
+        text = getattr(response, "text", None)
+        if text:
+            self._record(model, contents, config, text, response, time.time() - start_time)
+        return response
+
+    def generate_content_stream(self, model, contents, config):
+        start_time = time.time()
+        text_parts = []
+        last_chunk = None
+        for chunk in self._client.models.generate_content_stream(model=model, contents=contents, config=config):
+            if getattr(chunk, "text", None):
+                text_parts.append(chunk.text)
+            last_chunk = chunk
+            yield chunk
+
+        if text_parts:
+            self._record(model, contents, config, "".join(text_parts), last_chunk, time.time() - start_time)
+
+class LatencyModel:
+    """
+    재생 응답 지연 분포
+    - recorded: 녹화된 소요 시간 (녹화값이 없으면 params["seconds"])
+    - fixed: params["seconds"]
+    - uniform: params["low"] ~ params["high"]
+    - lognormal: 중앙값 params["median"], 로그 표준편차 params["sigma"] (긴 꼬리)
+    모든 값에 scale을 곱함 (0이면 지연 없음)
+    """
+    DISTRIBUTIONS = ("recorded", "fixed", "uniform", "lognormal")
+
+    def __init__(self, distribution: str = "recorded", scale: float = 1.0, params: dict = None, rng: random.Random = None):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"지원하지 않는 지연 분포입니다: {distribution} (가능: {self.DISTRIBUTIONS})")
+        self.distribution = distribution
+        self.scale = scale
+        self.params = {"seconds": 1.0, "low": 0.5, "high": 2.0, "median": 1.0, "sigma": 0.5, **(params or {})}
+        self.rng = rng or random.Random()
+
+    def sample(self, recorded_seconds: float = None) -> float:
+        if self.distribution == "recorded":
+            seconds = recorded_seconds if recorded_seconds is not None else self.params["seconds"]
+        elif self.distribution == "fixed":
+            seconds = self.params["seconds"]
+        elif self.distribution == "uniform":
+            seconds = self.rng.uniform(self.params["low"], self.params["high"])
+        else:
+            seconds = self.rng.lognormvariate(math.log(self.params["median"]), self.params["sigma"])
+        return max(0.0, seconds * self.scale)
+
+class ReplayClient:
+    """
+    [재생 모드] 녹화 파일로 Gemini API를 대신하는 로컬 클라이언트 (API 키, 네트워크 불필요)
+    - 응답 지연: LatencyModel 분포에서 추출
+    - 장애 주입: rate_429 / rate_5xx 확률로 429(RetryInfo 포함) / 503 오류 발생
+    - 처리량 제한: rpm을 넘는 요청은 서버처럼 429로 거절, max_concurrency를 넘는 요청은 대기열에서 기다림
+    - miss: 녹화되지 않은 요청 처리 ("error"면 404 오류, "empty"면 문제 없는 빈 JSON 응답)
+    동시성/재시도/요청 제한 기능을 오프라인에서 부하 시험하기 위한 용도
+    """
+    STREAM_CHUNK_CHARS = 200 # 스트리밍 응답 조각 크기 (글자 수)
+    STREAM_FIRST_CHUNK_RATIO = 0.3 # 전체 지연 중 첫 조각까지 걸리는 비율
+    def __init__(self, store: RecordingStore, latency: LatencyModel = None, rate_429: float = 0.0, rate_5xx: float = 0.0,
+                 rpm: int = None, max_concurrency: int = None, miss: str = "error", seed: int = None):
+        if miss not in ("error", "empty"):
+            raise ValueError(f"miss는 'error' 또는 'empty'여야 합니다: {miss}")
+        self.store = store
+        self.rng = random.Random(seed)
+        self.latency = latency or LatencyModel(rng=self.rng)
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.rpm = rpm
+        self.miss = miss
+        self.models = self
+
+        self._lock = threading.Lock()
+        self._request_times = deque() # 최근 60초 요청 시각 (rpm 제한용)
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._active = 0
+        self._stats = {
+            "calls": 0, "hits": 0, "misses": 0, "injected_429": 0, "injected_5xx": 0,
+            "throttled": 0, "peak_concurrency": 0, "latency_seconds": 0.0
+        }
+
+    # ----- 오류 생성 (google.genai와 같은 예외 타입) -----
+    @staticmethod
+    def _rate_limit_error(retry_seconds: float):
+        return errors.ClientError(429, {"error": {
+            "code": 429, "message": "Resource has been exhausted (replay).", "status": "RESOURCE_EXHAUSTED",
+            "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{retry_seconds:.0f}s"}]
+        }})
+
+    @staticmethod
+    def _server_error():
+        return errors.ServerError(503, {"error": {
+            "code": 503, "message": "The model is overloaded (replay).", "status": "UNAVAILABLE"
+        }})
+
+    @staticmethod
+    def _miss_error(cache_key: str):
+        return errors.ClientError(404, {"error": {
+            "code": 404, "message": f"녹화된 응답이 없습니다: {cache_key[:12]}", "status": "NOT_FOUND"
+        }})
+
+    # ----- 처리량 제한 -----
+    def _admit(self):
+        """
+        rpm 한도 안이면 요청 시각을 기록하고 None, 넘으면 재시도까지 남은 초를 반환
+        """
+        if not self.rpm:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            while self._request_times and now - self._request_times[0] >= 60:
+                self._request_times.popleft()
+            if len(self._request_times) >= self.rpm:
+                self._stats["throttled"] += 1
+                return max(1.0, 60 - (now - self._request_times[0]))
+            self._request_times.append(now)
+            return None
+
+    def _count(self, key: str, value = 1):
+        with self._lock:
+            self._stats[key] += value
+
+    def _serve(self, model, contents, config, chunk_chars: int = None):
+        """
+        요청 1개 처리 (처리량 제한, 장애 주입, 지연) 후 응답 조각을 차례로 반환
+        chunk_chars가 없으면 전체 응답 1개, 있으면 그 글자 수씩 나누어 지연 시간 동안 흘려보냄
+        """
+        self._count("calls")
+        retry_seconds = self._admit()
+        if retry_seconds is not None:
+            raise self._rate_limit_error(retry_seconds)
+
+        if self._slots is not None:
+            self._slots.acquire()
+        with self._lock:
+            self._active += 1
+            self._stats["peak_concurrency"] = max(self._stats["peak_concurrency"], self._active)
+        try:
+            cache_key = make_cache_key(model, contents, config)
+            record = self.store.get(cache_key)
+            delay = self.latency.sample(record.get("latency_seconds") if record else None)
+
+            # 장애 주입 (오류는 정상 응답보다 빨리 돌아오는 것으로 가정)
+            fault = self.rng.random()
+            if fault < self.rate_429:
+                self._count("injected_429")
+                time.sleep(delay * 0.1)
+                raise self._rate_limit_error(self.rng.uniform(1, 5))
+            if fault < self.rate_429 + self.rate_5xx:
+                self._count("injected_5xx")
+                time.sleep(delay * 0.1)
+                raise self._server_error()
+
+            if record is None:
+                self._count("misses")
+                if self.miss == "error":
+                    raise self._miss_error(cache_key)
+                record = {"text": json.dumps({"problems": []}), "finish_reason": "STOP"}
+            else:
+                self._count("hits")
+            self._count("latency_seconds", delay)
+
+            text = record["text"]
+            if chunk_chars:
+                pieces = [text[idx:idx + chunk_chars] for idx in range(0, len(text), chunk_chars)] or [""]
+            else:
+                pieces = [text]
+            # 스트리밍이면 첫 조각까지 지연의 STREAM_FIRST_CHUNK_RATIO, 나머지는 조각마다 고르게 나눔
+            first_delay = delay if len(pieces) == 1 else delay * self.STREAM_FIRST_CHUNK_RATIO
+            piece_delay = (delay - first_delay) / max(1, len(pieces) - 1)
+
+            for idx, piece in enumerate(pieces):
+                time.sleep(first_delay if idx == 0 else piece_delay)
+                if idx == len(pieces) - 1:
+                    yield RecordedResponse(
+                        piece, record.get("finish_reason"), record.get("prompt_tokens"), record.get("output_tokens")
+                    )
+                else:
+                    yield RecordedResponse(piece)
+        finally:
+            with self._lock:
+                self._active -= 1
+            if self._slots is not None:
+                self._slots.release()
+
+    def generate_content(self, model, contents, config):
+        return list(self._serve(model, contents, config))[0]
+
+    def generate_content_stream(self, model, contents, config):
+        return self._serve(model, contents, config, chunk_chars=self.STREAM_CHUNK_CHARS)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+def create_recording_client(client):
+    """
+    config.gemini_replay 설정의 녹화 파일로 실제 클라이언트를 감쌈
+    """
+    return RecordingClient(client, RecordingStore(gemini_replay["recording_path"]))
+
+def create_replay_client(**overrides):
+    """
+    config.gemini_replay 설정으로 재생 클라이언트 생성 (overrides로 항목별 덮어쓰기 가능)
+    """
+    settings = {**gemini_replay, **overrides}
+    latency = LatencyModel(
+        settings["latency"], settings["latency_scale"], settings["latency_params"], rng=random.Random(settings["seed"])
+    )
+    return ReplayClient(
+        RecordingStore(settings["recording_path"]),
+        latency=latency,
+        rate_429=settings["rate_429"],
+        rate_5xx=settings["rate_5xx"],
+        rpm=settings["rpm"],
+        max_concurrency=settings["max_concurrency"],
+        miss=settings["miss"],
+        seed=settings["seed"]
+    )
+
+def run_replay_load_test(pdf_path = None, max_concurrency: int = None, pages_per_request: int = None, **overrides):
+    """
+    [부하 시험] 재생 클라이언트로 extract_pdf_meta_data()를 실행하고 소요 시간과 재생 통계를 출력
+    응답 캐시는 끄고 실행 (캐시 적중으로 재생 클라이언트를 건너뛰지 않도록)
+    """
+    from .engine import ProbDexEngine
+
+    pdf_path = pdf_path or path["test_pdf"]
+    client = create_replay_client(**overrides)
+    engine = ProbDexEngine(client=client)
+    engine.response_cache = None
+
+    print(f"\n--- 재생 부하 시험 시작: {os.path.basename(pdf_path)} ---")
+    start_time = time.time()
+    problems = engine.extract_pdf_meta_data(pdf_path, max_concurrency=max_concurrency, pages_per_request=pages_per_request)
+    duration_time = time.time() - start_time
+
+    stats = client.stats()
+    print(f"✅ 재생 부하 시험 완료: 문제 {len(problems or [])}개, 소요 시간 {duration_time:.2f}초")
+    print(f"  호출 {stats['calls']}회 (녹화 적중 {stats['hits']}, 미녹화 {stats['misses']}), "
+          f"주입 429 {stats['injected_429']}회 / 5xx {stats['injected_5xx']}회, rpm 거절 {stats['throttled']}회, "
+          f"최대 동시 요청 {stats['peak_concurrency']}개")
+    return stats
+
+if __name__ == "__main__":
+    # poetry run python -m src.my_first_project.gemini_replay
+    store = RecordingStore(gemini_replay["recording_path"])
+    latencies = sorted(store.latencies())
+    if latencies:
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"✅ 녹화 {len(store.load())}개 (지연 p50 {p50:.1f}초, p95 {p95:.1f}초): {store.recording_path}")
+    else:
+        print(f"녹화된 호출이 없습니다. PROBDEX_GEMINI_MODE=record 로 파이프라인을 실행하십시오. ({store.recording_path})")
+    run_replay_load_test(miss="empty" if not latencies else gemini_replay["miss"])
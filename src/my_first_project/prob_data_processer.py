@@ -280,6 +280,54 @@ def excel_to_json(excel_path, output_path):
     print(f"\n✅ 성공: {output_path} 변환 완료.")
     print(f"총 {len(df)}개의 문제가 JSON 파일로 저장되었습니다.")
 
+# excel_to_json(pandas)이 숫자로 변환하는 정수 컬럼
+excel_integer_columns = ("problem_id", "year", "month", "number")
+
+def _normalize_excel_cell(column, value):
+    '''
+    openpyxl 셀 값을 excel_to_json(pandas) 결과와 같은 타입으로 맞추는 함수
+    (숫자 문자열 '06' -> 6, 2022.0 -> 2022)
+    '''
+    if column in excel_integer_columns:
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and value.strip().isdigit():
+            return int(value.strip())
+    return value
+
+def iter_excel_problem_items(excel_path):
+    '''
+    엑셀 파일을 openpyxl 읽기 전용 모드로 한 행씩 읽어
+    excel_to_json()과 같은 형태의 문제 딕셔너리를 순서대로 반환하는 제너레이터
+    (전체 시트를 DataFrame/JSON으로 만들지 않음)
+    '''
+    workbook = pyxl.load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(col).strip() if col is not None else None for col in header]
+
+        for row in rows:
+            # 완전히 빈 행은 건너뜀
+            if row is None or all(value is None for value in row):
+                continue
+
+            item = {
+                column: _normalize_excel_cell(column, value)
+                for column, value in zip(columns, row) if column
+            }
+            if 'source_data' in item:
+                item['source_data'] = process_source_data(item['source_data'])
+            if 'subject_name' in item:
+                item['subject_name'] = process_subject_name(item['subject_name'])
+            yield item
+    finally:
+        workbook.close()
+
 def latex_to_unicode(latex_text: str):
     '''
     LaTeX 형식의 텍스트를 사람이 읽기 쉬운 유니코드 텍스트로 변환합니다.
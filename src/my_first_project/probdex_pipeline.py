@@ -6,7 +6,7 @@ import os
 from typing import List, Dict
 
 # 프로젝트 모듈 임포트
-from .engine import ProbDexEngine
+from .engine import ProbDexEngine, get_engine
 from .model import (
     BaseModel, Field, ValidationError, model_validator,
     List, Dict, Literal, master_data, valid_subjects,
@@ -20,14 +20,17 @@ from .prob_data_processer import (
 from .database import (
     create_database, populate_subjects_and_units_tables,
     sync_database_from_json, initialize_database,
-    insert_meta_data_user_db
+    insert_meta_data_user_db, compress_text_columns
 )
+from .corpus_snapshot import export_corpus_snapshot
+from .db_shards import sync_shards_from_json
+from .db_profiler import sql_profiler
 from .utility_pdf import (
     process_all_raw_problem_pdfs,
     process_pdf_to_images,
     check_new_raw_pdf, process_raw_pdf_to_images
 )
-from .config import path
+from .config import path, text_compression, corpus_sharding
 # --- ProbDex DB 파이프라인 단계 함수 정의 ---
 # 1단계 DB 초기화
 def run_initialize_database(is_user_db : bool = False):
@@ -174,7 +177,7 @@ def run_ai_analysis_for_all_pdfs(processed_pdf_path, json_path, excel_path):
 
     # AI 엔진 초기회
     try:
-        engine = ProbDexEngine()
+        engine = get_engine()
     except Exception as e:
         print(f"AI 엔진 초기화 실패: {e}")
         return False
@@ -267,6 +270,25 @@ def run_sync_database(json_path, db_path,is_user_db: bool):
     except Exception as e:
         print(f"DB 동기화 실패: {e}")
         return False
+
+    # 새로 쓰인 평문 텍스트 컬럼 압축 (config.text_compression["enabled"])
+    if text_compression["enabled"] and not is_user_db:
+        compress_text_columns(db_path)
+
+    # 과목별 샤드 DB도 함께 동기화 (config.corpus_sharding["enabled"])
+    if corpus_sharding["enabled"] and not is_user_db:
+        sync_shards_from_json(json_path)
+    return True
+
+# 6단계 코퍼스 스냅샷 생성
+def run_export_corpus_snapshot(db_path, snapshot_path):
+    """
+    [6단계] 검색 서비스 시작용 열 단위 코퍼스 스냅샷(.npz) 생성
+    (db_shards의 후보 조회가 DB와 버전이 같을 때 DB 대신 사용)
+    """
+    print("\n--- [6단계] 코퍼스 스냅샷 생성 시작 ---")
+    if export_corpus_snapshot(db_path, snapshot_path) is None:
+        return False
     return True
 
 
@@ -351,7 +373,7 @@ def run_ai_analysis_and_sync():
     """
     [분석 및 업데이트 파이프라인]
     기존 데이터를 유지하며 AI 분석 결과를 추가/업데이트합니다.
-    실행 단계: 4(AI Analysis) -> 5(DB Sync)
+    실행 단계: 4(AI Analysis) -> 5(DB Sync) -> 6(Corpus Snapshot)
     """
     print("\n" + "="*50)
     print("AI 분석 및 데이터 동기화 모드 실행")
@@ -367,6 +389,10 @@ def run_ai_analysis_and_sync():
         path["db"],
         is_user_db = False
     ): return
+    if not run_export_corpus_snapshot(
+        path["db"],
+        path["corpus_snapshot"]
+    ): return
 
     print("\n모든 분석 및 동기화 작업이 완료되었습니다.")
 
@@ -376,13 +402,17 @@ def run_ProbDex_pipeline(initialization: bool = False):
     ProbDex 전체 파이프라인 실행을 통제하는 마스터 함수
     initialization이 True이면 초기화 파이프라인을 실행
     """
-    if initialization == True:
-        # [초기화] 모든 데이터 삭제 후 재구축
-        run_system_initialization()
-    else:
-        # [평상시 실행]
-        run_add_new_files()
-        run_ai_analysis_and_sync()
+    try:
+        if initialization == True:
+            # [초기화] 모든 데이터 삭제 후 재구축
+            run_system_initialization()
+        else:
+            # [평상시 실행]
+            run_add_new_files()
+            run_ai_analysis_and_sync()
+    finally:
+        # SQL 프로파일러가 켜져 있으면 이번 실행의 쿼리 통계 요약
+        sql_profiler.report("ProbDex 파이프라인 SQL 프로파일")
 
 
 # --- user_probdex.db 파이프라인 단계 함수 정의 ---
@@ -490,13 +520,17 @@ def run_user_ProbDex_pipeline(initialization: bool = False):
     ProbDex 전체 파이프라인 실행을 통제하는 마스터 함수
     initialization이 True이면 초기화 파이프라인을 실행
     """
-    if initialization == True:
-        # [초기화] 모든 데이터 삭제 후 재구축
-        run_user_initialization()
-    else:
-        # [평상시 실행]
-        run_user_add_new_files()
-        run_user_ai_analysis_and_sync()
+    try:
+        if initialization == True:
+            # [초기화] 모든 데이터 삭제 후 재구축
+            run_user_initialization()
+        else:
+            # [평상시 실행]
+            run_user_add_new_files()
+            run_user_ai_analysis_and_sync()
+    finally:
+        # SQL 프로파일러가 켜져 있으면 이번 실행의 쿼리 통계 요약
+        sql_profiler.report("User 파이프라인 SQL 프로파일")
 
 
 
@@ -563,7 +597,7 @@ def __run_user_database_pipeline(initialization: bool = False):
         run_initialize_database(is_user_db = True)
     else:
         # [평상시 실행]
-        engine = ProbDexEngine()
+        engine = get_engine()
         meta_data = engine.analyze_pdf_user_meta_data(
             user_pdf_path = path["user_processed_pdfs"]
             )
@@ -0,0 +1,166 @@
+# --- rate_limiter.py ---
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+# 프로젝트 모듈 임포트
+from .config import gemini_rate_limits
+
+try:
+    import fcntl # POSIX
+except ImportError:
+    fcntl = None
+    import msvcrt # Windows
+
+@contextmanager
+def _file_lock(lock_path):
+    """
+    프로세스 간 배타 잠금 (POSIX: fcntl.flock, Windows: msvcrt.locking)
+    """
+    with open(lock_path, "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK은 약 10초 후 실패하므로 계속 재시도
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+class TokenBucketLimiter:
+    """
+    분당 요청 수(RPM) / 분당 토큰 수(TPM) 토큰 버킷 제한기
+    - 두 버킷은 1분 동안 최대치까지 일정한 속도로 다시 채워짐
+    - 같은 프로세스의 스레드끼리는 threading.Lock으로,
+      state_path를 지정하면 여러 프로세스(동시에 도는 파이프라인)끼리는 파일 잠금 + 상태 파일로 공유
+    - 요청 전에 예상 토큰으로 acquire()하고, 응답 후 실제 토큰으로 record_usage()하여 차이를 정산
+    """
+    def __init__(self, rpm: int, tpm: int, state_path: str = None, max_wait_seconds: float = 5.0):
+        if rpm <= 0 or tpm <= 0:
+            raise ValueError("rpm과 tpm은 1 이상이어야 합니다.")
+        self.rpm = rpm
+        self.tpm = tpm
+        self.state_path = state_path
+        self.max_wait_seconds = max_wait_seconds # 한 번에 잠드는 최대 시간 (다른 프로세스의 정산 반영용)
+        self._lock = threading.Lock()
+        self._state = None # state_path가 없을 때 사용하는 프로세스 내 상태
+
+        if state_path:
+            os.makedirs(os.path.dirname(state_path), exist_ok=True)
+
+    # ----- 상태 읽기/쓰기 -----
+    def _initial_state(self, now):
+        return {"requests": float(self.rpm), "tokens": float(self.tpm), "updated_at": now}
+
+    def _load_state(self, now):
+        if not self.state_path:
+            return self._state or self._initial_state(now)
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return self._initial_state(now)
+
+    def _save_state(self, state):
+        if not self.state_path:
+            self._state = state
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    @contextmanager
+    def _locked_state(self):
+        """
+        (스레드 + 프로세스 잠금 상태에서) 버킷을 현재 시각까지 다시 채운 상태를 제공하고 저장
+        """
+        with self._lock:
+            if self.state_path:
+                with _file_lock(f"{self.state_path}.lock"):
+                    yield from self._refilled_state()
+            else:
+                yield from self._refilled_state()
+
+    def _refilled_state(self):
+        now = time.time()
+        state = self._load_state(now)
+        elapsed = max(0.0, now - state.get("updated_at", now))
+        state["requests"] = min(float(self.rpm), state["requests"] + elapsed * self.rpm / 60.0)
+        state["tokens"] = min(float(self.tpm), state["tokens"] + elapsed * self.tpm / 60.0)
+        state["updated_at"] = now
+        yield state
+        self._save_state(state)
+
+    # ----- 공개 API -----
+    def acquire(self, tokens: int = 0):
+        """
+        요청 1개 + tokens개를 쓸 수 있을 때까지 대기한 뒤 차감
+        tokens가 TPM보다 크면 버킷이 가득 찬 시점에 통과시킴 (영원히 막히지 않도록)
+        반환: 대기한 시간 (초)
+        """
+        tokens = min(max(int(tokens), 0), self.tpm)
+        waited = 0.0
+        while True:
+            with self._locked_state() as state:
+                if state["requests"] >= 1 and state["tokens"] >= tokens:
+                    state["requests"] -= 1
+                    state["tokens"] -= tokens
+                    return waited
+                request_wait = (1 - state["requests"]) * 60.0 / self.rpm if state["requests"] < 1 else 0.0
+                token_wait = (tokens - state["tokens"]) * 60.0 / self.tpm if state["tokens"] < tokens else 0.0
+
+            sleep_time = min(max(request_wait, token_wait, 0.01), self.max_wait_seconds)
+            time.sleep(sleep_time)
+            waited += sleep_time
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """
+        응답의 실제 토큰 수로 acquire() 때의 예상치를 정산 (초과분은 버킷에서 더 차감, 남은 것은 반환)
+        """
+        if actual_tokens is None:
+            return
+        with self._locked_state() as state:
+            state["tokens"] = min(float(self.tpm), state["tokens"] - (int(actual_tokens) - int(estimated_tokens)))
+
+    def on_rate_limited(self):
+        """
+        서버가 429를 반환했을 때 호출: 요청 버킷을 비워 모든 스레드/프로세스가 잠시 쉬도록 함
+        """
+        with self._locked_state() as state:
+            state["requests"] = min(state["requests"], 0.0)
+
+# 모델별 공유 제한기 (같은 프로세스의 모든 ProbDexEngine 인스턴스/스레드가 공유)
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(model: str):
+    """
+    모델의 RPM/TPM 설정(config.gemini_rate_limits)으로 만든 공유 제한기
+    설정이 꺼져 있으면 None
+    """
+    if not gemini_rate_limits["enabled"]:
+        return None
+
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limits = gemini_rate_limits["models"].get(model, gemini_rate_limits["models"]["default"])
+            state_path = None
+            if gemini_rate_limits["share_across_processes"]:
+                state_path = os.path.join(gemini_rate_limits["state_dir"], f"{model}.json")
+            limiter = TokenBucketLimiter(limits["rpm"], limits["tpm"], state_path=state_path)
+            _limiters[model] = limiter
+        return limiter
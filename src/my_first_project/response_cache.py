@@ -0,0 +1,192 @@
+# --- response_cache.py ---
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+# 프로젝트 모듈 임포트
+from .config import gemini_response_cache
+
+class CachedResponse:
+    """
+    캐시에서 꺼낸 응답 (engine이 사용하는 generate_content 응답의 text/candidates 속성만 흉내냄)
+    """
+    def __init__(self, text: str, candidates: list = None):
+        self.text = text
+        self.candidates = candidates or []
+        self.usage_metadata = None
+        self.from_cache = True
+
+def _schema_fingerprint(schema):
+    """
+    response_schema를 비교 가능한 문자열로 변환 (Pydantic 모델이면 JSON 스키마)
+    """
+    if schema is None:
+        return ""
+    if hasattr(schema, "model_json_schema"):
+        schema = schema.model_json_schema()
+    try:
+        return json.dumps(schema, sort_keys=True, ensure_ascii=False, default=str)
+    except TypeError:
+        return repr(schema)
+
+def make_cache_key(model: str, contents: list, config) -> str:
+    """
+    응답을 결정하는 모든 입력의 SHA-256 해시
+    (페이지 바이트, 모델, system_instruction, 프롬프트, 응답 스키마, temperature, thinking budget)
+    """
+    digest = hashlib.sha256()
+
+    def update(label, value):
+        data = value if isinstance(value, bytes) else str(value).encode("utf-8")
+        digest.update(label.encode("utf-8") + b"\0" + str(len(data)).encode("ascii") + b"\0" + data)
+
+    update("model", model)
+    for part in contents:
+        if isinstance(part, str):
+            update("text", part)
+        else:
+            inline_data = getattr(part, "inline_data", None)
+            if inline_data is not None:
+                update("mime", inline_data.mime_type or "")
+                update("bytes", inline_data.data or b"")
+            else:
+                update("part", repr(part))
+
+    thinking_config = getattr(config, "thinking_config", None)
+    update("system_instruction", getattr(config, "system_instruction", None) or "")
+    update("temperature", getattr(config, "temperature", None))
+    update("response_mime_type", getattr(config, "response_mime_type", None) or "")
+    update("response_schema", _schema_fingerprint(getattr(config, "response_schema", None)))
+    update("thinking_budget", getattr(thinking_config, "thinking_budget", None))
+    return digest.hexdigest()
+
+class ResponseCache:
+    """
+    Gemini 응답 캐시 (내용 주소 방식, SQLite 파일 1개)
+    - 키: make_cache_key()의 입력 해시, 값: zlib 압축한 응답 텍스트
+    - 저장 크기 합이 max_bytes를 넘으면 마지막 사용 시각이 오래된 항목부터 삭제 (LRU)
+    - WAL 모드라 여러 파이프라인 프로세스가 같은 캐시 파일을 함께 사용 가능
+    """
+    def __init__(self, db_path: str, max_bytes: int):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response BLOB NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def get(self, cache_key: str):
+        """
+        캐시된 응답 텍스트 (없으면 None), 적중 시 마지막 사용 시각 갱신
+        """
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT response FROM responses WHERE cache_key = ?", (cache_key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            connection.execute("UPDATE responses SET last_access = ? WHERE cache_key = ?", (time.time(), cache_key))
+            connection.commit()
+            self.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, cache_key: str, model: str, response_text: str):
+        """
+        응답 저장 후 용량 초과분 정리
+        """
+        blob = zlib.compress(response_text.encode("utf-8"), 6)
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute("""
+                INSERT OR REPLACE INTO responses (cache_key, model, response, size_bytes, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (cache_key, model, blob, len(blob), now, now))
+            self._evict(connection)
+            connection.commit()
+
+    def _evict(self, connection):
+        total_bytes = connection.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM responses").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        # 자주 정리하지 않도록 max_bytes의 90%까지 줄임
+        excess = total_bytes - int(self.max_bytes * 0.9)
+        stale_keys = []
+        for cache_key, size_bytes in connection.execute(
+            "SELECT cache_key, size_bytes FROM responses ORDER BY last_access"
+        ):
+            if excess <= 0:
+                break
+            stale_keys.append((cache_key,))
+            excess -= size_bytes
+        connection.executemany("DELETE FROM responses WHERE cache_key = ?", stale_keys)
+
+    def stats(self):
+        with self._lock:
+            connection = self._connect()
+            entries, total_bytes = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM responses"
+            ).fetchone()
+        return {"entries": entries, "bytes": total_bytes, "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM responses")
+            connection.commit()
+            connection.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """
+    프로세스 공유 응답 캐시 (config.gemini_response_cache가 꺼져 있으면 None)
+    """
+    global _response_cache
+    if not gemini_response_cache["enabled"]:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(gemini_response_cache["db_path"], gemini_response_cache["max_bytes"])
+        return _response_cache
+
+if __name__ == "__main__":
+    # poetry run python -m src.my_first_project.response_cache
+    cache = get_response_cache()
+    if cache is None:
+        print("응답 캐시가 꺼져 있습니다. (PROBDEX_RESPONSE_CACHE=0)")
+    else:
+        stats = cache.stats()
+        print(f"✅ 응답 캐시: {stats['entries']}개, {stats['bytes'] / 1024:,.1f}KB ({cache.db_path})")
@@ -0,0 +1,232 @@
+# --- retry_policy.py ---
+import re
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from google.genai import errors
+
+class CircuitOpenError(Exception):
+    """
+    회로 차단기가 열려 있어 호출하지 않음 (연속 5xx 이후 reset_seconds 동안)
+    """
+
+class DeadlineExceededError(Exception):
+    """
+    PDF 1개에 허용된 전체 시간(deadline)을 다 써서 더 이상 재시도하지 않음
+    """
+
+class EmptyResponseError(Exception):
+    """
+    API가 빈 응답을 반환함 (재시도 대상)
+    """
+
+class NonRetryableError(Exception):
+    """
+    재시도해도 결과가 달라지지 않는 오류 (API 키 누락 같은 설정 오류, 재시도하지 않고 즉시 실패)
+    """
+
+class Deadline:
+    """
+    PDF 1개 분석에 쓸 수 있는 전체 시간 예산 (None이면 제한 없음)
+    """
+    def __init__(self, seconds: float = None):
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        if self.expires_at is None:
+            return float("inf")
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+class CircuitBreaker:
+    """
+    연속 서버 오류(5xx) 회로 차단기
+    - failure_threshold번 연속 5xx면 열림 -> reset_seconds 동안 모든 호출을 즉시 실패시킴
+    - reset_seconds가 지나면 반열림: 호출 1개만 시험으로 통과, 성공하면 닫히고 실패하면 다시 열림
+    여러 스레드(동시 페이지 분석)가 하나의 차단기를 공유
+    """
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._probe_in_flight:
+                return False
+            self._probe_in_flight = True # 반열림: 시험 호출 1개만 허용
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._failures >= self.failure_threshold or self._opened_at is not None:
+                if self._opened_at is None:
+                    print(f"  [회로 차단] 연속 서버 오류 {self._failures}회, {self.reset_seconds:.0f}초 동안 API 호출을 중단합니다.")
+                self._opened_at = time.monotonic()
+
+    def record_inconclusive(self):
+        """
+        5xx가 아닌 예외(타임아웃, 빈 응답 등)로 끝난 호출
+        - 닫힌 상태에서는 연속 실패 횟수에 영향을 주지 않음
+        - 반열림 시험 호출이었다면 실패로 보고 다시 엶 (시험 호출 표시가 남아 영원히 열려 있지 않도록)
+        """
+        with self._lock:
+            if not self._probe_in_flight:
+                return
+            self._probe_in_flight = False
+            self._failures += 1
+            self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+_RETRY_DELAY_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)s\s*$")
+
+def retry_after_seconds(error):
+    """
+    서버가 알려준 재시도 대기 시간 (초, 없으면 None)
+    - HTTP Retry-After 헤더 (초 또는 HTTP 날짜)
+    - Gemini 오류 본문의 google.rpc.RetryInfo.retryDelay (예: "30s")
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in (details.get("error") or {}).get("details") or []:
+            if isinstance(detail, dict) and str(detail.get("@type", "")).endswith("RetryInfo"):
+                match = _RETRY_DELAY_PATTERN.match(str(detail.get("retryDelay", "")))
+                if match:
+                    return float(match.group(1))
+    return None
+
+class RetryPolicy:
+    """
+    Gemini 호출 재시도 정책
+    - 재시도 대상: 429, 5xx, 빈 응답, 그 외 예상 못한 오류 (그 밖의 4xx와 NonRetryableError는 즉시 실패)
+    - 대기 시간: decorrelated jitter (base ~ 직전 대기 x 3 사이 무작위, max_delay 상한)
+      서버가 Retry-After / RetryInfo를 주면 그보다 짧게 기다리지 않음
+    - deadline: PDF 1개의 전체 시간 예산을 넘길 대기는 하지 않고 실패
+    - circuit_breaker: 5xx가 연속되면 호출 자체를 막아 배치 전체가 재시도 대기로 멈추지 않게 함
+    """
+    def __init__(self, max_attempts: int = 3, base_delay: float = 2.0, max_delay: float = 60.0,
+                 deadline_seconds: float = None, circuit_breaker: CircuitBreaker = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline_seconds = deadline_seconds
+        self.circuit_breaker = circuit_breaker
+
+    def new_deadline(self) -> Deadline:
+        """
+        PDF 1개 분석을 시작할 때 호출
+        """
+        return Deadline(self.deadline_seconds)
+
+    def next_delay(self, previous_delay: float) -> float:
+        upper = max(self.base_delay, previous_delay * 3)
+        return min(self.max_delay, random.uniform(self.base_delay, upper))
+
+    @staticmethod
+    def is_retryable(error) -> bool:
+        if isinstance(error, NonRetryableError):
+            return False
+        if isinstance(error, errors.APIError):
+            status_code = getattr(error, "code", None) or getattr(error, "status_code", None) or 500
+            return status_code == 429 or status_code >= 500
+        return True
+
+    def call(self, func, label: str = "", deadline: Deadline = None):
+        """
+        func()를 정책에 따라 실행하고 결과를 반환
+        마지막 시도까지 실패하면 마지막 예외를, 차단기/deadline으로 중단하면
+        CircuitOpenError / DeadlineExceededError를 발생시킴
+        """
+        deadline = deadline or Deadline(None)
+        delay = self.base_delay
+
+        for attempt in range(1, self.max_attempts + 1):
+            if deadline.expired():
+                raise DeadlineExceededError(f"[{label}] PDF 분석 시간 예산을 모두 사용했습니다.")
+            if self.circuit_breaker is not None and not self.circuit_breaker.allow():
+                raise CircuitOpenError(f"[{label}] 회로 차단기가 열려 있어 호출하지 않습니다.")
+
+            try:
+                result = func()
+            except Exception as e:
+                status_code = getattr(e, "code", None) or getattr(e, "status_code", None)
+                if self.circuit_breaker is not None:
+                    if isinstance(e, errors.ServerError) or (isinstance(status_code, int) and status_code >= 500):
+                        self.circuit_breaker.record_failure()
+                    elif isinstance(e, errors.APIError):
+                        # 429/4xx는 서버가 정상 응답한 것이므로 연속 실패를 끊음
+                        self.circuit_breaker.record_success()
+                    else:
+                        self.circuit_breaker.record_inconclusive()
+
+                if isinstance(e, errors.APIError):
+                    print(f"  [{label}] API 오류 (HTTP {status_code})... (시도 {attempt}/{self.max_attempts})")
+                else:
+                    print(f"  [{label}] API 호출 중 오류 (시도 {attempt}/{self.max_attempts}): {e}")
+
+                if not self.is_retryable(e) or attempt == self.max_attempts:
+                    if isinstance(e, errors.APIError):
+                        print(f"  [{label}] 재시도 불가능 오류({status_code})이거나, 최대 재시도 횟수에 도달했습니다.")
+                    raise
+
+                delay = self.next_delay(delay)
+                server_delay = retry_after_seconds(e)
+                wait_time = max(delay, server_delay) if server_delay is not None else delay
+                if wait_time >= deadline.remaining():
+                    raise DeadlineExceededError(
+                        f"[{label}] 재시도 대기({wait_time:.1f}초)가 남은 시간 예산({max(0.0, deadline.remaining()):.1f}초)을 넘습니다."
+                    ) from e
+
+                hint = " (서버 지정)" if server_delay is not None and server_delay >= delay else ""
+                print(f"  [{label}] 재시도 전 {wait_time:.1f}초 대기{hint}...")
+                time.sleep(wait_time)
+                continue
+
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_success()
+            return result
+
+# 모델별 공유 회로 차단기 (같은 프로세스의 모든 엔진/스레드가 공유)
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(model: str, failure_threshold: int = 5, reset_seconds: float = 60.0) -> CircuitBreaker:
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(model)
+        if breaker is None:
+            breaker = CircuitBreaker(failure_threshold, reset_seconds)
+            _circuit_breakers[model] = breaker
+        return breaker
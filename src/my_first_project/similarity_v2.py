@@ -53,20 +53,28 @@ def calculate_cosine_similarity_text(text1: str, text2: str) -> float:
         # 어휘가 없거나 너무 짧아서 벡터화 실패 시 0점 처리
         return 0.0
 
-def calculate_advanced_score(user_prob, candidate):
+def calculate_advanced_score(user_prob, candidate, user_ids=None):
     """
     [고급 유사도 점수 계산]
     1. 핵심 개념 (Core Concepts): 30% (Jaccard)
     2. 논리 구조 (Logic Flow): 40% (TF-IDF Cosine)
-    3. 패턴/함정 (Pattern/Pitfalls): 20% (Jaccard or Text)
+    3. 패턴/함정 (Pattern/Pitfalls): 20% (id가 있으면 Jaccard, 없으면 TF-IDF Cosine)
     4. 난이도 (Difficulty): 10% (Distance based)
     
     * problem_id는 사용하지 않음.
+    * user_ids({"concept": [...]})와 후보의 concept_ids가 있으면
+      개념 Jaccard를 문자열 대신 용어 테이블의 정수 id 집합으로 계산
+    * user_ids에 "pattern"/"pitfall"이 있고 후보에 pattern_ids/pitfall_ids가 있으면
+      패턴/함정도 (종류, id) 집합의 Jaccard로 계산 (매핑이 없는 마이그레이션 전 후보는 기존 텍스트 방식)
     """
     
     # 1. 핵심 개념 일치도 (30%) - 태그 성격이므로 Jaccard 유지
-    user_concepts = user_prob.ai_analysis.core_concepts
-    cand_concepts = candidate['core_concepts']
+    if user_ids and user_ids.get('concept') is not None and 'concept_ids' in candidate:
+        user_concepts = user_ids['concept']
+        cand_concepts = candidate['concept_ids']
+    else:
+        user_concepts = user_prob.ai_analysis.core_concepts
+        cand_concepts = candidate['core_concepts']
     score_concepts = calculate_jaccard_similarity(user_concepts, cand_concepts) * 30
 
     # 2. 논리 구조 유사도 (40%) - 문장형이므로 TF-IDF 적용
@@ -74,14 +82,18 @@ def calculate_advanced_score(user_prob, candidate):
     cand_logic = candidate['logic_flow']
     score_logic = calculate_cosine_similarity_text(user_logic, cand_logic) * 40
 
-    # 3. 평가 목표(패턴/함정) 유사도 (20%) - 텍스트 결합 후 TF-IDF 적용이 더 나을 수 있음
-    # 기존 Jaccard 방식보다 텍스트 유사도가 뉘앙스를 더 잘 잡을 수 있음
-    user_pattern_str = " ".join(user_prob.ai_analysis.pattern_type + user_prob.ai_analysis.pitfalls)
-    cand_pattern_str = " ".join(candidate['pattern_type'] + candidate['pitfalls'])
-    
-    # 텍스트가 너무 짧으면 Jaccard가 나을 수도 있지만, 일관성을 위해 Cosine 시도
-    # 혹은 리스트 형태가 강하다면 Jaccard로 회귀. 여기서는 텍스트 유사도로 시도해봄.
-    score_goal = calculate_cosine_similarity_text(user_pattern_str, cand_pattern_str) * 20
+    # 3. 평가 목표(패턴/함정) 유사도 (20%)
+    if (user_ids and user_ids.get('pattern') is not None and user_ids.get('pitfall') is not None
+            and (candidate.get('pattern_ids') or candidate.get('pitfall_ids'))):
+        # 용어 테이블 id가 있으면 개념과 같이 정수 id 집합으로 비교 (패턴과 함정 id는 종류로 구분)
+        user_goal = [('pattern', i) for i in user_ids['pattern']] + [('pitfall', i) for i in user_ids['pitfall']]
+        cand_goal = [('pattern', i) for i in candidate['pattern_ids']] + [('pitfall', i) for i in candidate['pitfall_ids']]
+        score_goal = calculate_jaccard_similarity(user_goal, cand_goal) * 20
+    else:
+        # 텍스트 결합 후 TF-IDF (용어 매핑이 없는 후보)
+        user_pattern_str = " ".join(user_prob.ai_analysis.pattern_type + user_prob.ai_analysis.pitfalls)
+        cand_pattern_str = " ".join(candidate['pattern_type'] + candidate['pitfalls'])
+        score_goal = calculate_cosine_similarity_text(user_pattern_str, cand_pattern_str) * 20
 
     # 4. 난이도 유사도 (10%)
     user_diff = user_prob.ai_analysis.difficulty_level
@@ -101,9 +113,10 @@ def calculate_advanced_score(user_prob, candidate):
         }
     }
 
-def get_recommendations(user_prob, db_candidates, top_k=3):
+def get_recommendations(user_prob, db_candidates, top_k=3, user_ids=None):
     """
     사용자 문제와 DB 후보군을 비교하여 추천 문항을 반환하는 메인 함수
+    user_ids: database.get_vocabulary_ids()로 변환한 사용자 용어 id ({"concept": [...], "pattern": [...], "pitfall": [...]})
     """
     
     # [Step 1: 완전 일치 우선 탐색]
@@ -131,7 +144,7 @@ def get_recommendations(user_prob, db_candidates, top_k=3):
     results = []
     for candidate in db_candidates:
         # 위에서 정의한 calculate_advanced_score 함수 호출
-        score_data = calculate_advanced_score(user_prob, candidate)
+        score_data = calculate_advanced_score(user_prob, candidate, user_ids=user_ids)
         
         results.append({
             'id': candidate['problem_id'],
@@ -0,0 +1,113 @@
+# --- text_codec.py ---
+import zlib
+import hashlib
+import threading
+from functools import lru_cache
+from collections import Counter
+
+# 압축된 값 앞에 붙는 표식 (+ 사전 키 8바이트)
+COMPRESSED_MAGIC = b"PZ1"
+DICT_KEY_SIZE = 8
+# zlib 사전 최대 크기 (deflate 윈도우 32KB)
+MAX_DICT_SIZE = 32768
+
+# 사전 키 -> 사전 바이트 (프로세스 전역 등록소)
+_dictionaries = {}
+_dictionaries_lock = threading.Lock()
+
+def train_dictionary(texts, dict_size: int = MAX_DICT_SIZE):
+    """
+    코퍼스 텍스트로 zlib 사전(zdict)을 학습
+    - 어절 1~3-gram 중 두 번 이상 나온 것을 (등장 횟수 - 1) * 바이트 길이로 점수화
+    - 점수가 높은 것부터 dict_size까지 채우고, deflate는 사전 끝부분을 더 가깝게 참조하므로
+      가장 점수가 높은 조각이 사전 끝에 오도록 역순으로 배치
+    """
+    dict_size = min(dict_size, MAX_DICT_SIZE)
+    counter = Counter()
+    for text in texts:
+        if not isinstance(text, str):
+            continue
+        words = text.split()
+        for n in (1, 2, 3):
+            for idx in range(len(words) - n + 1):
+                counter[" ".join(words[idx:idx + n])] += 1
+
+    scored = []
+    for gram, count in counter.items():
+        if count < 2:
+            continue
+        gram_bytes = (gram + " ").encode("utf-8")
+        scored.append(((count - 1) * len(gram_bytes), gram_bytes))
+    scored.sort(key=lambda item: item[0], reverse=True)
+
+    pieces = []
+    total_size = 0
+    for _, gram_bytes in scored:
+        if total_size + len(gram_bytes) > dict_size:
+            continue
+        pieces.append(gram_bytes)
+        total_size += len(gram_bytes)
+
+    return b"".join(reversed(pieces))
+
+def dictionary_key(dictionary: bytes) -> bytes:
+    """
+    사전 내용으로 만든 8바이트 키 (압축값 헤더에 저장)
+    """
+    return hashlib.sha256(dictionary).digest()[:DICT_KEY_SIZE]
+
+def register_dictionary(dictionary: bytes) -> bytes:
+    """
+    사전을 프로세스 등록소에 추가하고 키를 반환
+    """
+    key = dictionary_key(dictionary)
+    with _dictionaries_lock:
+        _dictionaries[key] = dictionary
+    return key
+
+def has_dictionary(key: bytes) -> bool:
+    with _dictionaries_lock:
+        return key in _dictionaries
+
+def is_compressed(value) -> bool:
+    return isinstance(value, (bytes, bytearray)) and bytes(value[:len(COMPRESSED_MAGIC)]) == COMPRESSED_MAGIC
+
+def compressed_dictionary_key(value) -> bytes:
+    """
+    압축값 헤더의 사전 키
+    """
+    start = len(COMPRESSED_MAGIC)
+    return bytes(value[start:start + DICT_KEY_SIZE])
+
+def compress_text(text: str, dictionary: bytes, level: int = 9) -> bytes:
+    """
+    텍스트를 사전 기반 raw deflate로 압축 (표식 + 사전 키 + 압축 데이터)
+    """
+    key = register_dictionary(dictionary)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=dictionary)
+    payload = compressor.compress(text.encode("utf-8")) + compressor.flush()
+    return COMPRESSED_MAGIC + key + payload
+
+@lru_cache(maxsize=8192)
+def _decompress_cached(value: bytes) -> str:
+    key = compressed_dictionary_key(value)
+    with _dictionaries_lock:
+        dictionary = _dictionaries.get(key)
+    if dictionary is None:
+        raise KeyError(f"등록되지 않은 압축 사전입니다: {key.hex()}")
+
+    decompressor = zlib.decompressobj(-15, zdict=dictionary)
+    payload = value[len(COMPRESSED_MAGIC) + DICT_KEY_SIZE:]
+    return (decompressor.decompress(payload) + decompressor.flush()).decode("utf-8")
+
+def decode_text(value):
+    """
+    DB에서 읽은 값을 텍스트로 반환 (압축값이면 해제, 아니면 그대로)
+    같은 압축값은 LRU 캐시로 한 번만 해제
+    """
+    if not is_compressed(value):
+        return value
+    return _decompress_cached(bytes(value))
+
+def clear_decode_cache():
+    _decompress_cached.cache_clear()
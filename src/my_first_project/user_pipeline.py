@@ -3,7 +3,7 @@ import os
 import sys
 # 프로젝트 모듈 임포트
 from .config import path
-from .engine import ProbDexEngine
+from .engine import get_engine
 from .database import (
     initialize_database, 
     insert_meta_data_user_db, 
@@ -38,7 +38,7 @@ def run_problem_search_service(input_pdf_filename: str):
     # [2단계] AI 분석 (User PDF -> Metadata)
     print("\n[Step 2] AI 문제 분석 중...")
     try:
-        engine = ProbDexEngine() 
+        engine = get_engine() 
         
         # PDF 분석 (페이지 분할 및 AI 추출 포함)
         analyzed_problems = engine.extract_pdf_meta_data(user_pdf_path)
@@ -1,17 +1,19 @@
 # --- user_pipeline_v2.py ---
 import os
 import sys
-import sqlite3
 # 프로젝트 모듈 임포트
 from .config import path
-from .engine import ProbDexEngine
+from .engine import get_engine
 from .database import (
     initialize_database, 
     get_problem_candidates_by_unit,
     connect_db,
+    db_manager,
     find_unit_id,
     upsert_problem,
-    sync_concepts
+    sync_concepts,
+    sync_patterns,
+    sync_pitfalls
 )
 from .similarity_v2 import calculate_advanced_score, get_recommendations
 
@@ -33,73 +35,69 @@ def safe_insert_meta_data_user_db(problems: list, is_user_db: bool = True):
     db_label = 'User DB' if is_user_db else 'System DB'
     print(f"\n--- [V2] {db_label}  저장 시작 ---")
     
-    connection = None
+    success_count = 0
     try:
-        connection = sqlite3.connect(db_path)
-        cursor = connection.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON;")
-
-        success_count = 0
-
-        for prob in problems:
-            try:
-                # Pydantic 모델 -> 딕셔너리 변환
-                item = prob.model_dump(exclude_none=True)
-
-                # Unit ID 찾기
-                unit_id = find_unit_id(cursor, prob.subject_name, prob.unit_name)
+        with db_manager.transaction(db_path) as cursor:
+            for prob in problems:
+                try:
+                    # Pydantic 모델 -> 딕셔너리 변환
+                    item = prob.model_dump(exclude_none=True)
+
+                    # Unit ID 찾기
+                    unit_id = find_unit_id(cursor, prob.subject_name, prob.unit_name)
                 
-                # 만약 unit_id를 못 찾으면 '분류 불가'로 재시도하거나, 그래도 없으면 에러 로깅 후 스킵
-                if unit_id is None:
-                    # print(f"  [경고] 단원 ID를 찾을 수 없음: {prob.subject_name} > {prob.unit_name}") # 경고 최소화
-                    # '분류 불가' 시도
-                    unit_id = find_unit_id(cursor, prob.subject_name, "분류 불가")
-                    # if unit_id:
-                    #      print(f"   -> '분류 불가' 단원으로 대체 저장합니다.")
+                    # 만약 unit_id를 못 찾으면 '분류 불가'로 재시도하거나, 그래도 없으면 에러 로깅 후 스킵
+                    if unit_id is None:
+                        # print(f"  [경고] 단원 ID를 찾을 수 없음: {prob.subject_name} > {prob.unit_name}") # 경고 최소화
+                        # '분류 불가' 시도
+                        unit_id = find_unit_id(cursor, prob.subject_name, "분류 불가")
+                        # if unit_id:
+                        #      print(f"   -> '분류 불가' 단원으로 대체 저장합니다.")
                 
-                if unit_id is None:
-                    print(f"   -> 저장 실패: 유효한 단원 ID가 없습니다. (Subject: {prob.subject_name})")
-                    continue
+                    if unit_id is None:
+                        print(f"   -> 저장 실패: 유효한 단원 ID가 없습니다. (Subject: {prob.subject_name})")
+                        continue
 
-                ai_obj = prob.ai_analysis
+                    ai_obj = prob.ai_analysis
                 
-                # upsert_problem이 기대하는 ai 딕셔너리 구조 생성
-                ai_data_formatted = {
-                    "pattern_type": ", ".join(ai_obj.pattern_type) if ai_obj else "",
-                    "logic_flow": ai_obj.logic_flow if ai_obj else "",
-                    "pitfalls": ", ".join(ai_obj.pitfalls) if ai_obj else "",
-                    "difficulty": ai_obj.difficulty_level if ai_obj else 0,
-                }
-
-                # item 딕셔너리에 필요한 키가 없으면 채워넣음 
-                if "source_data" not in item:
-                    item["source_data"] = f"{prob.year} {prob.month} {prob.subject_name} {prob.number}번"
+                    # upsert_problem이 기대하는 ai 딕셔너리 구조 생성
+                    ai_data_formatted = {
+                        "pattern_type": ", ".join(ai_obj.pattern_type) if ai_obj else "",
+                        "logic_flow": ai_obj.logic_flow if ai_obj else "",
+                        "pitfalls": ", ".join(ai_obj.pitfalls) if ai_obj else "",
+                        "difficulty": ai_obj.difficulty_level if ai_obj else 0,
+                    }
+
+                    # item 딕셔너리에 필요한 키가 없으면 채워넣음 
+                    if "source_data" not in item:
+                        item["source_data"] = f"{prob.year} {prob.month} {prob.subject_name} {prob.number}번"
                 
-                # DB 저장 (upsert)
-                upsert_problem(cursor, item, unit_id, ai_data_formatted)
+                    # DB 저장 (upsert)
+                    upsert_problem(cursor, item, unit_id, ai_data_formatted)
 
-                # 방금 저장된 ID 확인
-                current_pid = item.get("problem_id")
-                if not current_pid:
-                    current_pid = cursor.lastrowid 
+                    # 방금 저장된 ID 확인
+                    current_pid = item.get("problem_id")
+                    if not current_pid:
+                        current_pid = cursor.lastrowid 
                 
-                # 개념 태그 동기화
-                if ai_obj and ai_obj.core_concepts and current_pid:
-                    sync_concepts(cursor, current_pid, ai_obj.core_concepts)
+                    # 개념 태그 동기화
+                    if ai_obj and ai_obj.core_concepts and current_pid:
+                        sync_concepts(cursor, current_pid, ai_obj.core_concepts)
+
+                    if ai_obj and current_pid:
+                        sync_patterns(cursor, current_pid, ai_obj.pattern_type)
+                        sync_pitfalls(cursor, current_pid, ai_obj.pitfalls)
                 
-                success_count += 1
+                    success_count += 1
 
-            except Exception as e:
-                print(f"  [오류] 문제 저장 실패 (Num: {prob.number}): {e}")
+                except Exception as e:
+                    print(f"  [오류] 문제 저장 실패 (Num: {prob.number}): {e}")
 
-        connection.commit()
         print(f"✅ 총 {success_count}개의 문제를 DB에 성공적으로 저장했습니다.")
 
     except Exception as e:
+        # 롤백은 transaction()이 처리
         print(f"DB 저장 중 치명적 오류: {e}")
-        if connection: connection.rollback()
-    finally:
-        if connection: connection.close()
 
 def run_problem_search_service_v2(input_pdf_filename: str):
     """
@@ -129,7 +127,7 @@ def run_problem_search_service_v2(input_pdf_filename: str):
     # [수정] [Step 2] 제거
     print("\nAI 문제 분석 중...")
     try:
-        engine = ProbDexEngine() 
+        engine = get_engine() 
         
         # PDF 분석
         analyzed_problems = engine.extract_pdf_meta_data(user_pdf_path)
@@ -4,6 +4,7 @@ import pandas as pd
 import os
 import time
 import io
+import re
 import fitz
 import glob
 # 프로젝트 모듈 임포트
@@ -280,6 +281,63 @@ def extract_pdf_pages_to_bytes(pdf_input_path,start_page, end_page):
 
     return extract_pdf_list_bytes
 
+def merge_pdf_pages_to_bytes(page_bytes_list):
+    '''
+    extract_pdf_pages_to_bytes()로 나눈 페이지 PDF 바이트들을 하나의 여러 페이지 PDF 바이트로 합치는 함수. (ai 일괄 전달용)
+    '''
+    pdf_writer = PdfWriter()
+    for page_bytes in page_bytes_list:
+        reader = PdfReader(io.BytesIO(page_bytes))
+        for page in reader.pages:
+            pdf_writer.add_page(page)
+
+    buffer = io.BytesIO()
+    pdf_writer.write(buffer)
+    merged_bytes = buffer.getvalue()
+    buffer.close()
+    return merged_bytes
+
+def get_expected_problem_numbers(pdf_input_path):
+    '''
+    분리된 기출 PDF 파일명으로 페이지별 문항 번호를 반환하는 함수. (problem_number_map 기준)
+    예: kice_2024_06_common.pdf -> {1: [1, 2, 3, 4], 2: [5, 6, 7], ...}
+        kice_2024_06_sta_split.pdf -> {1: [23, 24], 2: [25, 26], ...}
+    분리 규칙을 따르지 않는 파일(원본, 사용자 PDF)은 None
+    '''
+    parts = os.path.splitext(os.path.basename(pdf_input_path))[0].split('_')
+    if len(parts) < 4:
+        return None
+    if parts[3] != "common" and parts[-1] != "split":
+        return None
+
+    subject = subject_map.get(parts[3])
+    if subject not in problem_number_map:
+        return None
+    return problem_number_map[subject]
+
+def get_pdf_page_text_signals(pdf_input_path):
+    '''
+    PDF 텍스트 레이어에서 페이지별 난이도 신호를 추출하는 함수. (AI 호출 없이 thinking budget 결정용)
+    반환 형식: {페이지 번호: {"text_length": int, "points": [배점], "numbers": [문항 번호]}}
+    텍스트 레이어가 없는 페이지(스캔본 등)는 text_length 0
+    '''
+    signals = {}
+    try:
+        doc = fitz.open(pdf_input_path)
+    except Exception as e:
+        print(f"오류: PDF 텍스트 레이어를 읽는 중 문제 발생: {e}")
+        return signals
+
+    with doc:
+        for page_index in range(len(doc)):
+            text = doc.load_page(page_index).get_text()
+            signals[page_index + 1] = {
+                "text_length": len("".join(text.split())),
+                "points": [int(point) for point in re.findall(r"\[\s*([234])\s*점\s*\]", text)],
+                "numbers": [int(number) for number in re.findall(r"(?m)^\s*(\d{1,2})\.\s", text)]
+            }
+    return signals
+
 # 업데이트용 함수
 def get_pdf_page_count(pdf_input_path):
     '''
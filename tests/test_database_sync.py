@@ -0,0 +1,180 @@
+# poetry run python -m pytest tests/test_database_sync.py
+import json
+import sqlite3
+from src.my_first_project import text_codec
+from src.my_first_project.database import (
+    _create_schema, _populate_master_tables, attach_master_db, compress_text_columns, db_manager,
+    decode_column_text, decompress_text_columns, shortlist_candidate_ids, sync_problem_items
+)
+
+def _item(problem_id, concepts, difficulty=3, unit_name="삼각함수", patterns=None, pitfalls=None):
+    return {
+        "problem_id": problem_id,
+        "subject_name": "수학1",
+        "unit_name": unit_name,
+        "number": problem_id % 100,
+        "year": 2024,
+        "month": "06",
+        "source_data": f"2024년 6월 모의고사 {problem_id % 100}번",
+        "problem_image_path": f"images/{problem_id}.png",
+        "ai_analysis": {
+            "core_concepts": concepts,
+            "pattern_type": patterns or ["그래프 해석"],
+            "pitfalls": pitfalls or ["주기 착각"],
+            "logic_flow": (
+                f"주어진 조건에서 삼각함수의 주기와 최댓값을 구한 뒤 그래프의 교점 개수를 센다. "
+                f"교점이 {problem_id % 100}개가 되도록 하는 상수의 범위를 구하고 그 합을 답으로 한다."
+            ),
+            "difficulty_level": difficulty,
+        },
+    }
+
+def _create_db(db_path=":memory:"):
+    connection = sqlite3.connect(db_path)
+    cursor = connection.cursor()
+    _create_schema(cursor)
+    _populate_master_tables(cursor)
+    connection.commit()
+    return connection, cursor
+
+def _mapped_names(cursor, problem_id, map_table, vocab_table, id_col, name_col):
+    cursor.execute(f"""
+        SELECT v.{name_col} FROM {map_table} m JOIN {vocab_table} v ON v.{id_col} = m.{id_col}
+        WHERE m.problem_id = ?
+    """, (problem_id,))
+    return {row[0] for row in cursor.fetchall()}
+
+def _change_count(cursor):
+    cursor.execute("SELECT COUNT(*) FROM problem_changes")
+    return cursor.fetchone()[0]
+
+def test_sync_counts_unchanged_updated_and_deleted():
+    connection, cursor = _create_db()
+    items = [_item(2024060101, ["사인법칙"]), _item(2024060102, ["코사인법칙"])]
+
+    stats = sync_problem_items(cursor, items)
+    connection.commit()
+    assert stats == {"inserted": 2, "updated": 0, "unchanged": 0, "deleted": 0, "failed": 0}
+
+    # 같은 내용을 다시 동기화하면 쓰기도 변경 로그도 없어야 함
+    changes_before = _change_count(cursor)
+    stats = sync_problem_items(cursor, items)
+    connection.commit()
+    assert stats["unchanged"] == 2 and stats["inserted"] == stats["updated"] == 0
+    assert _change_count(cursor) == changes_before
+
+    # 한 문제만 바꾸고, 다른 문제는 목록에서 뺌 (기본값은 삭제하지 않음)
+    changed = [_item(2024060101, ["사인법칙", "삼각형의 넓이"], difficulty=4)]
+    stats = sync_problem_items(cursor, changed)
+    connection.commit()
+    assert stats["updated"] == 1 and stats["deleted"] == 0
+    cursor.execute("SELECT COUNT(*) FROM problems")
+    assert cursor.fetchone()[0] == 2
+
+    stats = sync_problem_items(cursor, changed, delete_missing=True)
+    connection.commit()
+    assert stats["unchanged"] == 1 and stats["deleted"] == 1
+    cursor.execute("SELECT problem_id FROM problems")
+    assert [row[0] for row in cursor.fetchall()] == [2024060101]
+    connection.close()
+
+def test_sync_maps_only_set_differences():
+    connection, cursor = _create_db()
+    problem_id = 2024060101
+    sync_problem_items(cursor, [_item(problem_id, ["사인법칙", "코사인법칙"], patterns=["그래프 해석", "식 세우기"])])
+    connection.commit()
+
+    cursor.execute("SELECT rowid FROM problem_concept_map WHERE problem_id = ? ORDER BY rowid", (problem_id,))
+    kept_rowid = cursor.fetchone()[0]
+
+    # ai_analysis를 문자열로 줘도 같은 해시가 아니면 매핑을 차이만큼만 갱신
+    item = _item(problem_id, ["사인법칙", "삼각형의 넓이", "사인법칙"], patterns=["식 세우기"], pitfalls=["부호 실수"])
+    item["ai_analysis"] = json.dumps(item["ai_analysis"], ensure_ascii=False)
+    stats = sync_problem_items(cursor, [item])
+    connection.commit()
+    assert stats["updated"] == 1
+
+    assert _mapped_names(cursor, problem_id, "problem_concept_map", "concepts", "concept_id", "concept_name") == {"사인법칙", "삼각형의 넓이"}
+    assert _mapped_names(cursor, problem_id, "problem_pattern_map", "patterns", "pattern_id", "pattern_name") == {"식 세우기"}
+    assert _mapped_names(cursor, problem_id, "problem_pitfall_map", "pitfalls", "pitfall_id", "pitfall_name") == {"부호 실수"}
+
+    # 그대로 남은 매핑(사인법칙)은 지웠다가 다시 넣지 않음
+    cursor.execute("SELECT MIN(rowid) FROM problem_concept_map WHERE problem_id = ?", (problem_id,))
+    assert cursor.fetchone()[0] == kept_rowid
+    connection.close()
+
+def test_shortlist_filters_orders_and_limits(tmp_path, capsys):
+    corpus_path = str(tmp_path / "probdex.db")
+    corpus, corpus_cursor = _create_db(corpus_path)
+    sync_problem_items(corpus_cursor, [
+        _item(2023090101, ["사인법칙", "코사인법칙"], difficulty=5),
+        _item(2023090102, ["사인법칙"], difficulty=3),
+        _item(2023090103, ["호도법"], difficulty=3),
+        _item(2023090104, ["호도법"], difficulty=1), # 공유 개념 없음 + 난이도 차이 2 -> 제외
+        _item(2023090105, ["사인법칙", "코사인법칙"], difficulty=3, unit_name="수열"), # 다른 단원 -> 제외
+    ])
+    corpus.commit()
+    corpus.close()
+
+    user = sqlite3.connect("file::memory:", uri=True)
+    user_cursor = user.cursor()
+    _create_schema(user_cursor)
+    _populate_master_tables(user_cursor)
+    sync_problem_items(user_cursor, [_item(1, ["사인법칙", "코사인법칙"], difficulty=3)])
+    user.commit()
+    attach_master_db(user, corpus_path)
+
+    rows = shortlist_candidate_ids(user, 1, difficulty_window=1, min_shared_concepts=1, limit=0)
+    assert rows == [(2023090101, 2, 2), (2023090102, 1, 0), (2023090103, 0, 0)]
+
+    rows = shortlist_candidate_ids(user, 1, difficulty_window=1, min_shared_concepts=1, limit=2)
+    assert rows == [(2023090101, 2, 2), (2023090102, 1, 0)]
+    assert "[선별]" in capsys.readouterr().out
+
+    # 딱 limit개면 잘린 것이 아니므로 로그 없음
+    rows = shortlist_candidate_ids(user, 1, difficulty_window=1, min_shared_concepts=1, limit=3)
+    assert len(rows) == 3
+    assert "[선별]" not in capsys.readouterr().out
+    user.close()
+
+def test_compress_round_trip_keeps_text_and_change_log(tmp_path):
+    db_path = str(tmp_path / "probdex.db")
+    connection, cursor = _create_db(db_path)
+    sync_problem_items(cursor, [_item(2024060100 + idx, ["사인법칙"], difficulty=idx % 5) for idx in range(1, 21)])
+    connection.commit()
+    cursor.execute("SELECT problem_id, logic_structure FROM problems ORDER BY problem_id")
+    original = cursor.fetchall()
+    changes_before = _change_count(cursor)
+    connection.close()
+
+    try:
+        stats = compress_text_columns(db_path, columns=["logic_structure"], vacuum=False)
+        assert stats["logic_structure"]["rows"] == len(original)
+        assert stats["logic_structure"]["after"] < stats["logic_structure"]["before"]
+    finally:
+        db_manager.close_db(db_path)
+
+    # 다른 프로세스처럼 사전이 등록되지 않은 상태에서도 DB의 text_dictionaries로 해제되어야 함
+    text_codec._dictionaries.clear()
+    text_codec.clear_decode_cache()
+
+    connection = sqlite3.connect(db_path)
+    cursor = connection.cursor()
+    cursor.execute("SELECT problem_id, logic_structure, typeof(logic_structure) FROM problems ORDER BY problem_id")
+    rows = cursor.fetchall()
+    assert all(value_type == "blob" for _, _, value_type in rows)
+    assert [(problem_id, decode_column_text(cursor, value)) for problem_id, value, _ in rows] == original
+    assert _change_count(cursor) == changes_before
+    connection.close()
+
+    try:
+        assert decompress_text_columns(db_path, columns=["logic_structure"], vacuum=False) == {"logic_structure": len(original)}
+    finally:
+        db_manager.close_db(db_path)
+
+    connection = sqlite3.connect(db_path)
+    cursor = connection.cursor()
+    cursor.execute("SELECT problem_id, logic_structure FROM problems ORDER BY problem_id")
+    assert cursor.fetchall() == original
+    assert _change_count(cursor) == changes_before
+    connection.close()
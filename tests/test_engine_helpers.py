@@ -0,0 +1,103 @@
+# poetry run python -m pytest tests/test_engine_helpers.py
+import json
+from types import SimpleNamespace
+from google.genai import types
+from src.my_first_project.engine import PDFProbResponse, ProbDexEngine, _PageBatchSizer, _ProblemStreamParser
+
+def _problem(number, subject_name="수학1"):
+    return SimpleNamespace(number=number, subject_name=subject_name)
+
+# ----- _split_problems_by_page -----
+def test_split_problems_by_page():
+    numbers_by_page = {1: [1, 2], 2: [3]}
+    problems = [_problem(1), _problem(3), _problem(2), _problem(2)] # 중복 번호는 처음 것만
+
+    split = ProbDexEngine._split_problems_by_page("테스트", problems, numbers_by_page)
+    assert {page: [p.number for p in items] for page, items in split.items()} == {1: [1, 2], 2: [3]}
+
+def test_split_skips_unclassified_and_number_zero():
+    numbers_by_page = {1: [1], 2: [2]}
+    problems = [_problem(1), _problem(0), _problem(None), _problem(99, "분류 불가"), _problem(2)]
+
+    split = ProbDexEngine._split_problems_by_page("테스트", problems, numbers_by_page)
+    assert {page: [p.number for p in items] for page, items in split.items()} == {1: [1], 2: [2]}
+
+def test_split_rejects_unexpected_or_missing_numbers():
+    numbers_by_page = {1: [1], 2: [2]}
+    assert ProbDexEngine._split_problems_by_page("테스트", [_problem(1), _problem(2), _problem(7)], numbers_by_page) is None
+    assert ProbDexEngine._split_problems_by_page("테스트", [_problem(1)], numbers_by_page) is None
+
+# ----- _PageBatchSizer -----
+def test_batch_sizer_additive_increase_multiplicative_decrease():
+    sizer = _PageBatchSizer(initial_size=4, max_size=5, target_seconds=10)
+
+    sizer.on_success(batch_pages=4, duration=3)
+    assert sizer.size == 5
+    sizer.on_success(batch_pages=5, duration=3)
+    assert sizer.size == 5 # max_size에서 멈춤
+    sizer.on_success(batch_pages=2, duration=3)
+    assert sizer.size == 5 # 마지막 자투리 배치는 크기를 바꾸지 않음
+    sizer.on_success(batch_pages=5, duration=12)
+    assert sizer.size == 4 # 목표 시간 초과
+
+    sizer.on_failure()
+    assert sizer.size == 2
+    sizer.on_failure()
+    sizer.on_failure()
+    assert sizer.size == 1 # 최소 1
+
+    assert _PageBatchSizer(initial_size=10, max_size=3, target_seconds=10).size == 3
+    assert _PageBatchSizer(initial_size=0, max_size=0, target_seconds=10).size == 1
+
+# ----- _ProblemStreamParser -----
+STREAM_PROBLEMS = [
+    {"number": 1, "unit_name": "수열", "note": "괄호 } ] { [ 와 \"따옴표\" 포함"},
+    {"number": 2, "unit_name": "삼각함수", "note": "역슬래시 \\ 다음 따옴표 \\\""},
+    {"number": 3, "unit_name": "미분", "nested": {"steps": [1, {"a": "]"}]}},
+]
+
+def _feed_in_chunks(text, size):
+    parser = _ProblemStreamParser()
+    items = []
+    for idx in range(0, len(text), size):
+        items.extend(parser.feed(text[idx:idx + size]))
+    return parser, items
+
+def test_stream_parser_emits_items_for_any_chunk_split():
+    text = json.dumps({"problems": STREAM_PROBLEMS}, ensure_ascii=False, indent=2)
+    for size in (1, 2, 3, 7, 16, len(text)):
+        parser, items = _feed_in_chunks(text, size)
+        assert items == STREAM_PROBLEMS, f"chunk size {size}"
+        assert parser.count == len(STREAM_PROBLEMS)
+        assert parser.done
+
+def test_stream_parser_emits_each_item_as_soon_as_it_closes():
+    first = json.dumps(STREAM_PROBLEMS[0], ensure_ascii=False)
+    parser = _ProblemStreamParser()
+
+    assert parser.feed('{"problems"') == []
+    assert parser.pos is None
+    assert parser.feed(': [' + first[:10]) == []
+    assert parser.feed(first[10:] + ', {"number": 2') == [STREAM_PROBLEMS[0]]
+    assert not parser.done
+    assert parser.feed('}]}') == [{"number": 2}]
+    assert parser.done and parser.count == 2
+
+# ----- _is_cacheable -----
+def _response(text, finish_reason=types.FinishReason.STOP):
+    return SimpleNamespace(text=text, candidates=[SimpleNamespace(finish_reason=finish_reason)])
+
+def test_is_cacheable():
+    config = types.GenerateContentConfig(response_mime_type="application/json", response_schema=PDFProbResponse)
+    valid = json.dumps({"problems": [{"subject_name": "수학1", "unit_name": "수열", "number": 1}]}, ensure_ascii=False)
+    wrong_unit = json.dumps({"problems": [{"subject_name": "수학1", "unit_name": "미분", "number": 1}]}, ensure_ascii=False)
+
+    assert ProbDexEngine._is_cacheable(_response(valid), config)
+    assert ProbDexEngine._is_cacheable(_response('{"problems": []}'), config)
+    assert not ProbDexEngine._is_cacheable(_response(""), config)
+    assert not ProbDexEngine._is_cacheable(_response(valid, types.FinishReason.MAX_TOKENS), config)
+    assert not ProbDexEngine._is_cacheable(_response(valid[:-5]), config)
+    assert not ProbDexEngine._is_cacheable(_response(wrong_unit), config)
+
+    # JSON 응답이 아니면 스키마 검증 없이 캐시
+    assert ProbDexEngine._is_cacheable(_response("일반 텍스트"), types.GenerateContentConfig())
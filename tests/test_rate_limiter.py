@@ -0,0 +1,47 @@
+# poetry run python -m pytest tests/test_rate_limiter.py
+import pytest
+from src.my_first_project.rate_limiter import TokenBucketLimiter
+
+def test_rejects_non_positive_limits():
+    with pytest.raises(ValueError):
+        TokenBucketLimiter(rpm=0, tpm=1000)
+
+def test_acquire_without_wait_until_bucket_is_empty():
+    limiter = TokenBucketLimiter(rpm=3, tpm=10_000)
+    assert [limiter.acquire(tokens=100) for _ in range(3)] == [0.0, 0.0, 0.0]
+
+    # 분당 6000회 -> 요청 1개가 다시 채워지는 데 약 0.01초
+    fast = TokenBucketLimiter(rpm=6000, tpm=10_000_000)
+    fast.on_rate_limited() # 429를 받으면 요청 버킷을 비움
+    waited = fast.acquire()
+    assert 0 < waited < 1
+
+def test_waits_for_tokens_and_settles_usage():
+    limiter = TokenBucketLimiter(rpm=1000, tpm=60_000, max_wait_seconds=0.05) # 토큰 1000개/초
+    assert limiter.acquire(tokens=60_000) == 0.0
+    waited = limiter.acquire(tokens=100) # 약 0.1초 대기
+    assert 0.05 <= waited < 1
+
+    # 예상보다 적게 썼으면 반환, 많이 썼으면 추가 차감
+    limiter.record_usage(estimated_tokens=1000, actual_tokens=400)
+    assert limiter._state["tokens"] >= 600
+    before = limiter._state["tokens"]
+    limiter.record_usage(estimated_tokens=100, actual_tokens=5100)
+    assert limiter._state["tokens"] <= before - 5000 + 500 # 그 사이 다시 채워진 양은 여유로 허용
+
+def test_oversized_request_passes_when_bucket_is_full():
+    limiter = TokenBucketLimiter(rpm=10, tpm=1000)
+    assert limiter.acquire(tokens=50_000) == 0.0
+
+def test_shared_state_file_between_limiters(tmp_path):
+    state_path = str(tmp_path / "limits" / "model.json")
+    first = TokenBucketLimiter(rpm=600, tpm=10_000, state_path=state_path)
+    second = TokenBucketLimiter(rpm=600, tpm=10_000, state_path=state_path, max_wait_seconds=0.05)
+
+    first.acquire(tokens=2000)
+    first.on_rate_limited()
+    # 같은 상태 파일을 쓰는 다른 제한기(다른 프로세스 역할)도 비워진 버킷을 보고 대기
+    state = second._load_state(0)
+    assert state["requests"] < 1
+    assert state["tokens"] < 8100
+    assert 0 < second.acquire() < 1
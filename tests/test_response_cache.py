@@ -0,0 +1,41 @@
+# poetry run python -m pytest tests/test_response_cache.py
+import os
+import time
+from src.my_first_project.response_cache import ResponseCache
+
+def test_put_get_and_stats(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache" / "responses.db"), max_bytes=1024 * 1024)
+    try:
+        assert cache.get("missing") is None
+        cache.put("key", "gemini-test", '{"problems": []}')
+        assert cache.get("key") == '{"problems": []}'
+
+        stats = cache.stats()
+        assert stats["entries"] == 1 and stats["hits"] == 1 and stats["misses"] == 1
+    finally:
+        cache.close()
+
+def test_evicts_least_recently_used(tmp_path):
+    # 압축되지 않는 값으로 항목 하나의 크기를 측정
+    payloads = {f"key{idx}": os.urandom(600).hex() for idx in range(4)}
+    cache = ResponseCache(str(tmp_path / "responses.db"), max_bytes=10 ** 9)
+    try:
+        cache.put("probe", "gemini-test", payloads["key0"])
+        entry_bytes = cache.stats()["bytes"]
+        cache.clear()
+
+        # 항목 3개까지만 들어가는 크기
+        cache.max_bytes = entry_bytes * 3 + entry_bytes // 2
+        for key in ("key0", "key1", "key2"):
+            cache.put(key, "gemini-test", payloads[key])
+            time.sleep(0.01)
+        assert cache.get("key0") is not None # key0을 최근 사용으로 갱신
+        time.sleep(0.01)
+
+        cache.put("key3", "gemini-test", payloads["key3"])
+        assert cache.get("key1") is None # 가장 오래 사용하지 않은 항목부터 삭제
+        assert cache.get("key0") == payloads["key0"]
+        assert cache.get("key3") == payloads["key3"]
+        assert cache.stats()["bytes"] <= cache.max_bytes
+    finally:
+        cache.close()
@@ -0,0 +1,54 @@
+# poetry run python -m pytest tests/test_retry_policy.py
+import time
+import pytest
+from google.genai import errors
+from src.my_first_project.retry_policy import CircuitBreaker, CircuitOpenError, NonRetryableError, RetryPolicy
+
+def _server_error():
+    raise errors.ServerError(503, {"error": {"code": 503, "message": "unavailable", "status": "UNAVAILABLE"}})
+
+def _timeout():
+    raise TimeoutError("read timeout")
+
+def test_half_open_probe_timeout_reopens_then_recovers():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    policy = RetryPolicy(max_attempts=1, circuit_breaker=breaker)
+
+    with pytest.raises(errors.ServerError):
+        policy.call(_server_error, label="test")
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        policy.call(lambda: "ok", label="test")
+
+    # 반열림 시험 호출이 5xx가 아닌 예외로 끝나면 다시 열려야 함
+    time.sleep(0.06)
+    with pytest.raises(TimeoutError):
+        policy.call(_timeout, label="test")
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        policy.call(lambda: "ok", label="test")
+
+    # reset_seconds가 지나면 다시 시험 호출이 허용되고, 성공하면 닫힘
+    time.sleep(0.06)
+    assert policy.call(lambda: "ok", label="test") == "ok"
+    assert not breaker.is_open
+
+def test_non_server_error_while_closed_does_not_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    policy = RetryPolicy(max_attempts=1, circuit_breaker=breaker)
+
+    with pytest.raises(errors.ServerError):
+        policy.call(_server_error, label="test")
+    with pytest.raises(TimeoutError):
+        policy.call(_timeout, label="test")
+    assert not breaker.is_open
+
+def test_non_retryable_error_is_raised_without_retry():
+    calls = []
+    def fail():
+        calls.append(1)
+        raise NonRetryableError("GEMINI_API_KEY 없음")
+
+    with pytest.raises(NonRetryableError):
+        RetryPolicy(max_attempts=3, base_delay=0.01).call(fail, label="test")
+    assert len(calls) == 1
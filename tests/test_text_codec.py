@@ -0,0 +1,42 @@
+# poetry run python -m pytest tests/test_text_codec.py
+import pytest
+from src.my_first_project import text_codec
+from src.my_first_project.text_codec import (
+    clear_decode_cache, compress_text, decode_text, is_compressed, register_dictionary, train_dictionary
+)
+
+TEXTS = [
+    "주어진 조건에서 등차수열의 일반항을 구한 뒤 합의 공식을 이용하여 답을 구한다.",
+    "주어진 조건에서 등비수열의 공비를 구한 뒤 합의 공식을 이용하여 답을 구한다.",
+    "주어진 조건에서 수열의 귀납적 정의를 이용하여 항을 차례로 구한다.",
+]
+
+def test_train_dictionary_keeps_repeated_grams_only():
+    dictionary = train_dictionary(TEXTS, dict_size=1024)
+    assert 0 < len(dictionary) <= 1024
+    assert "주어진 조건에서".encode("utf-8") in dictionary
+    assert "귀납적".encode("utf-8") not in dictionary # 한 번만 나온 어절은 제외
+
+def test_compress_round_trip():
+    dictionary = train_dictionary(TEXTS)
+    for text in TEXTS + ["", "사전에 없는 전혀 다른 문장 ∫ x² dx"]:
+        value = compress_text(text, dictionary)
+        assert is_compressed(value)
+        assert decode_text(value) == text
+
+    # 평문은 그대로 반환
+    assert decode_text(TEXTS[0]) == TEXTS[0]
+    assert decode_text(None) is None
+    assert not is_compressed(TEXTS[0].encode("utf-8"))
+
+def test_decode_needs_registered_dictionary():
+    dictionary = train_dictionary(TEXTS)
+    value = compress_text(TEXTS[0], dictionary)
+
+    text_codec._dictionaries.clear()
+    clear_decode_cache()
+    with pytest.raises(KeyError):
+        decode_text(value)
+
+    register_dictionary(dictionary)
+    assert decode_text(value) == TEXTS[0]